@@ -1,84 +1,149 @@
 import pandas as pd
 import numpy as np
-# Switched from cv2 to PIL to prevent DLL/Installation errors
+from contextlib import nullcontext
 from PIL import Image, ImageOps
 
+from src.agents.audit_rules import load_rules, compile_rules, run_rules
+from src.agents.signature_detector import SignatureDetector
+
+RISK_STATUS = "Risk (Unsigned/Empty)"
+INTEGRITY_STATUS = "Risk (Integrity)"
+VERIFIED_STATUS = "Verified"
+AUDIT_COLUMNS = ("Audit Status", "Audit Reason")
+
+# Cell text treated as empty (after strip + lower), besides real nulls
+EMPTY_TOKENS = ["", "nan", "none", "null"]
+
+
+def _empty_mask(df):
+    """
+    Boolean matrix (rows x columns): True where a cell is null or holds
+    only an empty token. Text columns are normalised column-wise; numeric
+    columns can only be empty through nulls.
+    """
+    mask = np.empty(df.shape, dtype=bool)
+    for j in range(df.shape[1]):
+        col = df.iloc[:, j]
+        empty = col.isna().to_numpy().copy()
+        if not (pd.api.types.is_numeric_dtype(col) or pd.api.types.is_datetime64_any_dtype(col)):
+            text = col[~empty].astype(str).str.strip().str.lower()
+            empty[~empty] = text.isin(EMPTY_TOKENS).to_numpy()
+        mask[:, j] = empty
+    return mask
+
+
 class AuditAgent:
-    def __init__(self):
-        pass
+    def __init__(self, rules=None, signature_settings=None):
+        """
+        `rules` is a list of rule dicts (see audit_rules.DEFAULT_RULES);
+        default: FINVISION_AUDIT_RULES or the built-in set.
+        `signature_settings` override SignatureDetector.DEFAULT_SETTINGS.
+        """
+        self.rules = rules if rules is not None else load_rules()
+        self.compiled_rules = compile_rules(self.rules)
+        self.signature_detector = SignatureDetector(signature_settings)
+        # Part of the result cache key: changing the rules re-audits documents
+        self.settings = {"rules": self.rules, "signatures": self.signature_detector.settings}
 
-    def _detect_ink_density(self, image_path):
+    def detect_signatures(self, page):
         """
-        Detects ink density using PIL (Pillow) instead of OpenCV.
-        This prevents the 'DLL load failed' error.
+        Signature / stamp check of one page (a document_loader.Page).
+        Returns the detector's page result; never raises.
         """
         try:
-            # 1. Open Image
-            with Image.open(image_path) as img:
-                # 2. Convert to Grayscale (L mode)
-                gray = ImageOps.grayscale(img)
-                
-                # 3. Binarize (Thresholding)
-                # Any pixel < 150 becomes 0 (Black/Ink), else 255 (White/Paper)
-                # We count the black pixels.
-                histogram = gray.histogram()
-                
-                # Sum of pixels with value < 150 (Dark pixels)
-                ink_pixels = sum(histogram[:150])
-                total_pixels = gray.width * gray.height
-
-                if total_pixels == 0:
-                    return False, 0.0
-
-                ink_density_score = round(ink_pixels / total_pixels, 4)
-
-                # Heuristic: If ink density > 1%, likely contains a signature/stamp
-                signature_present = ink_density_score >= 0.01
-
-                return signature_present, ink_density_score
-                
+            return self.signature_detector.detect(page.gray, page=page.index)
+        except Exception as e:
+            print(f" [Audit Agent] Signature detection error (page {page.index + 1}): {e}")
+            return {"page": page.index + 1, "ink_density": 0.0, "detections": []}
+
+    def _check_image(self, image):
+        """Signature check of a single image: a path or a decoded PIL Image."""
+        try:
+            with (nullcontext(image) if isinstance(image, Image.Image) else Image.open(image)) as img:
+                return [self.signature_detector.detect(np.asarray(ImageOps.grayscale(img)))]
         except Exception as e:
-            print(f" [Audit Agent] Ink detection error: {e}")
-            return False, 0.0
+            print(f" [Audit Agent] Signature detection error: {e}")
+            return []
 
-    def audit_dataframe(self, df, image_path=None):
+    def audit_dataframe(self, df, image_path=None, image=None, signatures=None):
         """
-        Main Function called by App.py.
+        Main Function called by the pipeline.
+        `signatures` are detect_signatures() results for the document's
+        pages (the pipeline checks every page as it is rendered). Without
+        them, a single page is checked: `image` (PIL Image) or `image_path`.
         """
         print(" [Audit Agent] Validating financial logs...")
-        
-        # 1. Image Level Audit (Physical Signature)
-        sig_present = False
-        ink_score = 0.0
-        if image_path:
-            sig_present, ink_score = self._detect_ink_density(image_path)
-            print(f" [Audit Agent] Image Analysis: Signature={'Yes' if sig_present else 'No'} (Density: {ink_score})")
+
+        # 1. Image Level Audit (Physical Signature / Stamp, per page and zone)
+        image = image if image is not None else image_path
+        if signatures is None:
+            signatures = self._check_image(image) if image is not None else []
+        detections = sorted(
+            (d for page in signatures for d in page["detections"]), key=lambda d: -d["confidence"]
+        )
+        sig_present = self.signature_detector.is_signed(detections)
+        ink_score = max((page["ink_density"] for page in signatures), default=0.0)
+        sig_stats = {
+            "signature_detected": sig_present,
+            "signature_confidence": detections[0]["confidence"] if detections else 0.0,
+            "signatures": detections,
+            "pages_checked": len(signatures),
+            "ink_density": ink_score,
+        }
+        if signatures:
+            where = ", ".join(f"p{d['page']} {d['zone']} ({d['confidence']})" for d in detections[:3])
+            print(f" [Audit Agent] Image Analysis: Signature={'Yes' if sig_present else 'No'} "
+                  f"({len(signatures)} page(s) checked{'; ' + where if where else ''})")
 
         if df.empty:
-            return df, {"total": 0, "risk": 0, "safe": 0, "ink_score": ink_score}
-
-        # 2. Row Level Audit (Data Integrity)
-        def check_row_risk(row):
-            for val in row:
-                s_val = str(val).strip().lower()
-                # Check for missing values, NaNs, or explicit "None" strings
-                if s_val in ['', 'nan', 'none', 'null']:
-                    return "Risk (Unsigned/Empty)"
-            return "Verified"
-
-        df["Audit Status"] = df.apply(check_row_risk, axis=1)
-        
-        # 3. Calculate Stats for the Dashboard
+            return df, {
+                "total_rows": 0,
+                "unsigned_count": 0,
+                "verified_count": 0,
+                "integrity_count": 0,
+                "rule_results": {},
+                **sig_stats
+            }
+
+        # 2. Row Level Audit (Data Integrity), on whole columns:
+        # one null/empty mask, reused for the status, the reason and the counts
+        data = df.drop(columns=[c for c in AUDIT_COLUMNS if c in df.columns])
+        mask = _empty_mask(data)
+        risk = mask.any(axis=1)
+
+        # 3. Financial Integrity Rules (OHLC, balances, totals, duplicates, dates)
+        rule_masks, rule_results = run_rules(data, self.compiled_rules)
+        integrity = np.zeros(len(df), dtype=bool)
+        for message, rule_mask in rule_masks.values():
+            integrity |= rule_mask
+        for name, result in rule_results.items():
+            if result["violations"]:
+                print(f" [Audit Agent] ⚠️  {name}: {result['violations']} row(s) flagged")
+
+        df["Audit Status"] = np.select([risk, integrity], [RISK_STATUS, INTEGRITY_STATUS], VERIFIED_STATUS)
+        # Reason = the first empty column of each risky row, then every failed rule
+        reasons = np.array([f"Empty: {c}" for c in data.columns] or [""], dtype=object)
+        first_empty = mask.argmax(axis=1) if mask.shape[1] else np.zeros(len(df), dtype=int)
+        reason = pd.Series(np.where(risk, reasons[first_empty], ""), dtype=object)
+        for message, rule_mask in rule_masks.values():
+            if rule_mask.any():
+                flagged = reason[rule_mask]
+                reason[rule_mask] = np.where(flagged == "", message, flagged + "; " + message)
+        df["Audit Reason"] = reason.to_numpy()
+
+        # 4. Calculate Stats for the Dashboard
         total = len(df)
-        risk_count = len(df[df["Audit Status"] == "Risk (Unsigned/Empty)"])
-        safe_count = total - risk_count
-        
+        risk_count = int(risk.sum())
+        integrity_count = int((integrity & ~risk).sum())
+        safe_count = total - risk_count - integrity_count
+
         stats = {
             "total_rows": total,
-            "unsigned_count": risk_count, 
+            "unsigned_count": risk_count,
             "verified_count": safe_count,
-            "signature_detected": sig_present,
-            "ink_density": ink_score
+            "integrity_count": integrity_count,
+            "rule_results": rule_results,
+            **sig_stats
         }
-        
-        return df, stats
\ No newline at end of file
+
+        return df, stats
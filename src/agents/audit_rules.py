@@ -0,0 +1,315 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# ---------------- AUDIT RULES (DECLARED IN CONFIG, RUN ON WHOLE COLUMNS) ----------------
+# Financial integrity checks for the extracted table. Every rule is a plain
+# dict (so the set can be overridden with JSON via FINVISION_AUDIT_RULES)
+# that is compiled into a function over whole columns. A rule returns one
+# boolean per row (True = violation), or None when the table does not have
+# the columns it needs - e.g. the OHLC rule on a bank statement.
+#
+# Columns are found by header aliases, compared lowercase with everything
+# but letters and digits removed ("Close / Last" -> "closelast").
+
+DEFAULT_RULES = [
+    {
+        "name": "ohlc",
+        "type": "ohlc",
+        "message": "OHLC out of range",
+        "columns": {
+            "open": ["open", "openprice", "opening"],
+            "high": ["high", "highprice", "dayhigh"],
+            "low": ["low", "lowprice", "daylow"],
+            "close": ["close", "closelast", "closeprice", "closing", "last", "adjclose"],
+        },
+        "tolerance": 0.0,
+    },
+    {
+        "name": "running_balance",
+        "type": "running_balance",
+        "message": "Balance mismatch",
+        "columns": {
+            "balance": ["balance", "runningbalance", "closingbalance", "bal"],
+            "debit": ["debit", "debits", "withdrawal", "withdrawals", "dr", "paidout", "moneyout"],
+            "credit": ["credit", "credits", "deposit", "deposits", "cr", "paidin", "moneyin"],
+            "amount": ["amount", "transactionamount", "amt"],
+        },
+        "tolerance": 0.01,
+        "order": "auto",
+    },
+    {
+        "name": "totals",
+        "type": "totals",
+        "message": "Total mismatch",
+        "label_pattern": r"^\s*(?:grand\s+|sub\s*-?\s*)?totals?\b",
+        "tolerance": 0.01,
+    },
+    {
+        "name": "duplicates",
+        "type": "duplicates",
+        "message": "Duplicate transaction",
+        "columns": None,
+    },
+    {
+        "name": "date_order",
+        "type": "date_monotonic",
+        "message": "Date out of order",
+        "columns": {
+            "date": ["date", "transactiondate", "valuedate", "postingdate", "txndate", "tradedate"],
+        },
+        "formats": ["%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d %b %Y", "%b %d, %Y", "%d-%b-%Y"],
+        "order": "auto",
+    },
+]
+
+
+def load_rules():
+    """
+    Rule config: FINVISION_AUDIT_RULES (a JSON list, or a path to a JSON
+    file) replaces the defaults; otherwise DEFAULT_RULES.
+    """
+    source = os.getenv("FINVISION_AUDIT_RULES")
+    if not source:
+        return DEFAULT_RULES
+    if os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(source)
+
+
+# ---------------- COLUMN HELPERS ----------------
+
+# Cells used to pick a date column's format
+DATE_SAMPLE = 2000
+
+def _norm(name):
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def find_column(columns, aliases):
+    """Position of the first header matching one of `aliases`, or None."""
+    wanted = {_norm(a) for a in aliases}
+    for j, name in enumerate(columns):
+        if _norm(name) in wanted:
+            return j
+    return None
+
+
+def to_number(col):
+    """
+    Parses OCR'd amounts column-wise: "1,200.00" -> 1200.0, "(45.10)" -> -45.1,
+    "$ 3 400" -> 3400.0. Anything unparseable becomes NaN.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy(dtype=float, na_value=np.nan)
+    values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float, na_value=np.nan, copy=True)
+    # Only cells that are not plain numbers go through the (slower) string cleanup
+    retry = np.isnan(values) & col.notna().to_numpy()
+    if retry.any():
+        text = col[retry].astype(str).str.strip()
+        negative = (text.str.startswith("(") & text.str.endswith(")")).to_numpy()
+        cleaned = pd.to_numeric(text.str.replace(r"[^0-9.\-]", "", regex=True), errors="coerce")
+        cleaned = cleaned.to_numpy(dtype=float, na_value=np.nan)
+        values[retry] = np.where(negative, -cleaned, cleaned)
+    return values
+
+
+def to_dates(col, formats):
+    """
+    Parses a date column with the format that fits the most cells of a
+    sample; only that format is then run on the whole column.
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col.to_numpy()
+    text = col.astype(str).str.strip()
+    sample = text[col.notna().to_numpy()].iloc[:DATE_SAMPLE]
+    best = max(formats, key=lambda fmt: pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+    return pd.to_datetime(text, format=best, errors="coerce").to_numpy()
+
+
+def _columns(df, spec, required):
+    found = {key: find_column(df.columns, aliases) for key, aliases in spec.items()}
+    if any(found.get(key) is None for key in required):
+        return None
+    return found
+
+
+# ---------------- RULES ----------------
+
+def _ohlc(df, rule):
+    cols = _columns(df, rule["columns"], ("open", "high", "low", "close"))
+    if cols is None:
+        return None
+    o, h, l, c = (to_number(df.iloc[:, cols[k]]) for k in ("open", "high", "low", "close"))
+    tol = rule.get("tolerance", 0.0)
+    with np.errstate(invalid="ignore"):
+        bad = (l > np.minimum(o, c) + tol) | (h < np.maximum(o, c) - tol) | (l > h + tol)
+    # Rows with a missing price are already flagged as empty
+    return bad & ~np.isnan(o + h + l + c)
+
+
+def _running_balance(df, rule):
+    cols = _columns(df, rule["columns"], ("balance",))
+    if cols is None:
+        return None
+
+    balance = to_number(df.iloc[:, cols["balance"]])
+    if cols.get("debit") is not None or cols.get("credit") is not None:
+        debit = to_number(df.iloc[:, cols["debit"]]) if cols.get("debit") is not None else np.zeros(len(df))
+        credit = to_number(df.iloc[:, cols["credit"]]) if cols.get("credit") is not None else np.zeros(len(df))
+        # A transaction has a debit or a credit; the other cell is blank
+        delta = np.nan_to_num(credit) - np.nan_to_num(debit)
+        known = ~(np.isnan(debit) & np.isnan(credit))
+    elif cols.get("amount") is not None:
+        delta = to_number(df.iloc[:, cols["amount"]])
+        known = ~np.isnan(delta)
+        delta = np.nan_to_num(delta)
+    else:
+        return None
+
+    tol = rule.get("tolerance", 0.01)
+
+    def violations(previous):
+        # previous[i] = the balance before row i's transaction
+        with np.errstate(invalid="ignore"):
+            bad = np.abs(previous + delta - balance) > tol
+        return bad & known & ~np.isnan(balance) & ~np.isnan(previous)
+
+    # Oldest-first: previous row is i-1. Newest-first statements: it is i+1.
+    forward = violations(np.concatenate([[np.nan], balance[:-1]]))
+    backward = violations(np.concatenate([balance[1:], [np.nan]]))
+    order = rule.get("order", "auto")
+    if order == "forward":
+        return forward
+    if order == "backward":
+        return backward
+    return forward if forward.sum() <= backward.sum() else backward
+
+
+def _totals(df, rule):
+    pattern = re.compile(rule.get("label_pattern", r"^\s*totals?\b"), re.I)
+    text_cols = [j for j in range(df.shape[1]) if not pd.api.types.is_numeric_dtype(df.iloc[:, j])]
+
+    is_total = np.zeros(len(df), dtype=bool)
+    is_grand = np.zeros(len(df), dtype=bool)
+    for j in text_cols:
+        text = df.iloc[:, j].astype(str)
+        is_total |= text.str.contains(pattern, na=False).to_numpy()
+        is_grand |= text.str.contains(r"^\s*grand\s+total", case=False, regex=True, na=False).to_numpy()
+    if not is_total.any():
+        return None
+
+    # Amount columns: mostly numeric on the detail rows
+    detail = ~is_total
+    values = []
+    for j in range(df.shape[1]):
+        nums = to_number(df.iloc[:, j])
+        if np.isfinite(nums[detail]).mean() >= 0.5:
+            values.append(nums)
+    if not values:
+        return None
+    values = np.column_stack(values)
+
+    # Prefix sums over detail rows: a segment sum is a difference of two prefixes
+    prefix = np.vstack([np.zeros(values.shape[1]), np.cumsum(np.where(detail[:, None], np.nan_to_num(values), 0), axis=0)])
+    total_rows = np.flatnonzero(is_total)
+    # A subtotal covers the rows since the previous subtotal; a grand total covers everything
+    prev_sub = np.maximum.accumulate(np.where(is_grand[total_rows], 0, total_rows + 1))
+    starts = np.where(is_grand[total_rows], 0, np.concatenate([[0], prev_sub[:-1]]))
+    sums = prefix[total_rows] - prefix[starts]
+
+    declared = values[total_rows]
+    tol = rule.get("tolerance", 0.01)
+    with np.errstate(invalid="ignore"):
+        mismatch = (np.abs(declared - sums) > tol * np.maximum(1, np.abs(sums))) & ~np.isnan(declared)
+
+    bad = np.zeros(len(df), dtype=bool)
+    bad[total_rows] = mismatch.any(axis=1)
+    return bad
+
+
+def _duplicates(df, rule):
+    names = rule.get("columns")
+    if names:
+        positions = [find_column(df.columns, [n]) for n in names]
+        if any(p is None for p in positions):
+            return None
+        frame = df.iloc[:, positions]
+    else:
+        frame = df
+    if frame.shape[1] == 0:
+        return None
+
+    # duplicated() hashes each column into codes (C hash tables) and compares
+    # the combined row keys - no Python-level row comparison
+    normalised = frame.astype(str).apply(lambda s: s.str.strip().str.lower())
+    blank = normalised.isin(["", "nan", "none", "null"]).all(axis=1).to_numpy()
+    return normalised.duplicated(keep="first").to_numpy() & ~blank
+
+
+def _date_monotonic(df, rule):
+    cols = _columns(df, rule["columns"], ("date",))
+    if cols is None:
+        return None
+    dates = to_dates(df.iloc[:, cols["date"]], rule.get("formats", DEFAULT_RULES[-1]["formats"]))
+    valid = np.flatnonzero(~pd.isna(dates))
+    if len(valid) < 2:
+        return None
+
+    step = np.sign(np.diff(dates[valid]).astype("int64"))
+    order = rule.get("order", "auto")
+    if order == "auto":
+        order = "ascending" if (step > 0).sum() >= (step < 0).sum() else "descending"
+    against = step < 0 if order == "ascending" else step > 0
+
+    bad = np.zeros(len(df), dtype=bool)
+    bad[valid[1:][against]] = True
+    return bad
+
+
+RULE_TYPES = {
+    "ohlc": _ohlc,
+    "running_balance": _running_balance,
+    "totals": _totals,
+    "duplicates": _duplicates,
+    "date_monotonic": _date_monotonic,
+}
+
+
+def compile_rules(config):
+    """Turns rule dicts into (name, message, fn) triples. Unknown types raise ValueError."""
+    compiled = []
+    for rule in config:
+        if not rule.get("enabled", True):
+            continue
+        fn = RULE_TYPES.get(rule["type"])
+        if fn is None:
+            raise ValueError(f"Unknown audit rule type {rule['type']!r} (rule {rule.get('name')!r})")
+        compiled.append((rule.get("name", rule["type"]), rule.get("message", rule["type"]),
+                         lambda df, fn=fn, rule=rule: fn(df, rule)))
+    return compiled
+
+
+def run_rules(df, compiled):
+    """
+    Runs compiled rules over `df`.
+    Returns ({name: (message, violation mask)}, {name: summary dict}).
+    """
+    masks, results = {}, {}
+    for name, message, fn in compiled:
+        try:
+            mask = fn(df)
+        except Exception as e:
+            print(f" [Audit Agent] ⚠️  Rule '{name}' failed: {e}")
+            results[name] = {"status": "error", "violations": 0, "error": str(e)}
+            continue
+        if mask is None:
+            results[name] = {"status": "skipped", "violations": 0}
+            continue
+        count = int(mask.sum())
+        masks[name] = (message, mask)
+        results[name] = {"status": "failed" if count else "passed", "violations": count}
+    return masks, results
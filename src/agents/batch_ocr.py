@@ -0,0 +1,164 @@
+import time
+import numpy as np
+import cv2
+
+from src.telemetry import add_time
+
+# ---------------- BATCHED EASYOCR (DETECT ALL, THEN RECOGNIZE IN BATCHES) ----------------
+# `reader.readtext` runs detection and recognition back to back, one image at
+# a time, and recognizes one crop per forward pass (batch_size=1). Here the two
+# stages are split:
+#   1. detection runs over all images first (same-size pages share one pass)
+#   2. recognition runs over every box of an image in batches of `batch_size`
+# Recognition output per image is identical to readtext: the same boxes are
+# cropped from the same grey image, only the forward passes are batched.
+# Detection can also run on a downscaled copy of each image (an image
+# pyramid level): its boxes are scaled back and recognition still crops them
+# from the full-resolution image.
+#
+# Every function takes an optional `timings` dict that receives the
+# milliseconds spent in "detect" and "recognize".
+
+
+def _to_detector_input(img):
+    # readtext feeds the detector a 3-channel image and the recognizer a grey one
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR), img
+    return img, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def detect_batched(reader, images):
+    """
+    Runs text detection over a list of images.
+    Returns ([(horizontal_list, free_list)], [grey image]) aligned with `images`.
+    """
+    prepared = [_to_detector_input(img) for img in images]
+    boxes = [None] * len(images)
+
+    # The detector accepts a 4-D batch when every image has the same shape
+    groups = {}
+    for i, (color, _) in enumerate(prepared):
+        groups.setdefault(color.shape, []).append(i)
+
+    for idxs in groups.values():
+        batch = np.stack([prepared[i][0] for i in idxs])
+        horizontal, free = reader.detect(batch, reformat=False)
+        for i, h, f in zip(idxs, horizontal, free):
+            boxes[i] = (h, f)
+
+    return boxes, [grey for _, grey in prepared]
+
+
+def scale_boxes(horizontal, free, sx, sy):
+    """Scales detect() output: [x_min, x_max, y_min, y_max] boxes and 4-point polygons."""
+    horizontal = [[int(round(b[0] * sx)), int(round(b[1] * sx)), int(round(b[2] * sy)), int(round(b[3] * sy))]
+                  for b in horizontal]
+    free = [[[px * sx, py * sy] for px, py in b] for b in free]
+    return horizontal, free
+
+
+def readtext_batched(reader, images, batch_size=32, workers=0, layout_images=None, timings=None):
+    """
+    Batched equivalent of `[reader.readtext(img, detail=1) for img in images]`.
+    `layout_images` (optional, one per image) are downscaled copies that
+    text detection runs on instead of the full images.
+    """
+    start = time.perf_counter()
+    if layout_images is None:
+        boxes, greys = detect_batched(reader, images)
+    else:
+        boxes, _ = detect_batched(reader, layout_images)
+        greys = [_to_detector_input(img)[1] for img in images]
+        boxes = [
+            scale_boxes(h, f, img.shape[1] / small.shape[1], img.shape[0] / small.shape[0])
+            for (h, f), img, small in zip(boxes, images, layout_images)
+        ]
+    add_time(timings, "detect", start)
+
+    start = time.perf_counter()
+    results = []
+    for (horizontal, free), grey in zip(boxes, greys):
+        if not horizontal and not free:
+            results.append([])
+            continue
+        results.append(reader.recognize(
+            grey, horizontal_list=horizontal, free_list=free,
+            batch_size=batch_size, workers=workers, detail=1, reformat=False
+        ))
+    add_time(timings, "recognize", start)
+    return results
+
+
+def readtext_regions(reader, image, regions, batch_size=32, workers=0):
+    """
+    OCRs several rectangular regions (x, y, w, h) of one image.
+    Text is detected per region, then all boxes are recognized in a single
+    batched pass over the full image. Returns one readtext-style result list
+    per region, with coordinates relative to that region.
+    """
+    crops = [image[y:y + h, x:x + w] for x, y, w, h in regions]
+    boxes, _ = detect_batched(reader, crops)
+    _, grey = _to_detector_input(image)
+
+    # Shift every box into full-image coordinates
+    horizontal, free = [], []
+    for (x, y, _, _), (h_list, f_list) in zip(regions, boxes):
+        horizontal += [[b[0] + x, b[1] + x, b[2] + y, b[3] + y] for b in h_list]
+        free += [[[px + x, py + y] for px, py in b] for b in f_list]
+
+    per_region = [[] for _ in regions]
+    if not horizontal and not free:
+        return per_region
+
+    results = reader.recognize(
+        grey, horizontal_list=horizontal, free_list=free,
+        batch_size=batch_size, workers=workers, detail=1, reformat=False
+    )
+
+    # Route each result back to the region that contains its centre
+    for bbox, text, conf in results:
+        pts = np.asarray(bbox, dtype=float)
+        cx, cy = pts[:, 0].mean(), pts[:, 1].mean()
+        for k, (x, y, w, h) in enumerate(regions):
+            if x <= cx < x + w and y <= cy < y + h:
+                local = [[px - x, py - y] for px, py in bbox]
+                per_region[k].append((local, text, conf))
+                break
+
+    return per_region
+
+
+def readtext_cells(reader, image, cells, batch_size=32, workers=0, timings=None):
+    """
+    Recognizes table cells (x, y, w, h) of one image whose layout is already
+    known: every cell is one text line, so there is no text detection at
+    all - all cells go through a single batched recognition pass.
+    Returns [(text, confidence)] aligned with `cells` ("", 0.0 when nothing
+    was read).
+    """
+    out = [("", 0.0)] * len(cells)
+    if not cells:
+        return out
+    start = time.perf_counter()
+    _, grey = _to_detector_input(image)
+    boxes = np.asarray(cells, dtype=np.int64).reshape(-1, 4)
+    x0, y0 = boxes[:, 0], boxes[:, 1]
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+
+    results = reader.recognize(
+        grey, horizontal_list=np.column_stack([x0, x1, y0, y1]).tolist(), free_list=[],
+        batch_size=batch_size, workers=workers, detail=1, reformat=False
+    )
+    add_time(timings, "recognize", start)
+    if not results:
+        return out
+
+    # recognize() sorts its crops top → bottom: route results back by centre
+    centres = np.array([np.asarray(bbox, dtype=float).mean(axis=0) for bbox, _, _ in results])
+    cx, cy = centres[:, :1], centres[:, 1:]
+    inside = (x0 <= cx) & (cx < x1) & (y0 <= cy) & (cy < y1)
+    owner = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+    for k, (_, text, conf) in zip(owner, results):
+        if k >= 0:
+            out[k] = (text.strip(), float(conf))
+    return out
@@ -1,9 +1,117 @@
 import cv2
 import numpy as np
+from src.agents.image_pyramid import upscale_boxes
+from src.agents.preprocess import stages_for, graph_with
 
 # ---------------- COLUMN DETECTOR (PRODUCTION-GRADE) ----------------
-
-def detect_columns(image_path, expected_cols=6):
+# Columns are the runs of a page's vertical ink projection. The number of
+# columns is not fixed: it is however many runs the projection has once
+# runs separated by less than `min_gap` (word spaces inside a cell) are
+# merged. The threshold has hysteresis: a sparse column (debits of a bank
+# statement) only needs to reach ACTIVE_THRESHOLD, while two runs whose
+# gap never falls to GAP_THRESHOLD (the ragged end of a description
+# column) are one column, as a real gap between columns is empty.
+# Run-length encoding is a diff / nonzero over whole arrays, and profiles
+# of several pages are stacked so one call segments them all.
+
+# Defaults, in pyramid-level pixels (characters ~LAYOUT_TEXT_PX tall)
+MIN_COLUMN_PX = 20      # narrower runs are noise (rules, specks)
+MIN_GAP_PX = 8          # narrower gaps are spaces inside a cell
+SMOOTH_PX = 9           # moving-average window of the projection
+ACTIVE_THRESHOLD = 0.1  # x the page's densest pixel column
+GAP_THRESHOLD = 0.02    # runs joined by ink above this are one column
+
+
+def column_profile(binary):
+    """Ink pixels per pixel column of an inverted binary image (ink = 255)."""
+    return cv2.reduce(binary, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() / 255.0
+
+
+def find_segments(profiles, min_width=MIN_COLUMN_PX, min_gap=MIN_GAP_PX, smooth=SMOOTH_PX, threshold=ACTIVE_THRESHOLD,
+                  gap_threshold=GAP_THRESHOLD):
+    """
+    Column segments of one projection profile (1-D) or of a batch of
+    profiles (2-D, one page per row; shorter pages zero-padded).
+    Returns an (n, 2) int array of [start, end) per profile - a list of
+    them for a batch.
+    """
+    profiles = np.asarray(profiles, dtype=np.float32)
+    single = profiles.ndim == 1
+    profiles = np.atleast_2d(profiles)
+    n_pages = profiles.shape[0]
+
+    if smooth > 1:
+        profiles = cv2.blur(profiles, (int(smooth), 1), borderType=cv2.BORDER_CONSTANT)
+    peak = profiles.max(axis=1, keepdims=True)
+    active = (profiles > threshold * peak) & (peak > 0)
+    inked = (profiles > gap_threshold * peak) & (peak > 0)
+
+    page, start, end = _runs(active)
+    # Label of the low-threshold run each position lies in (0 outside them)
+    inked_page, inked_start, _ = _runs(inked)
+    labels = np.zeros(inked.shape, dtype=np.int32)
+    labels[inked_page, inked_start] = 1
+    stretch = np.where(inked, np.cumsum(labels, axis=1), 0)
+
+    # Merge runs of one page split by a gap narrower than min_gap, or by
+    # one that stays inked
+    if start.size:
+        joined = stretch[page[1:], start[1:]] == stretch[page[:-1], end[:-1] - 1]
+        new = np.ones(start.size, dtype=bool)
+        new[1:] = ((start[1:] - end[:-1] >= min_gap) & ~joined) | (page[1:] != page[:-1])
+        first = np.flatnonzero(new)
+        last = np.append(first[1:], start.size) - 1
+        page, start, end = page[first], start[first], end[last]
+
+    keep = end - start >= min_width
+    page, segments = page[keep], np.column_stack([start[keep], end[keep]])
+    per_page = np.split(segments, np.cumsum(np.bincount(page, minlength=n_pages))[:-1])
+    return per_page[0] if single else per_page
+
+
+def _runs(mask):
+    # Run-length encoding: +1 / -1 steps of the zero-padded mask are run
+    # starts / ends. Returns (page, start, end) of every run
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    steps = np.diff(padded, axis=1)
+    page, start = np.nonzero(steps == 1)
+    end = np.nonzero(steps == -1)[1]
+    return page, start, end
+
+
+def _strongest(segments, profile, expected_cols):
+    # The `expected_cols` segments holding the most ink, left → right
+    if expected_cols is None or len(segments) <= expected_cols:
+        return segments
+    cumulative = np.concatenate([[0.0], np.cumsum(profile)])
+    mass = cumulative[segments[:, 1]] - cumulative[segments[:, 0]]
+    return segments[np.sort(np.argsort(-mass, kind="stable")[:expected_cols])]
+
+
+def _column_inputs(image, layout_text_px=None, graph=None):
+    """(profile, scale, level height) of one page, or None when it cannot be read."""
+    stages = stages_for(image)
+    if stages is None:
+        return None
+    if layout_text_px is not None:
+        graph = graph_with({"layout": {"target": layout_text_px}}, graph)
+
+    level = stages.get("layout", graph)
+    scale = level.shape[1] / stages.get("deskewed", graph).shape[1]
+    # Strong adaptive threshold (camera-safe), then characters joined into
+    # cell-wide blobs: the "columns_binary" / "columns" stages in preprocess.py
+    binary = stages.get("columns", graph)
+    return column_profile(binary), scale, level.shape[0]
+
+
+def _to_boxes(segments, profile, scale, h, expected_cols):
+    segments = _strongest(segments, profile, expected_cols)
+    columns = [(int(x1), 0, int(x2 - x1), h) for x1, x2 in segments]
+    return upscale_boxes(columns, scale)
+
+
+def detect_columns(image, expected_cols=None, layout_text_px=None, graph=None):
     """
     Detect vertical column regions for financial tables.
     Robust for:
@@ -11,71 +119,39 @@ def detect_columns(image_path, expected_cols=6):
     - Camera images
     - PSU / bank statements
 
-    Returns: List[(x, y, w, h)] ordered left → right
-    """
+    `image` is a Page or StageCache (its memoized stages are shared with OCR
+    and the row detector), a BGR / grayscale array, or a path. Columns are
+    found on the pyramid level; their number comes from the gaps in the
+    projection. `expected_cols` keeps at most that many (the ones with the
+    most ink). `graph` is a caller's view of the stage graph, as in
+    detect_table_rows.
 
-    img = cv2.imread(str(image_path))
-    if img is None:
+    Returns: List[(x, y, w, h)] ordered left → right, in full-resolution pixels
+    """
+    inputs = _column_inputs(image, layout_text_px, graph)
+    if inputs is None:
         return []
+    profile, scale, h = inputs
+    return _to_boxes(find_segments(profile), profile, scale, h, expected_cols)
+
 
-    h, w = img.shape[:2]
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # Strong adaptive threshold (camera-safe)
-    binary = cv2.adaptiveThreshold(
-        gray,
-        255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV,
-        31,
-        5
-    )
-
-    # Remove horizontal noise
-    horizontal_kernel = cv2.getStructuringElement(
-        cv2.MORPH_RECT, (25, 1)
-    )
-    binary = cv2.morphologyEx(
-        binary, cv2.MORPH_OPEN, horizontal_kernel
-    )
-
-    # Vertical projection
-    vertical_density = np.sum(binary > 0, axis=0)
-
-    # Smooth projection (critical)
-    kernel = np.ones(25) / 25
-    vertical_density = np.convolve(vertical_density, kernel, mode="same")
-
-    threshold = 0.2 * np.max(vertical_density)
-
-    active = vertical_density > threshold
-
-    segments = []
-    start = None
-
-    for i, val in enumerate(active):
-        if val and start is None:
-            start = i
-        elif not val and start is not None:
-            if i - start > 20:   # minimum column width
-                segments.append((start, i))
-            start = None
-
-    if start and (w - start) > 20:
-        segments.append((start, w))
-
-    if len(segments) < expected_cols:
-        # 🔁 Fallback: even split (never return empty)
-        col_width = w // expected_cols
-        segments = [
-            (i * col_width, (i + 1) * col_width)
-            for i in range(expected_cols)
-        ]
-
-    # Keep best columns
-    segments = sorted(segments, key=lambda x: x[0])
-    segments = segments[:expected_cols]
-
-    columns = [(x1, 0, x2 - x1, h) for x1, x2 in segments]
-    return columns
+def detect_columns_batch(images, expected_cols=None, layout_text_px=None, graph=None):
+    """
+    detect_columns for several pages: their projection profiles are
+    segmented in one vectorized pass. Returns one column list per image.
+    """
+    inputs = [_column_inputs(image, layout_text_px, graph) for image in images]
+    readable = [i for i, item in enumerate(inputs) if item is not None]
+    out = [[] for _ in images]
+    if not readable:
+        return out
+
+    width = max(inputs[i][0].size for i in readable)
+    profiles = np.zeros((len(readable), width), dtype=np.float32)
+    for row, i in enumerate(readable):
+        profiles[row, :inputs[i][0].size] = inputs[i][0]
+
+    for i, segments in zip(readable, find_segments(profiles)):
+        profile, scale, h = inputs[i]
+        out[i] = _to_boxes(segments, profile, scale, h, expected_cols)
+    return out
@@ -0,0 +1,136 @@
+import numpy as np
+from pathlib import Path
+from PIL import Image, ImageOps
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from src.agents.preprocess import StageCache
+
+# ---------------- DOCUMENT LOADER (DECODE EACH PAGE ONCE) ----------------
+# Preview, audit and OCR all work from the same in-memory pages:
+# - a PDF page is rasterized by poppler exactly once
+# - an image is decoded from disk exactly once
+
+
+class Page:
+    """
+    One decoded page. The RGB pixels are stored once as a numpy array;
+    the PIL view and every preprocessing stage (grayscale, pyramid level,
+    binarizations - see preprocess.py) are derived on first use and cached,
+    so every consumer of the page shares them.
+    """
+
+    def __init__(self, index, rgb):
+        self.index = index
+        self.rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        self._pil = None
+        self._stages = None
+
+    @classmethod
+    def from_pil(cls, index, pil_img):
+        return cls(index, np.asarray(pil_img.convert("RGB")))
+
+    @property
+    def height(self):
+        return self.rgb.shape[0]
+
+    @property
+    def width(self):
+        return self.rgb.shape[1]
+
+    @property
+    def pil(self):
+        if self._pil is None:
+            self._pil = Image.fromarray(self.rgb)
+        return self._pil
+
+    @property
+    def stages(self):
+        """The page's memoized preprocessing stages (preprocess.StageCache)."""
+        if self._stages is None:
+            self._stages = StageCache(self.rgb)
+        return self._stages
+
+    @property
+    def gray(self):
+        """Grayscale array, computed on first use and kept for other consumers."""
+        return self.stages.get("gray")
+
+    def thumbnail(self, max_size=1200):
+        """
+        Downscaled PIL copy whose longer side is at most `max_size` pixels
+        (never upscaled). Used for the preview instead of a full-size page.
+        """
+        scale = max_size / max(self.width, self.height)
+        if scale >= 1:
+            return self.pil
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        return self.pil.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+    # Pages are sent to OCR worker processes: pickle the pixels only
+    def __getstate__(self):
+        return {"index": self.index, "rgb": self.rgb}
+
+    def __setstate__(self, state):
+        self.__init__(state["index"], state["rgb"])
+
+
+class Document:
+    """
+    A loaded PDF or image. Pages are produced lazily; page 1 is cached so
+    the preview/audit render is reused by OCR instead of rendered again.
+    """
+
+    def __init__(self, path, dpi=200, chunk_size=2):
+        self.path = Path(path)
+        self.dpi = dpi
+        self.chunk_size = max(1, chunk_size)
+        self.is_pdf = self.path.suffix.lower() == ".pdf"
+        self.page_count = pdfinfo_from_path(str(self.path))["Pages"] if self.is_pdf else 1
+        self._first_page = None
+
+    def _render(self, first, last):
+        """Rasterizes PDF pages first..last (1-based, inclusive)."""
+        pil_images = convert_from_path(str(self.path), dpi=self.dpi, first_page=first, last_page=last)
+        pages = []
+        for offset, pil_img in enumerate(pil_images):
+            pages.append(Page.from_pil(first - 1 + offset, pil_img))
+            pil_img.close()
+        return pages
+
+    def first_page(self):
+        if self._first_page is None:
+            if self.is_pdf:
+                pages = self._render(1, 1)
+                if not pages:
+                    raise ValueError(f"PDF has no renderable pages: {self.path}")
+                self._first_page = pages[0]
+            else:
+                with Image.open(self.path) as img:
+                    # Honour EXIF rotation (phone photos), as cv2.imread does
+                    self._first_page = Page.from_pil(0, ImageOps.exif_transpose(img))
+        return self._first_page
+
+    def iter_pages(self, indices=None):
+        """
+        Yields Pages in order - every page, or only the 0-based `indices`.
+        Pages after the first are rasterized in runs of at most `chunk_size`
+        consecutive pages, so only a chunk is ever rendered at a time.
+        """
+        wanted = sorted(set(range(self.page_count) if indices is None else indices))
+
+        if wanted and wanted[0] == 0:
+            yield self.first_page()
+            wanted = wanted[1:]
+
+        while wanted:
+            # Longest run of consecutive pages, capped at chunk_size
+            run = 1
+            while run < min(self.chunk_size, len(wanted)) and wanted[run] == wanted[0] + run:
+                run += 1
+            for page in self._render(wanted[0] + 1, wanted[run - 1] + 1):
+                yield page
+            wanted = wanted[run:]
+
+
+def load_document(path, dpi=200, chunk_size=2):
+    return Document(path, dpi=dpi, chunk_size=chunk_size)
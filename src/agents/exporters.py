@@ -0,0 +1,183 @@
+import json
+import pandas as pd
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# ---------------- EXPORTERS (CSV / PARQUET / NDJSON) ----------------
+# Machine-to-machine consumers get the audited rows (including "Audit Status")
+# without any XLSX styling. Every exporter can stream its output chunk by
+# chunk and carries the audit stats as metadata:
+#   csv      plain rows; stats travel in the X-FinVision-Stats response header
+#   ndjson   first line {"_meta": {"stats", "columns", "rows"}}, then one object per row
+#   parquet  {"stats", "columns"} as JSON in the schema metadata ("finvision" key)
+#
+# Each job also keeps its audited frame (audit_frame.parquet, or .pkl when a
+# frame cannot be stored as Parquet), so any format can be produced later
+# on download without re-running OCR.
+
+EXPORT_NAME = "FinVision_Audit"
+FRAME_NAME = "audit_frame"
+METADATA_KEY = b"finvision"
+
+# Rows serialized per streamed chunk
+CHUNK_ROWS = 5000
+
+
+def _unique_columns(columns):
+    # OCR headers can be empty or repeated; JSON keys and Parquet fields must be unique
+    seen, out = set(), []
+    for name in map(str, columns):
+        candidate, n = name, 0
+        while candidate in seen:
+            n += 1
+            candidate = f"{name}.{n}"
+        seen.add(candidate)
+        out.append(candidate)
+    return out
+
+
+def _to_arrow(df, meta, coerce=True):
+    frame = df.copy(deep=False)
+    frame.columns = _unique_columns(df.columns)
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if not coerce:
+            raise
+        # Columns mixing numbers and text (common in OCR output) are exported as text
+        for col in frame.columns[frame.dtypes == object]:
+            frame[col] = frame[col].map(lambda v: None if pd.isna(v) else str(v))
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(meta, default=str).encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+
+class Exporter:
+    name = None
+    extension = None
+    media_type = "application/octet-stream"
+
+    def stream(self, df, stats):
+        """Yields the export as bytes chunks."""
+        raise NotImplementedError
+
+    def write(self, df, stats, path):
+        with open(path, "wb") as f:
+            for chunk in self.stream(df, stats):
+                f.write(chunk)
+        return path
+
+
+class CsvExporter(Exporter):
+    name = "csv"
+    extension = ".csv"
+    media_type = "text/csv"
+
+    def stream(self, df, stats):
+        yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+        for start in range(0, len(df), CHUNK_ROWS):
+            yield df.iloc[start:start + CHUNK_ROWS].to_csv(index=False, header=False).encode("utf-8")
+
+
+class NdjsonExporter(Exporter):
+    name = "ndjson"
+    extension = ".ndjson"
+    media_type = "application/x-ndjson"
+
+    def stream(self, df, stats):
+        meta = {"stats": stats, "columns": [str(c) for c in df.columns], "rows": len(df)}
+        yield (json.dumps({"_meta": meta}, default=str) + "\n").encode("utf-8")
+
+        frame = df.copy(deep=False)
+        frame.columns = _unique_columns(df.columns)
+        for start in range(0, len(frame), CHUNK_ROWS):
+            chunk = frame.iloc[start:start + CHUNK_ROWS].to_json(
+                orient="records", lines=True, date_format="iso", default_handler=str
+            )
+            yield (chunk if chunk.endswith("\n") else chunk + "\n").encode("utf-8")
+
+
+class ParquetExporter(Exporter):
+    name = "parquet"
+    extension = ".parquet"
+    media_type = "application/vnd.apache.parquet"
+
+    def _table(self, df, stats):
+        if not HAS_PARQUET:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        return _to_arrow(df, {"stats": stats, "columns": [str(c) for c in df.columns]})
+
+    def write(self, df, stats, path):
+        pq.write_table(self._table(df, stats), path)
+        return path
+
+    def stream(self, df, stats):
+        # Parquet's footer is written last, so the file is built in memory first
+        sink = pa.BufferOutputStream()
+        pq.write_table(self._table(df, stats), sink)
+        data = memoryview(sink.getvalue())
+        for start in range(0, len(data), 1024 * 1024):
+            yield bytes(data[start:start + 1024 * 1024])
+
+
+EXPORTERS = {e.name: e for e in (CsvExporter(), ParquetExporter(), NdjsonExporter())}
+
+# "xlsx" is the styled dashboard written by ReportingAgent.generate_dashboard
+FORMATS = ("xlsx",) + tuple(EXPORTERS)
+
+
+def get_exporter(fmt):
+    try:
+        return EXPORTERS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown export format {fmt!r}. Choose one of: {', '.join(FORMATS)}")
+
+
+def export_path(output_dir, fmt):
+    return Path(output_dir) / f"{EXPORT_NAME}{get_exporter(fmt).extension}"
+
+
+# ---------------- AUDITED FRAME (PER JOB) ----------------
+
+def save_frame(df, output_dir):
+    """Stores the audited frame losslessly in `output_dir` (Parquet, else pickle)."""
+    output_dir = Path(output_dir)
+    parquet_path = output_dir / f"{FRAME_NAME}.parquet"
+    pickle_path = output_dir / f"{FRAME_NAME}.pkl"
+
+    if HAS_PARQUET:
+        try:
+            table = _to_arrow(df, {"columns": [str(c) for c in df.columns]}, coerce=False)
+            pq.write_table(table, parquet_path)
+            pickle_path.unlink(missing_ok=True)
+            return parquet_path
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass  # mixed-type columns: keep them exactly as they are
+    df.to_pickle(pickle_path)
+    parquet_path.unlink(missing_ok=True)
+    return pickle_path
+
+
+def load_frame(output_dir):
+    """Returns the frame stored by save_frame, or None."""
+    output_dir = Path(output_dir)
+    parquet_path = output_dir / f"{FRAME_NAME}.parquet"
+    if HAS_PARQUET and parquet_path.exists():
+        table = pq.read_table(parquet_path)
+        meta = json.loads(table.schema.metadata[METADATA_KEY])
+        df = table.to_pandas()
+        df.columns = meta["columns"]
+        return df
+
+    pickle_path = output_dir / f"{FRAME_NAME}.pkl"
+    if pickle_path.exists():
+        return pd.read_pickle(pickle_path)
+    return None
@@ -0,0 +1,74 @@
+import os
+import cv2
+import numpy as np
+
+# ---------------- IMAGE PYRAMID (LAYOUT AT A WORKING RESOLUTION) ----------------
+# 300-DPI renders and 12-MP phone photos carry far more pixels than layout
+# analysis needs, and thresholding, dilation and text detection all scale
+# with pixel count. The working resolution is picked from the text itself:
+# the page is halved (INTER_AREA; exact 2x is OpenCV's fast path) for as
+# long as its typical character stays at least LAYOUT_TEXT_PX tall. Layout
+# (text boxes, rows, columns) is found on that level and its boxes are
+# scaled back up; recognition still crops text from the full-resolution page.
+
+# Character height (px) the layout level keeps; 0 disables downscaling
+LAYOUT_TEXT_PX = int(os.getenv("FINVISION_LAYOUT_TEXT_PX", "16"))
+
+# Never go below this width, whatever the text size
+MIN_LAYOUT_WIDTH = 480
+
+# Text height is estimated on a copy at most this wide
+ESTIMATE_MAX_WIDTH = 1000
+
+
+def half(img):
+    return cv2.resize(img, (max(1, img.shape[1] // 2), max(1, img.shape[0] // 2)), interpolation=cv2.INTER_AREA)
+
+
+def to_gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def estimate_text_height(gray):
+    """
+    Median character height of a page, in its own pixels (None when the
+    page has no recognisable characters). Characters are the connected
+    components of an Otsu-binarized copy, minus specks, rules and blobs.
+    """
+    small, factor = gray, 1
+    while small.shape[1] > ESTIMATE_MAX_WIDTH:
+        small, factor = half(small), factor * 2
+
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    w, h = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+    chars = (h >= 3) & (h < small.shape[0] * 0.1) & (w < small.shape[1] * 0.1) & (w < h * 4)
+    if chars.sum() < 10:
+        return None
+    return float(np.median(h[chars])) * factor
+
+
+def layout_level(gray, target=None):
+    """
+    (level, scale, text_height): the smallest pyramid level of `gray` whose
+    characters are still about `target` px tall. `scale` is level / full
+    size (1.0 when the page is used as is); boxes found on the level map back
+    to the page as coordinate / scale.
+    """
+    target = LAYOUT_TEXT_PX if target is None else target
+    gray = to_gray(gray)
+    text_h = estimate_text_height(gray) if target else None
+
+    level = gray
+    if text_h:
+        h = text_h
+        while h / 2 >= target and level.shape[1] // 2 >= MIN_LAYOUT_WIDTH:
+            level, h = half(level), h / 2
+    return level, level.shape[1] / gray.shape[1], text_h
+
+
+def upscale_boxes(boxes, scale):
+    """(x, y, w, h) boxes on a pyramid level -> full-resolution boxes."""
+    if scale == 1:
+        return list(boxes)
+    return [tuple(int(round(v / scale)) for v in box) for box in boxes]
@@ -0,0 +1,57 @@
+import os
+import time
+import threading
+
+# ---------------- MODEL REGISTRY (ONE LAZY EASYOCR READER PER PROCESS) ----------------
+# Loading EasyOCR (PyTorch + detection/recognition weights) takes seconds, so
+# it must not happen at import time. Every agent in a process asks the
+# registry for the reader: it is loaded once on first use (or by
+# ocr_engines.warm_up, which also reports readiness) and shared by OCRAgent,
+# table_detector and postprocess_agent.
+
+_lock = threading.Lock()
+_readers = {}
+
+
+def _load(languages):
+    print(f" [Model Registry] Loading EasyOCR {list(languages)}...")
+    start = time.perf_counter()
+    try:
+        import easyocr  # heavy import (torch) kept out of module import time
+        reader = easyocr.Reader(list(languages), gpu=False, verbose=False)
+    except Exception as e:
+        print(f" [Model Registry] ⚠️  EasyOCR failed to load: {e}")
+        raise
+
+    elapsed = round(time.perf_counter() - start, 2)
+    _readers[languages] = reader
+    print(f" [Model Registry] ✅ EasyOCR (ML Engine) Loaded in {elapsed}s.")
+    return reader
+
+
+def get_reader(languages=("en",)):
+    """
+    Returns the process-wide EasyOCR reader, loading it on first use.
+    Raises if the model cannot be loaded.
+    """
+    languages = tuple(languages)
+    reader = _readers.get(languages)
+    if reader is None:
+        with _lock:
+            reader = _readers.get(languages)
+            if reader is None:
+                reader = _load(languages)
+    return reader
+
+
+def share_cores(n_processes):
+    """
+    Limits PyTorch to this process's share of the CPU cores, so several
+    OCR processes on one box do not oversubscribe it.
+    """
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, n_processes)))
+    except ImportError:
+        pass
+
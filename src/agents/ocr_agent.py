@@ -1,47 +1,155 @@
+import os
+import time
 import pandas as pd
 import numpy as np
-import easyocr
 import cv2
-import sys
-from pdf2image import convert_from_path #
+import multiprocessing
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from src.agents.document_loader import Document, load_document
+from src.telemetry import add_time
+from src.agents.ocr_engines import (
+    ENGINES, OCREngineError, CLEAN_MIN_CONTRAST, CLEAN_MAX_MIDTONES, make_engine, page_quality, is_clean
+)
+from src.agents import ocr_engines
+from src.agents.table_structure import extract_table
+from src.agents.column_detector import detect_columns_batch
+from src.agents.image_pyramid import LAYOUT_TEXT_PX
+from src.agents.preprocess import graph_with, run_stage
+from src.agents import model_registry
+from src.agents.pdf_text_layer import extract_text_layer, ink_coverage
 import warnings
 
 warnings.filterwarnings("ignore")
 
+# How a page's text becomes a table:
+# - "clustered": detect text boxes, group them into rows / columns by position
+# - "structured": find the row / column grid first, then read every cell
+EXTRACTION_MODES = ("clustered", "structured")
+
 class OCRAgent:
-    def __init__(self):
-        self.reader = None
-        self.demo_mode = False
+    # Everything that changes the extracted output. Used as part of the
+    # result-cache key, so bump "version" when the extraction logic changes.
+    DEFAULT_SETTINGS = {
+        "version": 4,
+        "engine": os.getenv("FINVISION_OCR_ENGINE", "easyocr"),  # default; see ocr_engines.ENGINES
+        "languages": ["en"],
+        "clean_min_contrast": CLEAN_MIN_CONTRAST,  # "auto": Tesseract only for pages this clean
+        "clean_max_midtones": CLEAN_MAX_MIDTONES,
+        "blur_kernel": 5,
+        "threshold_block_size": 11,
+        "threshold_c": 2,
+        "deskew": True,  # straighten skewed scans before detection / recognition
+        "mode": os.getenv("FINVISION_EXTRACTION_MODE", "clustered"),  # default; see EXTRACTION_MODES
+        "row_tolerance": 0.5,  # x median text-box height
+        "layout_text_px": LAYOUT_TEXT_PX,  # text detection on a pyramid level; 0 = full resolution
+        "pdf_dpi": 200,
+        "use_text_layer": True,     # born-digital PDFs: read words instead of OCR
+        "text_layer_min_words": 3,  # fewer words than this => treat page as scanned
+        # ...as are pages whose words cover less of their ink than this (a scan
+        # with a footer / stamp / Bates number in its text layer: < 0.05;
+        # born-digital pages: 0.3 with a large logo, 0.6-1.0 otherwise)
+        "text_layer_min_coverage": 0.2,
+        "text_layer_probe_dpi": 72,  # render used to measure that coverage
+    }
+
+    def __init__(self, settings=None, page_workers=None, chunk_size=None, batched=None, batch_size=None, workers=None):
+        # Demo rows instead of an error when no OCR engine can run (env: FINVISION_DEMO_DATA)
+        self.demo_data = os.getenv("FINVISION_DEMO_DATA", "0") == "1"
+        self.used_fallback = False  # True when the last result is demo data
+        self.settings = {**self.DEFAULT_SETTINGS, **(settings or {})}
+        self.engine_counts = {}  # pages read per engine, last document
+        self._engines = {}
+        self._warned = set()
+        self.graph = self._build_graph()
+        self.stage_timings = {}  # ms per preprocessing stage, last document
+        self.timings = {}  # ms per phase (rasterize, preprocess, detect, recognize, ...), last document
+
+        # PDF page parallelism (env: FINVISION_OCR_WORKERS / FINVISION_PDF_CHUNK)
+        self.page_workers = page_workers or int(os.getenv("FINVISION_OCR_WORKERS", "1"))
+        self.chunk_size = chunk_size or int(os.getenv("FINVISION_PDF_CHUNK", str(max(2, self.page_workers))))
+        self._page_pool = None
+
+        # Batched recognition (env: FINVISION_OCR_BATCHED / FINVISION_OCR_BATCH_SIZE / FINVISION_OCR_LOADER_WORKERS)
+        self.batched = (os.getenv("FINVISION_OCR_BATCHED", "1") == "1") if batched is None else batched
+        self.batch_size = batch_size or int(os.getenv("FINVISION_OCR_BATCH_SIZE", "32"))
+        self.workers = workers if workers is not None else int(os.getenv("FINVISION_OCR_LOADER_WORKERS", "0"))
         
-        print(" [OCR Agent] Initializing...")
-        try:
-            self.reader = easyocr.Reader(['en'], gpu=False, verbose=False) 
-            print(" [OCR Agent] ✅ EasyOCR (ML Engine) Loaded Successfully.")
-        except ImportError as e:
-            print(f" [OCR Agent] ⚠️  Dependency Error: {e}")
-            self.demo_mode = True
-        except Exception as e:
-            print(f" [OCR Agent] ⚠️  Unexpected Init Error: {e}")
-            self.demo_mode = True
+        # OCR engines (EasyOCR model, Tesseract binary) are loaded lazily
+        print(" [OCR Agent] Initialized (model loads on first use).")
+
+    def _engine(self, name):
+        """This agent's "easyocr" / "tesseract" engine (see ocr_engines.py)."""
+        if name not in self._engines:
+            self._engines[name] = make_engine(
+                name, self.settings["languages"], batched=self.batched, batch_size=self.batch_size, workers=self.workers
+            )
+        return self._engines[name]
+
+    def _available_engines(self, engine):
+        """
+        Loads the engine(s) behind `engine` and returns the names that can
+        run. "auto" keeps working on one of its two engines (with a
+        warning); raises OCREngineError when nothing can run.
+        """
+        names = ("tesseract", "easyocr") if engine == "auto" else (engine,)
+        available, errors = [], []
+        for name in names:
+            try:
+                self._engine(name).load()
+                available.append(name)
+            except OCREngineError as e:
+                errors.append(str(e))
+        if not available:
+            raise OCREngineError(" ".join(errors))
+        if errors and errors[0] not in self._warned:
+            # Once per agent, not once per page group
+            self._warned.add(errors[0])
+            print(f" [OCR Agent] ⚠️  {errors[0]}; 'auto' reads every page with {available[0]}.")
+        return available
+
+    def _pick_engines(self, pages, engine):
+        """Engine name per page: "auto" sends clean pages (is_clean) to Tesseract."""
+        available = self._available_engines(engine)
+        if len(available) == 1:
+            return available * len(pages)
+        start = time.perf_counter()
+        picks = []
+        for page in pages:
+            clean = is_clean(page_quality(page.stages.get("gray", self.graph)),
+                             self.settings["clean_min_contrast"], self.settings["clean_max_midtones"])
+            picks.append("tesseract" if clean else "easyocr")
+        add_time(self.timings, "triage", start)
+        return picks
+
+    def _build_graph(self):
+        """This agent's view of the shared preprocessing graph (preprocess.py)."""
+        binarize = {
+            "ksize": self.settings["blur_kernel"],
+            "block_size": self.settings["threshold_block_size"],
+            "c": self.settings["threshold_c"],
+        }
+        overrides = {
+            "ocr": binarize,
+            "ocr_layout": binarize,
+            "layout": {"target": self.settings["layout_text_px"]},
+        }
+        if not self.settings["deskew"]:
+            overrides["deskewed"] = {"op": "identity"}
+        return graph_with(overrides)
 
     def _preprocess_image(self, img_array):
         """
         Enhances image for better OCR accuracy.
         Applies: Grayscale -> Gaussian Blur -> Adaptive Thresholding
+        (Pages go through the memoized stage graph instead; this is for arrays.)
         """
         try:
             if len(img_array.shape) == 3:
                 gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
             else:
                 gray = img_array
-
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-            binary = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            return binary
+            return run_stage(gray, self.graph["ocr"])
         except Exception as e:
             print(f" [OCR Agent] Preprocessing warning: {e}. Using raw image.")
             return img_array
@@ -49,37 +157,71 @@ class OCRAgent:
     def _results_to_dataframe(self, results):
         """
         Converts raw EasyOCR results [(bbox, text, conf), ...] into a 
-        structured DataFrame using Y-coordinate clustering.
+        structured DataFrame using vectorized Y/X clustering:
+        - rows: boxes sorted by centroid Y, new row wherever the gap to the
+          previous box exceeds `row_tolerance` x median box height
+        - columns: column extents learnt from rows with the most common
+          number of boxes; every box goes to the column it overlaps most
         """
         if not results:
             return pd.DataFrame()
 
-        results.sort(key=lambda x: x[0][0][1]) 
+        n = len(results)
+        # Opposite corners (top-left, bottom-right) of each quad, flattened in
+        # one pass: much cheaper than np.array() on the nested point lists
+        corners = np.fromiter(
+            chain.from_iterable((b[0][0], b[0][1], b[2][0], b[2][1]) for b, _, _ in results),
+            dtype=float, count=n * 4
+        ).reshape(n, 4)
+        texts = np.array([text.strip() for _, text, _ in results], dtype=object)
+
+        x0, x1 = np.minimum(corners[:, 0], corners[:, 2]), np.maximum(corners[:, 0], corners[:, 2])
+        y0, y1 = np.minimum(corners[:, 1], corners[:, 3]), np.maximum(corners[:, 1], corners[:, 3])
+        cy = (y0 + y1) / 2
+
+        # --- ROWS: sort by centroid, break where the vertical gap is large ---
+        tolerance = max(1.0, self.settings["row_tolerance"] * float(np.median(y1 - y0)))
+        order = np.argsort(cy, kind="stable")
+        breaks = np.diff(cy[order]) > tolerance
+        row_ids = np.empty(n, dtype=np.int64)
+        row_ids[order] = np.concatenate(([0], np.cumsum(breaks)))
+        n_rows = int(row_ids.max()) + 1
 
-        rows = []
-        current_row = []
-        y_tolerance = 20 
+        # --- COLUMNS: learn edges from rows with the typical number of boxes ---
+        counts = np.bincount(row_ids, minlength=n_rows)
+        multi = counts[counts > 1]
+        n_cols = int(np.bincount(multi).argmax()) if multi.size else 1
 
-        previous_y = results[0][0][0][1]
+        col_ids = np.zeros(n, dtype=np.int64)
+        if n_cols > 1:
+            full = np.flatnonzero(counts[row_ids] == n_cols)
+            # Rank of each box inside its (full) row, left → right
+            full = full[np.lexsort((x0[full], row_ids[full]))]
+            rank = np.arange(full.size) % n_cols
 
-        for bbox, text, conf in results:
-            current_y = bbox[0][1]
+            left = np.bincount(rank, weights=x0[full], minlength=n_cols) / (full.size // n_cols)
+            right = np.bincount(rank, weights=x1[full], minlength=n_cols) / (full.size // n_cols)
+            # Horizontal overlap of every box with every column extent. A box
+            # goes to the first column it substantially covers (wide headers
+            # over right-aligned numbers, titles spanning several columns),
+            # otherwise to the column it overlaps most / is nearest to.
+            overlap = np.minimum(x1[:, None], right[None, :]) - np.maximum(x0[:, None], left[None, :])
+            covered = overlap >= 0.5 * np.minimum((x1 - x0)[:, None], (right - left)[None, :])
+            col_ids = np.where(covered.any(axis=1), covered.argmax(axis=1), overlap.argmax(axis=1))
 
-            if abs(current_y - previous_y) > y_tolerance:
-                current_row.sort(key=lambda x: x['x'])
-                rows.append([item['text'] for item in current_row])
-                
-                current_row = []
-                previous_y = current_y
-            current_row.append({'text': text.strip(), 'x': bbox[0][0]})
+        # --- GRID: place texts; boxes sharing a cell are joined left → right ---
+        cell = row_ids * n_cols + col_ids
+        order = np.lexsort((x0, cell))
+        cell, texts = cell[order], texts[order]
 
-        if current_row:
-            current_row.sort(key=lambda x: x['x'])
-            rows.append([item['text'] for item in current_row])
+        grid = np.full(n_rows * n_cols, "", dtype=object)
+        unique_cells, first = np.unique(cell, return_index=True)
+        if unique_cells.size == cell.size:
+            grid[cell] = texts
+        else:
+            grid[unique_cells] = [" ".join(t) for t in np.split(texts, first[1:])]
 
-        max_cols = max([len(r) for r in rows]) if rows else 0
-        padded_rows = [row + [''] * (max_cols - len(row)) for row in rows]
-        df = pd.DataFrame(padded_rows)
+        df = pd.DataFrame(grid.reshape(n_rows, n_cols).tolist())
         
         if not df.empty and len(df) > 1:
             df.columns = df.iloc[0]
@@ -87,70 +229,288 @@ class OCRAgent:
             
         return df
 
-    def extract_structured_data(self, file_path):
+    def _ocr_page(self, page, mode=None, engine=None):
         """
-        Main Entry Point: Handles both Images (.png/.jpg) and PDFs.
+        Preprocess -> Inference -> Structure for a single Page.
         """
-        print(f" [OCR Agent] Scanning: {file_path}")
+        return self._ocr_pages([page], mode, engine)[0]
 
-        if self.demo_mode:
-            return self._get_demo_data()
+    def _ocr_pages(self, pages, mode=None, engine=None):
+        """
+        Preprocess -> Inference -> Structure for a group of Pages, in the
+        given extraction mode (default: settings["mode"]) and OCR engine
+        (default: settings["engine"]; "auto" picks one per page).
+        """
+        picks = self._pick_engines(pages, engine or self.settings["engine"])
+        frames = [None] * len(pages)
+        for name in dict.fromkeys(picks):
+            group = [i for i, pick in enumerate(picks) if pick == name]
+            for i, df in zip(group, self._read_pages([pages[i] for i in group], mode, self._engine(name))):
+                frames[i] = df
+            self.engine_counts[name] = self.engine_counts.get(name, 0) + len(group)
 
-        try:
-            str_path = str(file_path)
-            all_dfs = []
-
-            # --- CASE A: PDF DOCUMENT ---
-            if str_path.lower().endswith('.pdf'):
-                print(" [OCR Agent] 📄 PDF detected. Converting pages to images...")
-                
-                # Convert PDF pages to list of PIL Images
-                pil_images = convert_from_path(str_path)
-                
-                for i, pil_img in enumerate(pil_images):
-                    print(f" [OCR Agent] Processing Page {i+1}/{len(pil_images)}...")
-                    
-                    # Convert PIL -> OpenCV (Numpy)
-                    open_cv_image = np.array(pil_img)
-                    open_cv_image = open_cv_image[:, :, ::-1].copy() # Convert RGB to BGR
-                    
-                    # Preprocess & Inference
-                    processed_img = self._preprocess_image(open_cv_image)
-                    results = self.reader.readtext(processed_img, detail=1)
-                    
-                    # Structure Data
-                    page_df = self._results_to_dataframe(results)
-                    all_dfs.append(page_df)
-                
-                # Combine all pages into one big table
-                if all_dfs:
-                    final_df = pd.concat(all_dfs, ignore_index=True)
-                    return final_df
-                else:
-                    return pd.DataFrame()
-
-            # --- CASE B: STANDARD IMAGE ---
+        for page in pages:
+            self._merge_timings(stage_timings=page.stages.timings)
+        return frames
+
+    def _read_pages(self, pages, mode, engine):
+        """
+        Pages read by one engine. Structured pages without a detectable grid
+        fall back to clustering.
+        """
+        frames = [None] * len(pages)
+        structured = (mode or self.settings["mode"]) == "structured"
+        if structured:
+            # Stages first, so "detect" times the grid detection alone
+            for page in pages:
+                for name in ("ocr", "rows", "columns"):
+                    page.stages.get(name, self.graph)
+            # One vectorized column segmentation for the whole group
+            start = time.perf_counter()
+            columns = detect_columns_batch([page.stages for page in pages], graph=self.graph)
+            add_time(self.timings, "detect", start)
+            frames = [
+                extract_table(page.stages, engine, self.graph, columns=cols, timings=self.timings)
+                for page, cols in zip(pages, columns)
+            ]
+        rest = [i for i, df in enumerate(frames) if df is None]
+        if structured and rest:
+            print(f" [OCR Agent] ⚠️  No table grid on {len(rest)} page(s); using text-box clustering.")
+        if rest:
+            for i, df in zip(rest, self._cluster_pages([pages[i] for i in rest], engine)):
+                frames[i] = df
+        return frames
+
+    def _merge_timings(self, timings=None, stage_timings=None):
+        for name, ms in (timings or {}).items():
+            self.timings[name] = self.timings.get(name, 0.0) + ms
+        for name, ms in (stage_timings or {}).items():
+            self.stage_timings[name] = self.stage_timings.get(name, 0.0) + ms
+            self.timings["preprocess"] = self.timings.get("preprocess", 0.0) + ms
+
+    def _cluster_pages(self, pages, engine):
+        """
+        Clustered mode: free text boxes from `engine`, grouped by
+        _results_to_dataframe. With batched EasyOCR, text detection runs over
+        all pages first and recognition then processes every box of a page
+        in large batches.
+        """
+        # Memoized per page: the row / column detectors reuse gray, deskewed and layout
+        processed = [page.stages.get("ocr", self.graph) for page in pages]
+
+        # Text detection runs on each page's pyramid level (sized from its
+        # text height); recognition crops the boxes at full resolution
+        layout = None
+        if self.settings["layout_text_px"] and engine.detects_on_layout:
+            layout = []
+            for page, full in zip(pages, processed):
+                level = page.stages.get("layout", self.graph)
+                layout.append(full if level.shape == full.shape else page.stages.get("ocr_layout", self.graph))
+        results = engine.read_pages(processed, layout_images=layout, timings=self.timings)
+
+        start = time.perf_counter()
+        frames = [self._results_to_dataframe(r) for r in results]
+        add_time(self.timings, "structure", start)
+        return frames
+
+    def _timed_pages(self, pages):
+        # Rendering happens lazily inside the page iterator: time each step
+        pages = iter(pages)
+        while True:
+            start = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                return
+            add_time(self.timings, "rasterize", start)
+            yield page
+
+    def load_document(self, file_path):
+        """Opens a PDF/image with this agent's rendering settings."""
+        return load_document(file_path, dpi=self.settings["pdf_dpi"], chunk_size=self.chunk_size)
+
+    def _text_layer_pages(self, document, layer):
+        """
+        Yields a low-resolution render of every page whose text layer holds
+        its content: at least text_layer_min_words words, covering at least
+        text_layer_min_coverage of the page's ink (pdf_text_layer.ink_coverage).
+        The rest of the pages are scanned and go to OCR.
+        """
+        candidates = [i for i, results in layer.items() if len(results) >= self.settings["text_layer_min_words"]]
+        if not candidates:
+            return
+        dpi = self.settings["text_layer_probe_dpi"]
+        probe = load_document(document.path, dpi=dpi, chunk_size=self.chunk_size)
+        for page in probe.iter_pages(candidates):
+            coverage = ink_coverage(layer[page.index], page.gray, dpi / self.settings["pdf_dpi"])
+            if coverage >= self.settings["text_layer_min_coverage"]:
+                yield page
             else:
-                # Read image using OpenCV
-                img = cv2.imread(str_path)
-                if img is None:
-                    # Fallback if cv2 fails to read path
-                    results = self.reader.readtext(str_path, detail=1)
-                else:
-                    processed_img = self._preprocess_image(img)
-                    results = self.reader.readtext(processed_img, detail=1)
-                
-                return self._results_to_dataframe(results)
+                print(f" [OCR Agent] Page {page.index + 1}: text layer covers {coverage:.0%} of its ink; using OCR.")
+
+    def _extract_pages(self, document, on_render=None, mode=None, on_page=None, engine=None):
+        """
+        OCRs every page of a document and merges the per-page tables in page
+        order. With page_workers > 1, pages are fanned out to a process pool
+        of OCR workers (each with its own EasyOCR reader); at most
+        `max_in_flight` rendered pages are held in memory at once.
+        `on_render(page)` is called in this process once for every page: its
+        OCR render, or the low-resolution render that vetted its text layer;
+        `on_page(index, df)` as soon as a page's table is ready (in completion
+        order, which differs from page order with page workers).
+        `mode` is the extraction mode of scanned pages (see EXTRACTION_MODES),
+        `engine` their OCR engine (see ocr_engines.ENGINES).
+        """
+        page_count = document.page_count
+        page_dfs = {}
+
+        def finish(index, df):
+            page_dfs[index] = df
+            if on_page:
+                on_page(index, df)
+
+        # Fast path: pages with an embedded text layer skip rasterization + OCR
+        scanned = list(range(page_count))
+        if document.is_pdf and self.settings["use_text_layer"]:
+            start = time.perf_counter()
+            layer = extract_text_layer(document.path, dpi=self.settings["pdf_dpi"]) or {}
+            for page in self._text_layer_pages(document, layer):
+                if on_render:
+                    on_render(page)
+                finish(page.index, self._results_to_dataframe(layer[page.index]))
+            scanned = [i for i in scanned if i not in page_dfs]
+            add_time(self.timings, "text_layer", start)
+            if page_dfs:
+                print(f" [OCR Agent] ⚡ {len(page_dfs)} page(s) read from the PDF text layer, {len(scanned)} need OCR.")
+
+        if self.page_workers <= 1 or len(scanned) <= 1:
+            # Pages are OCR'd in groups of `chunk_size` so detection can be batched
+            group = []
+
+            def flush():
+                print(f" [OCR Agent] Processing Pages {group[0].index+1}-{group[-1].index+1}/{page_count}...")
+                for p, page_df in zip(group, self._ocr_pages(group, mode, engine)):
+                    finish(p.index, page_df)
+                group.clear()
+
+            for page in self._timed_pages(document.iter_pages(scanned)):
+                if on_render:
+                    on_render(page)
+                group.append(page)
+                if len(group) >= self.chunk_size:
+                    flush()
+            if group:
+                flush()
+        else:
+            pool = self._get_page_pool()
+            max_in_flight = self.page_workers * 2
+            pending = {}
+
+            def collect(done):
+                for future in done:
+                    i = pending.pop(future)
+                    page_df, timings, stage_timings, engine_counts = future.result()
+                    self._merge_timings(timings, stage_timings)
+                    for name, n in engine_counts.items():
+                        self.engine_counts[name] = self.engine_counts.get(name, 0) + n
+                    finish(i, page_df)
+                    print(f" [OCR Agent] Page {i+1}/{page_count} done ({len(page_dfs)}/{page_count}).")
+
+            for page in self._timed_pages(document.iter_pages(scanned)):
+                if on_render:
+                    on_render(page)
+                # Backpressure: wait for a worker before rendering more pages
+                while len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[pool.submit(_ocr_page_in_worker, page, mode, engine)] = page.index
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if self.stage_timings:
+            spent = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.stage_timings.items())
+            print(f" [OCR Agent] Preprocessing: {spent}")
+        if self.timings:
+            spent = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.timings.items())
+            print(f" [OCR Agent] Timings: {spent}")
+        if self.engine_counts:
+            used = ", ".join(f"{name} {n} page(s)" for name, n in self.engine_counts.items())
+            print(f" [OCR Agent] Engines: {used}")
+
+        # Combine all pages into one big table (page order preserved)
+        all_dfs = [page_dfs[i] for i in sorted(page_dfs)]
+        if all_dfs:
+            return pd.concat(all_dfs, ignore_index=True)
+        return pd.DataFrame()
+
+    def _get_page_pool(self):
+        if self._page_pool is None:
+            print(f" [OCR Agent] Starting {self.page_workers} page OCR workers...")
+            self._page_pool = ProcessPoolExecutor(
+                max_workers=self.page_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker,
+                initargs=(self.settings, self.page_workers, self.batched, self.batch_size, self.workers),
+            )
+        return self._page_pool
+
+    def close(self):
+        """Stops the page OCR worker pool (if one was started)."""
+        if self._page_pool is not None:
+            self._page_pool.shutdown(wait=False, cancel_futures=True)
+            self._page_pool = None
+
+    def extract_structured_data(self, source, on_render=None, mode=None, on_page=None, engine=None):
+        """
+        Main Entry Point: Handles both Images (.png/.jpg) and PDFs.
+        `source` is a file path or an already loaded Document (whose cached
+        pages are reused instead of being decoded again).
+        `on_render(page)` sees every page rendered for OCR or for the text
+        layer check (e.g. for the signature check), so pages are not
+        rasterized twice.
+        `on_page(index, df)` receives each page's table as soon as it is
+        extracted (e.g. to stream partial results); never called for demo rows.
+        `mode` and `engine` override settings["mode"] / settings["engine"]
+        for this document.
+        Raises OCREngineError when no OCR engine can run, and any inference
+        error as is; demo rows are returned instead only with
+        FINVISION_DEMO_DATA=1.
+        """
+        print(f" [OCR Agent] Scanning: {getattr(source, 'path', source)}")
+        self.used_fallback = False
+        self.stage_timings = {}
+        self.timings = {}
+        self.engine_counts = {}
+        mode = mode or self.settings["mode"]
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode {mode!r}. Choose one of: {', '.join(EXTRACTION_MODES)}")
+        engine = engine or self.settings["engine"]
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown OCR engine {engine!r}. Choose one of: {', '.join(ENGINES)}")
+
+        try:
+            # OCR engines load only once a page needs OCR (_pick_engines, or the
+            # page workers): text-layer PDFs never touch them
+            document = source if isinstance(source, Document) else self.load_document(source)
+            if document.is_pdf:
+                print(f" [OCR Agent] 📄 PDF detected ({document.page_count} pages). Streaming pages to OCR...")
+            return self._extract_pages(document, on_render=on_render, mode=mode, on_page=on_page, engine=engine)
 
         except Exception as e:
+            if not self.demo_data:
+                print(f" [OCR Agent] ❌ Inference failed: {e}")
+                raise
             print(f" [OCR Agent] ❌ Inference failed: {e}. Returning fallback.")
             return self._get_demo_data()
 
     def _get_demo_data(self):
         """
-        Returns structured data for testing/demo if ML engine fails.
+        Returns structured data for testing/demo if ML engine fails
+        (only with FINVISION_DEMO_DATA=1).
         """
         print(" [OCR Agent] ℹ️  Using Fallback Data (Demo Mode)")
+        self.used_fallback = True
         data = {
             "Date": ["01/04/2017", "01/03/2017", "12/30/2016", "12/29/2016", "12/28/2016"],
             "Open": [62.48, 62.79, 62.96, 62.86, 63.40],
@@ -159,4 +519,27 @@ class OCRAgent:
             "Close / Last": [62.30, 62.58, 62.14, 62.90, 62.99],
             "Volume": ["21,325,140", "20,655,190", "25,575,720", "10,248,460", "14,348,340"]
         }
-        return pd.DataFrame(data)
\ No newline at end of file
+        return pd.DataFrame(data)
+
+
+# ---------------- PAGE OCR WORKERS ----------------
+# Module-level so they can be pickled into the page worker processes.
+_page_agent = None
+
+
+def _init_page_worker(settings, n_workers, batched, batch_size, workers):
+    global _page_agent
+    # Split the cores between workers instead of oversubscribing them
+    model_registry.share_cores(n_workers)
+    _page_agent = OCRAgent(
+        settings=settings, page_workers=1,
+        batched=batched, batch_size=batch_size, workers=workers
+    )
+    ocr_engines.warm_up(settings["engine"], settings["languages"])
+
+
+def _ocr_page_in_worker(page, mode=None, engine=None):
+    # The page's timings (and the engine that read it) travel back with its table
+    _page_agent.timings, _page_agent.stage_timings, _page_agent.engine_counts = {}, {}, {}
+    df = _page_agent._ocr_page(page, mode, engine)
+    return df, _page_agent.timings, _page_agent.stage_timings, _page_agent.engine_counts
@@ -0,0 +1,251 @@
+import os
+import numpy as np
+import cv2
+
+from src.agents import model_registry
+from src.agents.batch_ocr import readtext_batched, readtext_cells
+from src.telemetry import timed
+
+# ---------------- OCR ENGINES (EASYOCR, TESSERACT, AUTO) ----------------
+# An engine turns page images into text boxes. Every engine speaks
+# EasyOCR's result format, so the table builders do not care which one ran:
+#   read_pages(images)        -> per image [(bbox, text, confidence)], bbox = 4 corner points
+#   read_cells(image, cells)  -> [(text, confidence)] per (x, y, w, h) cell of a known grid
+#
+# - "easyocr":   CRAFT detection + CRNN recognition (PyTorch). Robust on
+#                camera shots, noise and low contrast; seconds per page on CPU.
+# - "tesseract": local Tesseract through pytesseract. One LSTM pass per page,
+#                an order of magnitude cheaper, but brittle on hard pages.
+# - "auto":      Tesseract for clean, high-contrast pages, EasyOCR for the rest
+#                (see page_quality / is_clean).
+
+ENGINES = ("easyocr", "tesseract", "auto")
+
+# --oem 1: LSTM recognizer only; --psm 6: the page is one uniform block of text (table rows)
+TESSERACT_CONFIG = os.getenv("FINVISION_TESSERACT_CONFIG", "--oem 1 --psm 6")
+
+# Words of one line closer than this (x word height) are one text box, as
+# EasyOCR joins the words of a cell; column gaps are much wider
+TESSERACT_MERGE_GAP = 1.0
+
+# EasyOCR language codes -> Tesseract traineddata names
+TESSERACT_LANGUAGES = {"en": "eng", "hi": "hin", "fr": "fra", "de": "deu", "es": "spa", "it": "ita", "pt": "por"}
+
+# "auto" sends a page to Tesseract when ink and paper are this far apart
+# (grey levels) and few pixels sit in between (blur, noise, shading)
+CLEAN_MIN_CONTRAST = 128
+CLEAN_MAX_MIDTONES = 0.03
+
+
+class OCREngineError(RuntimeError):
+    """An OCR engine cannot run here (package, binary or model missing)."""
+
+
+class EasyOCREngine:
+    name = "easyocr"
+
+    def __init__(self, languages=("en",), batched=True, batch_size=32, workers=0):
+        self.languages = tuple(languages)
+        self.batched = batched
+        self.detects_on_layout = batched  # read_pages takes downscaled layout_images
+        self.batch_size = batch_size
+        self.workers = workers
+
+    @property
+    def reader(self):
+        """The process-wide EasyOCR reader (model_registry)."""
+        try:
+            return model_registry.get_reader(self.languages)
+        except Exception as e:
+            raise OCREngineError(f"EasyOCR is unavailable: {e}") from e
+
+    def load(self):
+        self.reader
+        return self
+
+    def read_pages(self, images, layout_images=None, timings=None):
+        """
+        Batched mode: detection over all images first (on `layout_images`,
+        downscaled copies, when given), then batched recognition per image.
+        """
+        if self.batched:
+            return readtext_batched(
+                self.reader, images, batch_size=self.batch_size, workers=self.workers,
+                layout_images=layout_images, timings=timings
+            )
+        # readtext detects and recognizes in one call: timed as "recognize"
+        with timed(timings, "recognize"):
+            return [self.reader.readtext(img, detail=1) for img in images]
+
+    def read_cells(self, image, cells, timings=None):
+        return readtext_cells(self.reader, image, cells, batch_size=self.batch_size, workers=self.workers,
+                              timings=timings)
+
+
+class TesseractEngine:
+    name = "tesseract"
+    detects_on_layout = False
+
+    def __init__(self, languages=("en",), config=TESSERACT_CONFIG):
+        self.lang = "+".join(TESSERACT_LANGUAGES.get(code, code) for code in languages)
+        self.config = config
+        self._tesseract = None
+
+    def load(self):
+        if self._tesseract is None:
+            try:
+                import pytesseract
+                pytesseract.get_tesseract_version()  # raises when the binary is missing
+            except Exception as e:
+                raise OCREngineError(f"Tesseract is unavailable: {e}") from e
+            self._tesseract = pytesseract
+        return self
+
+    def _words(self, image):
+        # One Tesseract pass over the whole image: its words, with boxes
+        tesseract = self.load()._tesseract
+        return tesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                       output_type=tesseract.Output.DICT)
+
+    def read_pages(self, images, layout_images=None, timings=None):
+        """Tesseract detects and recognizes in one pass: timed as "recognize"."""
+        with timed(timings, "recognize"):
+            return [tesseract_boxes(self._words(img)) for img in images]
+
+    def read_cells(self, image, cells, timings=None):
+        """
+        Reads the whole image once and routes every word to the cell that
+        holds its centre (one pass per page instead of one per cell).
+        """
+        out = [("", 0.0)] * len(cells)
+        if not cells:
+            return out
+        with timed(timings, "recognize"):
+            words = _word_table(self._words(image))
+        if words is None:
+            return out
+
+        boxes = np.asarray(cells, dtype=np.int64).reshape(-1, 4)
+        x0, y0 = boxes[:, 0], boxes[:, 1]
+        x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+        left, top, width, height, texts, conf, _ = words
+        cx, cy = (left + width / 2)[:, None], (top + height / 2)[:, None]
+        inside = (x0 <= cx) & (cx < x1) & (y0 <= cy) & (cy < y1)
+        owner = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+        # Words of a cell are joined left → right
+        order = np.lexsort((left, owner))
+        order = order[owner[order] >= 0]
+        if order.size == 0:
+            return out
+        owner, texts, conf = owner[order], texts[order], conf[order]
+        cell_ids, first = np.unique(owner, return_index=True)
+        for k, group_texts, group_conf in zip(cell_ids, np.split(texts, first[1:]), np.split(conf, first[1:])):
+            out[k] = (" ".join(group_texts), float(group_conf.mean()) / 100.0)
+        return out
+
+
+def _word_table(data):
+    """
+    Words of an image_to_data dict as arrays: (left, top, width, height,
+    text, conf, line), where `line` is the (block, paragraph, line) number
+    of each word. None when there are no words.
+    """
+    texts = np.array([str(t).strip() for t in data["text"]], dtype=object)
+    conf = np.asarray(data["conf"], dtype=float)
+    keep = (conf >= 0) & (texts != "")  # conf -1: block / paragraph / line rows
+    if not keep.any():
+        return None
+    left, top, width, height = (np.asarray(data[k], dtype=float)[keep] for k in ("left", "top", "width", "height"))
+    line = np.column_stack([np.asarray(data[k])[keep] for k in ("block_num", "par_num", "line_num")])
+    return left, top, width, height, texts[keep], conf[keep], line
+
+
+def tesseract_boxes(data, merge_gap=TESSERACT_MERGE_GAP):
+    """
+    Converts pytesseract.image_to_data output into EasyOCR-style results
+    [(bbox, text, confidence)]. Tesseract reports single words; the words
+    of one line that are less than `merge_gap` word heights apart are
+    joined into one box, as EasyOCR boxes whole phrases.
+    """
+    words = _word_table(data)
+    if words is None:
+        return []
+    left, top, width, height, texts, conf, line = words
+    order = np.lexsort((left, line[:, 2], line[:, 1], line[:, 0]))
+    left, top, width, height = left[order], top[order], width[order], height[order]
+    texts, conf, line = texts[order], conf[order], line[order]
+    right, bottom = left + width, top + height
+
+    same_line = (line[1:] == line[:-1]).all(axis=1)
+    gap = left[1:] - right[:-1]
+    joined = same_line & (gap < merge_gap * np.maximum(height[1:], height[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], ~joined)))
+
+    x0, y0 = np.minimum.reduceat(left, starts), np.minimum.reduceat(top, starts)
+    x1, y1 = np.maximum.reduceat(right, starts), np.maximum.reduceat(bottom, starts)
+    score = np.add.reduceat(conf, starts) / np.diff(np.append(starts, conf.size)) / 100.0
+    phrases = [" ".join(group) for group in np.split(texts, starts[1:])]
+    return [
+        ([[a, b], [c, b], [c, d], [a, d]], text, float(s))
+        for a, b, c, d, text, s in zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist(), phrases, score)
+    ]
+
+
+# ---------------- AUTO POLICY ----------------
+
+def page_quality(gray):
+    """
+    Contrast of a grey page from its histogram, split into ink and paper at
+    the Otsu threshold. Returns {"contrast": paper - ink mean level,
+    "midtones": share of pixels more than a quarter of the contrast away
+    from both means}. Clean scans: contrast ~200, midtones < 0.02; blurred,
+    noisy or unevenly lit pages have many more midtones.
+    """
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    total = hist.sum()
+    w0 = np.cumsum(hist)
+    mu = np.cumsum(hist * levels)
+    w1 = total - w0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = np.where((w0 > 0) & (w1 > 0), (mu[-1] * w0 - mu * total) ** 2 / (w0 * w1), 0.0)
+    t = int(between.argmax())
+    ink = mu[t] / max(w0[t], 1.0)
+    paper = (mu[-1] - mu[t]) / max(w1[t], 1.0)
+
+    contrast = paper - ink
+    margin = contrast / 4
+    midtones = hist[(levels > ink + margin) & (levels < paper - margin)].sum() / max(total, 1.0)
+    return {"contrast": round(float(contrast), 1), "midtones": round(float(midtones), 4)}
+
+
+def is_clean(quality, min_contrast=CLEAN_MIN_CONTRAST, max_midtones=CLEAN_MAX_MIDTONES):
+    """True for pages the fast engine reads reliably (see page_quality)."""
+    return quality["contrast"] >= min_contrast and quality["midtones"] <= max_midtones
+
+
+def make_engine(name, languages=("en",), batched=True, batch_size=32, workers=0):
+    """A single engine ("easyocr" / "tesseract"); "auto" is resolved per page by the OCR agent."""
+    if name == "easyocr":
+        return EasyOCREngine(languages, batched=batched, batch_size=batch_size, workers=workers)
+    if name == "tesseract":
+        return TesseractEngine(languages)
+    raise ValueError(f"Unknown OCR engine {name!r}. Choose one of: {', '.join(ENGINES)}")
+
+
+def warm_up(name, languages=("en",)):
+    """
+    Loads the engine(s) behind `name` ahead of the first job. Returns
+    {"status": "ready" | "failed", "engines": {engine: state}}; "auto" is
+    ready when either engine is.
+    """
+    states = {}
+    for engine in (("tesseract", "easyocr") if name == "auto" else (name,)):
+        try:
+            make_engine(engine, languages).load()
+            states[engine] = "ready"
+        except OCREngineError as e:
+            states[engine] = f"failed: {e}"
+    ready = "ready" in states.values()
+    return {"status": "ready" if ready else "failed", "engines": states, "pid": os.getpid()}
@@ -0,0 +1,105 @@
+import re
+import html
+import shutil
+import subprocess
+import cv2
+import numpy as np
+
+# ---------------- PDF TEXT LAYER (BORN-DIGITAL FAST PATH) ----------------
+# PDFs generated by banking software already carry their text. `pdftotext
+# -bbox` (poppler-utils) prints every word with its box in PDF points; those
+# words are turned into EasyOCR-style results so they go through the same
+# row/column reconstruction without rasterizing or running OCR.
+#
+# A text layer alone does not make a page born-digital: scanned statements
+# often carry a few real words (scanner footer, bank stamp, Bates number)
+# over an image of the table. ink_coverage compares the words' boxes with
+# the ink of a low-resolution render, so such pages still go to OCR.
+
+PAGE_RE = re.compile(r'<page width="([\d.]+)" height="([\d.]+)">(.*?)</page>', re.S)
+WORD_RE = re.compile(
+    r'<word xMin="([\d.\-]+)" yMin="([\d.\-]+)" xMax="([\d.\-]+)" yMax="([\d.\-]+)">(.*?)</word>', re.S
+)
+
+
+def is_available():
+    return shutil.which("pdftotext") is not None
+
+
+def _merge_words(words, width_ths=0.5):
+    """
+    Joins neighbouring words on the same line into phrases, the way EasyOCR
+    groups characters into one box when the gap is < width_ths x line height.
+    `words` are (x0, y0, x1, y1, text) in reading order.
+    """
+    phrases = []
+    for x0, y0, x1, y1, text in words:
+        if phrases:
+            px0, py0, px1, py1, ptext = phrases[-1]
+            height = max(py1 - py0, y1 - y0)
+            same_line = abs(((py0 + py1) - (y0 + y1)) / 2) < 0.5 * height
+            if same_line and 0 <= x0 - px1 < width_ths * height:
+                phrases[-1] = (px0, min(py0, y0), x1, max(py1, y1), f"{ptext} {text}")
+                continue
+        phrases.append((x0, y0, x1, y1, text))
+    return phrases
+
+
+def extract_text_layer(pdf_path, dpi=200, timeout=60):
+    """
+    Returns {page_index: [(bbox, text, 1.0), ...]} with boxes scaled to
+    pixels at `dpi` (the resolution pages would be rasterized at).
+    Pages without a text layer map to an empty list. Returns None when
+    pdftotext is missing or fails, so callers fall back to OCR.
+    """
+    if not is_available():
+        return None
+
+    try:
+        proc = subprocess.run(
+            ["pdftotext", "-bbox", str(pdf_path), "-"],
+            capture_output=True, timeout=timeout, check=True
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f" [OCR Agent] ⚠️  pdftotext failed ({e}). Using OCR for all pages.")
+        return None
+
+    scale = dpi / 72.0
+    layer = {}
+    for i, (_, _, body) in enumerate(PAGE_RE.findall(proc.stdout.decode("utf-8", errors="replace"))):
+        words = [
+            (float(x0), float(y0), float(x1), float(y1), html.unescape(text).strip())
+            for x0, y0, x1, y1, text in WORD_RE.findall(body)
+        ]
+        words = [w for w in words if w[4]]
+
+        results = []
+        for x0, y0, x1, y1, text in _merge_words(words):
+            x0, y0, x1, y1 = (round(v * scale) for v in (x0, y0, x1, y1))
+            results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, 1.0))
+        layer[i] = results
+
+    return layer
+
+
+def ink_coverage(results, gray, scale=1.0, pad=2):
+    """
+    Share of a page's ink inside its text-layer boxes. `results` are
+    extract_text_layer boxes, `gray` a render of the page whose pixels are
+    `scale` x the boxes' pixels; boxes are padded by `pad` render pixels for
+    glyph edges. Born-digital pages: ~0.9 (the rest is rules and logos);
+    scans with a stray text layer: a few percent. 1.0 for a page without ink.
+    """
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    total = int(ink.sum())
+    if total == 0:
+        return 1.0
+
+    covered = np.zeros_like(ink)
+    h, w = ink.shape
+    for bbox, _, _ in results:
+        (x0, y0), (x1, y1) = bbox[0], bbox[2]
+        x0, y0 = max(0, int(x0 * scale) - pad), max(0, int(y0 * scale) - pad)
+        x1, y1 = min(w, int(np.ceil(x1 * scale)) + pad), min(h, int(np.ceil(y1 * scale)) + pad)
+        covered[y0:y1, x0:x1] = 1
+    return float((ink & covered).sum()) / total
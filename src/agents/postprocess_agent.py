@@ -1,10 +1,11 @@
-import cv2
 import re
 from pathlib import Path
 from typing import List, Dict
 
 from src.agents.column_detector import detect_columns
-from src.agents.ocr_agent import reader
+from src.agents.model_registry import get_reader
+from src.agents.batch_ocr import readtext_regions
+from src.agents.preprocess import stages_for
 
 # ---------------- POST-OCR STRUCTURE RECOVERY ----------------
 
@@ -32,7 +33,7 @@ def ocr_column(image, col_box):
     x, y, w, h = col_box
     roi = image[y:y+h, x:x+w]
 
-    results = reader.readtext(
+    results = get_reader().readtext(
         roi,
         detail=0,
         paragraph=False
@@ -42,21 +43,39 @@ def ocr_column(image, col_box):
     return cleaned
 
 
+def ocr_columns(image, col_boxes, batch_size=32):
+    """
+    Batched alternative to calling `ocr_column` per column: text is detected
+    in every column ROI first, then all boxes are recognized in one pass.
+    Returns cleaned text lines per column (top → bottom).
+    """
+    per_column = readtext_regions(get_reader(), image, col_boxes, batch_size=batch_size)
+
+    column_texts = []
+    for results in per_column:
+        # readtext orders lines top → bottom; keep that order after batching
+        results = sorted(results, key=lambda r: (r[0][0][1], r[0][0][0]))
+        column_texts.append([r[1].strip() for r in results if len(r[1].strip()) > 1])
+    return column_texts
+
+
 def parse_columns_to_table(image_path: Path) -> List[Dict]:
     """
     Image → Column detection → OCR per column → Row reconstruction
     """
 
-    image = cv2.imread(str(image_path))
-    if image is None:
+    # One stage cache: column detection and the crops share the deskewed page
+    stages = stages_for(image_path)
+    if stages is None:
         return []
+    image = stages.get("deskewed")
 
-    columns = detect_columns(image_path)
+    columns = detect_columns(stages)
     if len(columns) < 6:
         return []
 
-    # OCR each column independently
-    column_texts = [ocr_column(image, col) for col in columns]
+    # OCR all columns in one batched recognition pass
+    column_texts = ocr_columns(image, columns)
 
     date_col = column_texts[0]
     open_col = column_texts[1]
@@ -0,0 +1,229 @@
+import json
+import time
+import threading
+import cv2
+import numpy as np
+
+from src.agents.image_pyramid import LAYOUT_TEXT_PX, layout_level, half, to_gray
+
+# ---------------- PREPROCESSING GRAPH (SHARED, MEMOIZED PER PAGE) ----------------
+# OCR, the row detector and the column detector each need a grayscale page,
+# a pyramid level and their own binarization of it. Instead of every module
+# repeating cvtColor / blur / threshold, the steps are declared once as a
+# graph of named stages:
+#
+#   rgb -> gray -> deskewed -> ocr                    (recognition crops)
+#                     `-> layout -> ocr_layout        (text detection)
+#                            |-> rows_binary -> rows  (row bands)
+#                            `-> columns_binary -> columns
+#
+# A stage is {"op", "input", **params}. Every page owns a StageCache that
+# computes a stage on first request and memoizes it under the stage's full
+# definition (op, params and its inputs, recursively) - so consumers asking
+# for the same stage share one result, and a consumer with other parameters
+# gets its own branch. Each stage is timed, and fused stages (blur +
+# threshold) keep their intermediate in a reusable per-thread buffer.
+
+DEFAULT_GRAPH = {
+    "gray": {"op": "gray", "input": "rgb"},
+    "deskewed": {"op": "deskew", "input": "gray", "max_angle": 5.0, "min_angle": 0.5},
+    "ocr": {"op": "blur_threshold", "input": "deskewed", "ksize": 5,
+            "method": "gaussian", "block_size": 11, "c": 2, "invert": False},
+    "layout": {"op": "pyramid", "input": "deskewed", "target": LAYOUT_TEXT_PX},
+    "ocr_layout": {"op": "blur_threshold", "input": "layout", "ksize": 5,
+                   "method": "gaussian", "block_size": 11, "c": 2, "invert": False},
+    "rows_binary": {"op": "threshold", "input": "layout", "method": "mean", "block_size": 15, "c": 3, "invert": True},
+    # Wide, flat kernel merges the words of a table row into one band
+    "rows": {"op": "dilate", "input": "rows_binary", "relative": [0.15, 0.004], "minimum": [30, 3]},
+    "columns_binary": {"op": "threshold", "input": "layout", "method": "gaussian", "block_size": 31, "c": 5, "invert": True},
+    # Short, flat kernel joins the characters of a cell, so a column projects as one solid run
+    "columns": {"op": "dilate", "input": "columns_binary", "relative": [0.006, 0.0], "minimum": [7, 1]},
+}
+
+
+def graph_with(overrides, graph=None):
+    """A copy of `graph` (default: DEFAULT_GRAPH) with stage params replaced."""
+    graph = {name: dict(stage) for name, stage in (graph or DEFAULT_GRAPH).items()}
+    for name, params in (overrides or {}).items():
+        graph[name] = {**graph.get(name, {}), **params}
+    return graph
+
+
+# ---------------- OPS ----------------
+
+OPS = {}
+
+
+def op(name):
+    def register(fn):
+        OPS[name] = fn
+        return fn
+    return register
+
+
+_buffers = threading.local()
+
+
+def scratch(shape, dtype=np.uint8, slot="default"):
+    """
+    A per-thread buffer reused across calls (and pages of the same size) for
+    intermediates no consumer keeps.
+    """
+    pool = _buffers.__dict__.setdefault("pool", {})
+    key = (slot, tuple(shape), np.dtype(dtype).str)
+    buf = pool.get(key)
+    if buf is None:
+        buf = pool[key] = np.empty(shape, dtype=dtype)
+    return buf
+
+
+@op("identity")
+def _identity(img):
+    return img
+
+
+@op("gray")
+def _gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+@op("deskew")
+def _deskew(gray, max_angle=5.0, min_angle=0.5, step=1.0, fine_step=0.2, work_width=600):
+    """
+    Rotates the page so its text lines are horizontal. The angle is the one
+    that maximises the variance of the row profile of a ~600px binarized
+    copy (coarse, then fine search); pages within `min_angle` are kept.
+    """
+    small = gray
+    while small.shape[1] // 2 >= work_width:
+        small = half(small)
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    h, w = binary.shape
+    rotated = scratch(binary.shape, slot="deskew")
+
+    def score(angle):
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), float(angle), 1.0)
+        cv2.warpAffine(binary, m, (w, h), dst=rotated, flags=cv2.INTER_NEAREST)
+        return float(np.var(cv2.reduce(rotated, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)))
+
+    base = score(0.0)
+    coarse = np.arange(-max_angle, max_angle + step / 2, step)
+    best = max(coarse, key=score)
+    fine = np.arange(best - step, best + step + fine_step / 2, fine_step)
+    scores = [score(a) for a in fine]
+    best = float(fine[int(np.argmax(scores))])
+
+    # Blank pages or no clear gain: leave the page alone
+    if abs(best) < min_angle or max(scores) <= base * 1.05:
+        return gray
+    H, W = gray.shape
+    m = cv2.getRotationMatrix2D((W / 2, H / 2), best, 1.0)
+    return cv2.warpAffine(gray, m, (W, H), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+@op("pyramid")
+def _pyramid(gray, target=None):
+    return layout_level(gray, target)[0]
+
+
+@op("blur")
+def _blur(gray, ksize=5):
+    return cv2.GaussianBlur(gray, (ksize, ksize), 0)
+
+
+_THRESHOLD_METHODS = {"mean": cv2.ADAPTIVE_THRESH_MEAN_C, "gaussian": cv2.ADAPTIVE_THRESH_GAUSSIAN_C}
+
+
+@op("threshold")
+def _threshold(gray, method="gaussian", block_size=11, c=2, invert=False):
+    if method == "otsu":
+        _, binary = cv2.threshold(gray, 0, 255, (cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY) + cv2.THRESH_OTSU)
+        return binary
+    return cv2.adaptiveThreshold(
+        gray, 255, _THRESHOLD_METHODS[method],
+        cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY, block_size, c
+    )
+
+
+@op("blur_threshold")
+def _blur_threshold(gray, ksize=5, **params):
+    # Fused: the blurred page only feeds the threshold, so it lives in scratch
+    blurred = cv2.GaussianBlur(gray, (ksize, ksize), 0, dst=scratch(gray.shape, slot="blur"))
+    return _threshold(blurred, **params)
+
+
+def _kernel(img, kernel=None, relative=None, minimum=(1, 1)):
+    if relative is not None:
+        h, w = img.shape[:2]
+        kernel = (max(int(w * relative[0]), minimum[0]), max(int(h * relative[1]), minimum[1]))
+    return cv2.getStructuringElement(cv2.MORPH_RECT, tuple(int(k) for k in kernel))
+
+
+@op("dilate")
+def _dilate(binary, **params):
+    return cv2.dilate(binary, _kernel(binary, **params), iterations=1)
+
+
+@op("open")
+def _open(binary, **params):
+    return cv2.morphologyEx(binary, cv2.MORPH_OPEN, _kernel(binary, **params))
+
+
+def run_stage(img, stage):
+    """Applies one stage definition to an image (no memoization)."""
+    params = {k: v for k, v in stage.items() if k not in ("op", "input")}
+    return OPS[stage["op"]](img, **params)
+
+
+# ---------------- PER-PAGE STAGE CACHE ----------------
+
+class StageCache:
+    """
+    Lazily computed, memoized stages of one page image.
+    `timings` holds the milliseconds spent per stage name.
+    """
+
+    def __init__(self, source, source_name="rgb"):
+        self.source = source
+        self.source_name = source_name
+        self._memo = {}
+        self.timings = {}
+
+    def _key(self, name, graph):
+        if name == self.source_name:
+            return name
+        stage = graph[name]
+        params = {k: v for k, v in stage.items() if k != "input"}
+        return (json.dumps(params, sort_keys=True), self._key(stage["input"], graph))
+
+    def get(self, name, graph=None):
+        graph = graph or DEFAULT_GRAPH
+        if name == self.source_name:
+            return self.source
+
+        key = self._key(name, graph)
+        if key not in self._memo:
+            stage = graph[name]
+            img = self.get(stage["input"], graph)
+            start = time.perf_counter()
+            self._memo[key] = run_stage(img, stage)
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+        return self._memo[key]
+
+    def clear(self):
+        self._memo.clear()
+
+
+def stages_for(image):
+    """
+    StageCache for a Page (its own, shared with the other consumers), or
+    for a path / BGR / grayscale array. None when the image cannot be read.
+    """
+    if isinstance(image, StageCache):
+        return image
+    if hasattr(image, "stages"):
+        return image.stages
+    img = image if isinstance(image, np.ndarray) else cv2.imread(str(image))
+    if img is None:
+        return None
+    return StageCache(to_gray(img), source_name="gray")
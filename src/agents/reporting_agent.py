@@ -1,114 +1,236 @@
 import pandas as pd
 import os
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, PatternFill, Font, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+from src.agents import exporters
+
+# ---------------- STREAMING XLSX (WRITE-ONLY, SHARED STYLES) ----------------
+# Workbooks are written in openpyxl's write-only mode: each row is streamed to
+# disk as it is appended and is styled on the way out, by pointing its cells
+# at a handful of named styles registered once per workbook. Nothing is
+# reloaded or restyled afterwards, so memory stays flat on 100k-row statements.
+
+# Every "Risk (...)" status (empty cells, failed integrity rules) is shown red
+RISK_PREFIX = "Risk"
+METRIC_COLORS = ("E0E0E0", "C6EFCE", "FFC7CE", "FFEB9C")
+
+# Rows are converted from the DataFrame in blocks, not all at once
+ROW_BLOCK = 10000
+
+
+def _named_styles():
+    thin = Side(style="thin")
+    styles = [
+        NamedStyle("FV Title", font=Font(size=18, bold=True, color="1F4E78")),
+        NamedStyle("FV Label", font=Font(bold=True, size=12)),
+        NamedStyle("FV Header", font=Font(bold=True, color="FFFFFF"),
+                   fill=PatternFill("solid", fgColor="1F4E78"), alignment=Alignment(horizontal="center")),
+        NamedStyle("FV Risk", font=Font(color="9C0006"), fill=PatternFill("solid", fgColor="FFC7CE")),
+        NamedStyle("FV Safe", font=Font(color="006100"), fill=PatternFill("solid", fgColor="C6EFCE")),
+        NamedStyle("FV Warning", font=Font(color="9C5700"), fill=PatternFill("solid", fgColor="FFEB9C")),
+    ]
+    for color in METRIC_COLORS:
+        styles.append(NamedStyle(
+            f"FV Metric {color}", font=Font(bold=True, size=12), alignment=Alignment(horizontal="center"),
+            fill=PatternFill("solid", fgColor=color), border=Border(top=thin, left=thin, right=thin, bottom=thin)
+        ))
+    return styles
+
+
+def _iter_rows(df):
+    """Yields the DataFrame's rows as lists of plain values (NaN -> empty cell)."""
+    for start in range(0, len(df), ROW_BLOCK):
+        block = df.iloc[start:start + ROW_BLOCK].to_numpy(dtype=object)
+        block[pd.isna(block)] = None
+        yield from block.tolist()
+
 
 class ReportingAgent:
     def __init__(self, output_dir="data/output"):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def generate_dashboard(self, df, stats):
+    def _new_workbook(self, styled=True):
+        wb = Workbook(write_only=True)
+        if styled:
+            for style in _named_styles():
+                wb.add_named_style(style)
+        return wb
+
+    def _cell(self, ws, value, style=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if style:
+            cell.style = style
+        return cell
+
+    def generate_dashboard(self, df, stats, output_dir=None):
         """
         Generates two files:
         1. ocr_data.xlsx (Raw OCR Output)
         2. FinVision_Dashboard.xlsx (Executive Dashboard with Colors)
+
+        `output_dir` overrides the agent's default directory (one per job).
         """
-        dashboard_path = os.path.join(self.output_dir, "FinVision_Dashboard.xlsx")
-        ocr_path = os.path.join(self.output_dir, "ocr_data.xlsx")
-        
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        dashboard_path = os.path.join(output_dir, "FinVision_Dashboard.xlsx")
+        ocr_path = os.path.join(output_dir, "ocr_data.xlsx")
+
         # --- 1. SAVE RAW OCR DATA (SEPARATE FILE) ---
         if not df.empty:
-            df.to_excel(ocr_path, index=False)
+            wb = self._new_workbook(styled=False)
+            ws = wb.create_sheet("Sheet1")
+            ws.append([str(c) for c in df.columns])
+            for row in _iter_rows(df):
+                ws.append(row)
+            wb.save(ocr_path)
             print(f" [Reporting Agent] Raw OCR Data saved: {ocr_path}")
-        
-        # --- 2. CREATE DASHBOARD WORKBOOK ---
-        with pd.ExcelWriter(dashboard_path, engine='openpyxl') as writer:
-            # Create Sheets
-            pd.DataFrame().to_excel(writer, sheet_name="Executive Summary")
-            
-            if not df.empty:
-                df.to_excel(writer, sheet_name="Audit Logs", index=False)
-            else:
-                pd.DataFrame(["No Data Found"]).to_excel(writer, sheet_name="Audit Logs", header=False)
-
-        # --- 3. APPLY STYLING TO DASHBOARD ---
-        wb = load_workbook(dashboard_path)
-        
-        # Build Summary Sheet
-        self._build_executive_summary(wb["Executive Summary"], stats)
-        
-        # Format Data Sheet (Red/Green logic)
-        if not df.empty and "Audit Logs" in wb.sheetnames:
-            self._format_audit_logs(wb["Audit Logs"], df)
+
+        # --- 2. DASHBOARD: SUMMARY + AUDIT LOGS, STYLED AS THEY ARE WRITTEN ---
+        wb = self._new_workbook()
+        self._build_executive_summary(wb.create_sheet("Executive Summary"), stats)
+
+        ws = wb.create_sheet("Audit Logs")
+        if not df.empty:
+            self._write_audit_logs(ws, df)
+        else:
+            ws.append(["No Data Found"])
+
+        if stats.get("signatures"):
+            self._write_signatures(wb.create_sheet("Signatures"), stats["signatures"])
 
         wb.save(dashboard_path)
         print(f" [Reporting Agent] Dashboard generated: {dashboard_path}")
         return dashboard_path
 
-    def _build_executive_summary(self, ws, stats):
-        # Title
-        ws["A1"] = "FINVISION AI – EXECUTIVE DASHBOARD"
-        ws["A1"].font = Font(size=18, bold=True, color="1F4E78")
-        ws.merge_cells("A1:E1")
+    def export(self, df, stats, fmt="xlsx", output_dir=None):
+        """
+        Writes the audited rows in `fmt` (see exporters.FORMATS) and returns
+        the file path. "xlsx" is the styled dashboard; csv / parquet / ndjson
+        skip styling entirely.
+        """
+        if fmt == "xlsx":
+            return self.generate_dashboard(df, stats, output_dir=output_dir)
+
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        path = exporters.export_path(output_dir, fmt)
+        exporters.get_exporter(fmt).write(df, stats, path)
+        print(f" [Reporting Agent] {fmt.upper()} export saved: {path}")
+        return str(path)
+
+    def stream(self, df, stats, fmt):
+        """Yields a csv / parquet / ndjson export as bytes chunks (for streamed downloads)."""
+        return exporters.get_exporter(fmt).stream(df, stats)
 
+    def _build_executive_summary(self, ws, stats):
         # Metrics
         total = stats.get("total_rows", 0)
         risk = stats.get("unsigned_count", 0)
         safe = stats.get("verified_count", 0)
+        integrity = stats.get("integrity_count", 0)
         ink = stats.get("ink_density", 0)
-        
+        signature = "Yes" if stats.get("signature_detected") else "No"
+        confidence = stats.get("signature_confidence", 0)
+
         metrics = [
             ("Total Logs Scanned", total, "E0E0E0"),
             ("Verified / Safe", safe, "C6EFCE"),
             ("Risk / Unsigned", risk, "FFC7CE"),
+            ("Integrity Issues", integrity, "FFC7CE"),
+            ("Signature / Stamp", f"{signature} ({confidence:.0%})", "C6EFCE" if signature == "Yes" else "FFC7CE"),
             ("Ink Density Detected", f"{ink}", "FFEB9C")
         ]
+        self._set_widths(ws, [25, 15])
+        self._write_metrics(ws, "FINVISION AI – EXECUTIVE DASHBOARD", metrics)
+
+    def _set_widths(self, ws, widths):
+        # Write-only sheets emit column widths with the first row: set them up front
+        for i, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+
+    def _write_metrics(self, ws, title, metrics):
+        # Title
+        ws.append([self._cell(ws, title, "FV Title")])
+        ws.merged_cells.add("A1:E1")
+        ws.append([])
+
+        for label, val, color in metrics:
+            ws.append([self._cell(ws, label, "FV Label"), self._cell(ws, val, f"FV Metric {color}")])
+
+    def _write_table(self, ws, header, rows, row_style):
+        """
+        Streams a header + rows. `row_style(row)` picks the named style of
+        each row (or None for unstyled rows).
+        """
+        ws.append([self._cell(ws, h, "FV Header") for h in header])
+        for row in rows:
+            style = row_style(row)
+            if style is None:
+                ws.append(row)
+            else:
+                ws.append([self._cell(ws, v, style) for v in row])
+
+    def _write_audit_logs(self, ws, df):
+        # Red/Green logic: by "Audit Status" when the audit produced one
+        header = [str(c) for c in df.columns]
+        if "Audit Status" in header:
+            status_idx = header.index("Audit Status")
+            row_style = lambda row: "FV Risk" if str(row[status_idx]).startswith(RISK_PREFIX) else "FV Safe"
+        else:
+            row_style = lambda row: None
+
+        self._set_widths(ws, [18] * len(header))
+        self._write_table(ws, header, _iter_rows(df), row_style)
+
+    def _write_signatures(self, ws, detections):
+        # One row per detected signature / stamp, strongest first
+        header = ["Page", "Zone", "X", "Y", "Width", "Height", "Confidence"]
+        rows = ([d["page"], d["zone"], *d["box"], d["confidence"]] for d in detections)
+        self._set_widths(ws, [10, 18, 10, 10, 10, 10, 14])
+        self._write_table(ws, header, rows, lambda row: None)
+
+    def generate_batch_summary(self, rows, totals, output_path=None):
+        """
+        Consolidated workbook for a batch: headline totals, then one row
+        per document (status, row counts, risks, timing, output folder).
+        """
+        output_path = output_path or os.path.join(self.output_dir, "FinVision_Batch_Summary.xlsx")
+
+        columns = list(rows[0].keys()) if rows else ["Document", "Status"]
+
+        wb = self._new_workbook()
+        ws = wb.create_sheet("Batch Summary")
+        # Column A holds both the metric labels and the document names
+        self._set_widths(ws, [40] + [18] * (len(columns) - 1))
+
+        metrics = [
+            ("Documents", totals.get("documents", 0), "E0E0E0"),
+            ("Processed", totals.get("done", 0), "C6EFCE"),
+            ("Failed", totals.get("failed", 0), "FFC7CE"),
+            ("Risk / Unsigned Rows", totals.get("unsigned_count", 0), "FFEB9C"),
+            ("Integrity Issues", totals.get("integrity_count", 0), "FFEB9C"),
+            ("Documents / Minute", totals.get("docs_per_minute", 0), "E0E0E0"),
+        ]
+        self._write_metrics(ws, "FINVISION AI – BATCH SUMMARY", metrics)
+        ws.append([])
+
+        # Per-document table below the totals
+        status_idx = columns.index("Status")
+        risk_idx = [columns.index(c) for c in ("Risk / Unsigned", "Integrity Issues") if c in columns]
+
+        def row_style(row):
+            if row[status_idx] != "done":
+                return "FV Risk"
+            if any(row[i] for i in risk_idx):
+                return "FV Warning"
+            return "FV Safe"
+
+        self._write_table(ws, columns, ([r.get(c) for c in columns] for r in rows), row_style)
 
-        row_start = 3
-        for i, (title, val, color) in enumerate(metrics):
-            # Label
-            ws.cell(row=row_start + i, column=1, value=title).font = Font(bold=True, size=12)
-            # Value
-            cell_val = ws.cell(row=row_start + i, column=2, value=val)
-            cell_val.font = Font(bold=True, size=12)
-            cell_val.alignment = Alignment(horizontal="center")
-            cell_val.fill = PatternFill("solid", fgColor=color)
-            cell_val.border = Border(top=Side(style='thin'), left=Side(style='thin'), right=Side(style='thin'), bottom=Side(style='thin'))
-
-        ws.column_dimensions["A"].width = 25
-        ws.column_dimensions["B"].width = 15
-
-    def _format_audit_logs(self, ws, df):
-        # Styles
-        red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        red_font = Font(color="9C0006")
-        green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        green_font = Font(color="006100")
-        header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
-        # Header
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-
-        # Logic
-        try:
-            status_col_idx = df.columns.get_loc("Audit Status") + 1
-            for row in ws.iter_rows(min_row=2):
-                status_val = row[status_col_idx - 1].value
-                if status_val == "Risk (Unsigned/Empty)":
-                    for cell in row:
-                        cell.fill = red_fill
-                        cell.font = red_font
-                else:
-                    for cell in row:
-                        cell.fill = green_fill
-                        cell.font = green_font
-        except KeyError:
-            pass
-
-        for col in ws.columns:
-            ws.column_dimensions[col[0].column_letter].width = 18
\ No newline at end of file
+        wb.save(output_path)
+        print(f" [Reporting Agent] Batch summary generated: {output_path}")
+        return output_path
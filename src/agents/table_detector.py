@@ -1,81 +1,77 @@
 import cv2
-from src.agents.ocr_agent import reader
+from src.agents.model_registry import get_reader
+from src.agents.image_pyramid import upscale_boxes
+from src.agents.preprocess import stages_for, graph_with
 
 # ---------------- TABLE DETECTOR (ROW-LEVEL, ROBUST) ----------------
 
-def detect_table_rows(image_path):
+def detect_table_rows(image, layout_text_px=None, ocr_fallback=True, graph=None):
     """
     Robust table row detector.
     Works for:
     - scanned PDFs
     - mobile camera images
     - screenshots
-    - skewed documents (mild)
+    - skewed documents (deskewed by the preprocessing graph)
+
+    `image` is a Page (its memoized stages are shared with OCR and the
+    column detector), a path or a BGR / grayscale array. Row bands are
+    found on the pyramid level; boxes are returned in full-resolution
+    (deskewed) page pixels. `ocr_fallback=False` skips the (slow) OCR
+    pass when no row band is found. `graph` is a caller's view of the stage
+    graph (e.g. the OCR agent's), so its deskewed page is the one measured.
     """
 
-    img = cv2.imread(str(image_path))
-    if img is None:
+    stages = stages_for(image)
+    if stages is None:
         return []
+    if layout_text_px is not None:
+        graph = graph_with({"layout": {"target": layout_text_px}}, graph)
 
-    H, W = img.shape[:2]
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    full = stages.get("deskewed", graph)
+    level = stages.get("layout", graph)
+    scale = level.shape[1] / full.shape[1]
+    H, W = level.shape[:2]
 
     # ---------- PASS 1: MORPHOLOGICAL ROW BAND DETECTION ----------
-    binary = cv2.adaptiveThreshold(
-        gray,
-        255,
-        cv2.ADAPTIVE_THRESH_MEAN_C,
-        cv2.THRESH_BINARY_INV,
-        15,
-        3
-    )
-
-    # Kernel scaled to image size (CRITICAL)
-    kernel_width = max(int(W * 0.15), 30)
-    kernel_height = max(int(H * 0.004), 3)
-
-    kernel = cv2.getStructuringElement(
-        cv2.MORPH_RECT, (kernel_width, kernel_height)
-    )
-
-    dilated = cv2.dilate(binary, kernel, iterations=1)
+    # Adaptive threshold + a dilation kernel scaled to the image size (CRITICAL):
+    # see the "rows_binary" / "rows" stages in preprocess.py
+    dilated = stages.get("rows", graph)
 
     contours, _ = cv2.findContours(
         dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
     )
 
-    row_boxes = []
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-
+    # Blobs of one text line (a wide gap between two columns splits a row
+    # into several) are grouped by vertical overlap first; the near
+    # full-width filter then applies to the whole group, not to each blob
+    boxes = sorted((cv2.boundingRect(cnt) for cnt in contours), key=lambda b: b[1])
+    bands = []
+    for x, y, w, h in boxes:
         # 🔑 RELATIVE filters (resolution-safe)
-        if (
-            h > H * 0.008 and          # row height
-            h < H * 0.08 and
-            w > W * 0.6                # near full-width row
-        ):
-            row_boxes.append((x, y, w, h))
-
-    if row_boxes:
-        row_boxes = sorted(row_boxes, key=lambda b: b[1])
-
-        rows = []
-        current = [row_boxes[0]]
-        last_y = row_boxes[0][1]
-
-        for box in row_boxes[1:]:
-            if abs(box[1] - last_y) < max(box[3], H * 0.01):
-                current.append(box)
-            else:
-                rows.append(current)
-                current = [box]
-                last_y = box[1]
-
-        rows.append(current)
+        if not (H * 0.008 < h < H * 0.08):    # row height
+            continue
+        if bands and y + h / 2 < bands[-1]["bottom"]:
+            band = bands[-1]
+            band["boxes"].append((x, y, w, h))
+            band["bottom"] = max(band["bottom"], y + h)
+        else:
+            bands.append({"boxes": [(x, y, w, h)], "bottom": y + h})
+
+    rows = []
+    for band in bands:
+        left = min(b[0] for b in band["boxes"])
+        right = max(b[0] + b[2] for b in band["boxes"])
+        if right - left > W * 0.6:            # near full-width row
+            rows.append(sorted(upscale_boxes(band["boxes"], scale)))
+    if rows:
         return rows
 
     # ---------- PASS 2: OCR-BASED FALLBACK (LAST RESORT) ----------
-    results = reader.readtext(img, detail=1, paragraph=False)
+    if not ocr_fallback:
+        return []
+    H = full.shape[0]
+    results = get_reader().readtext(full, detail=1, paragraph=False)
     if not results:
         return []
 
@@ -0,0 +1,110 @@
+import time
+import cv2
+import numpy as np
+import pandas as pd
+
+from src.agents.table_detector import detect_table_rows
+from src.agents.column_detector import detect_columns
+from src.telemetry import add_time
+
+# ---------------- STRUCTURED EXTRACTION (GRID FIRST, THEN CELL OCR) ----------------
+# The clustered mode detects free text boxes and guesses rows from their Y
+# centres, which drifts on tight line spacing and wrapped cells. Here the
+# table grid is found first, once per page: row bands from
+# detect_table_rows and column extents from detect_columns, both on the
+# page's shared stage graph. Every row x column intersection is a cell;
+# cells without ink are skipped, the others are recognized in one batch
+# (no text detection: a cell is one text line), and each text is placed
+# straight at its (row, column) index.
+
+# Share of a cell's pixels that must be ink for the cell to be read
+MIN_CELL_INK = 0.005
+
+
+def row_bands(rows):
+    """Row groups from detect_table_rows -> [(y0, y1)], top → bottom."""
+    bands = [(min(b[1] for b in group), max(b[1] + b[3] for b in group)) for group in rows if group]
+    return sorted(bands)
+
+
+def cell_grid(bands, columns):
+    """
+    (x, y, w, h) of every cell, row-major: cell (r, c) is at r * len(columns) + c.
+    Inner column edges are moved to the middle of the gap between two
+    columns, so text wider than its column's typical extent is not cut.
+    """
+    bands = np.asarray(bands, dtype=np.int64).reshape(-1, 2)
+    cols = np.asarray(columns, dtype=np.int64).reshape(-1, 4)
+    n_rows, n_cols = len(bands), len(cols)
+    left, right = cols[:, 0].copy(), cols[:, 0] + cols[:, 2]
+    middle = (right[:-1] + left[1:]) // 2
+    left[1:], right[:-1] = middle, middle
+    x = np.tile(left, n_rows)
+    w = np.tile(right - left, n_rows)
+    y = np.repeat(bands[:, 0], n_cols)
+    h = np.repeat(bands[:, 1] - bands[:, 0], n_cols)
+    return np.column_stack([x, y, w, h])
+
+
+def ink_ratio(binary, cells, scale=1.0):
+    """
+    Ink share of every cell of an inverted binary image (ink = 255) from
+    its integral image: four lookups per cell. `scale` maps cell
+    coordinates onto `binary` (a pyramid level).
+    """
+    H, W = binary.shape[:2]
+    integral = cv2.integral(binary, sdepth=cv2.CV_64F)
+    x0 = np.clip(np.round(cells[:, 0] * scale), 0, W).astype(np.int64)
+    y0 = np.clip(np.round(cells[:, 1] * scale), 0, H).astype(np.int64)
+    x1 = np.clip(np.round((cells[:, 0] + cells[:, 2]) * scale), 0, W).astype(np.int64)
+    y1 = np.clip(np.round((cells[:, 1] + cells[:, 3]) * scale), 0, H).astype(np.int64)
+    ink = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    area = np.maximum((x1 - x0) * (y1 - y0), 1)
+    return ink / 255.0 / area
+
+
+def extract_table(stages, engine, graph=None, columns=None, min_ink=MIN_CELL_INK, timings=None):
+    """
+    Structured extraction of one page (its StageCache), cells read by
+    `engine` (see ocr_engines.py). `columns` are the
+    page's columns when already detected (e.g. by detect_columns_batch).
+    Returns a DataFrame whose first grid row is the header, or None when no
+    table grid is found (no row band or fewer than two columns) so the
+    caller can fall back to clustering. `timings` receives the ms spent in
+    "detect" (the grid), "recognize" and "structure".
+    """
+    start = time.perf_counter()
+    rows = detect_table_rows(stages, ocr_fallback=False, graph=graph)
+    if columns is None:
+        columns = detect_columns(stages, graph=graph)
+    add_time(timings, "detect", start)
+    if not rows or len(columns) < 2:
+        return None
+
+    n_cols = len(columns)
+    cells = cell_grid(row_bands(rows), columns)
+    n_rows = len(cells) // n_cols
+
+    # Blank cells are never sent to the recognizer
+    binary = stages.get("rows_binary", graph)
+    scale = binary.shape[1] / stages.get("deskewed", graph).shape[1]
+    read = np.flatnonzero(ink_ratio(binary, cells, scale) >= min_ink)
+
+    grid = np.full(n_rows * n_cols, "", dtype=object)
+    if read.size:
+        texts = engine.read_cells(stages.get("ocr", graph), cells[read].tolist(), timings=timings)
+        grid[read] = [text for text, _ in texts]
+
+    start = time.perf_counter()
+    grid = grid.reshape(n_rows, n_cols)
+    filled = grid != ""
+    grid = grid[filled.any(axis=1)][:, filled.any(axis=0)]
+    if grid.size == 0:
+        return None
+
+    df = pd.DataFrame(grid.tolist())
+    if len(df) > 1:
+        df.columns = df.iloc[0]
+        df = df[1:].reset_index(drop=True)
+    add_time(timings, "structure", start)
+    return df
@@ -1,12 +1,11 @@
 import sys
 import os
 from pathlib import Path
-import shutil
+import asyncio
+import json
+import time
 import uvicorn
 import traceback
-import cv2
-import numpy as np
-from pdf2image import convert_from_path
 
 # ---------------- PATH FIX ----------------
 # Forces Python to recognize the 'src' folder
@@ -15,20 +14,26 @@ ROOT = FILE.parents[1]  # FinVision-AI root
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
-from fastapi import FastAPI, UploadFile, File, Request
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, UploadFile, File, Request, Query
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+
+from src.job_queue import JobQueue, QueueFullError
+from src.uploads import receive_upload, stream_to_disk, sniff_zip, UploadRejected, MAX_UPLOAD_BYTES, MAX_BATCH_BYTES
+from src import job_store, telemetry
 
 # ---------------- SAFE IMPORTS ----------------
 OCRAgent = None
-AuditAgent = None
 ReportingAgent = None
 
 try:
-    from src.agents.ocr_agent import OCRAgent
-    from src.agents.audit_agent import AuditAgent
+    from src.agents.ocr_agent import OCRAgent, EXTRACTION_MODES
+    from src.agents.ocr_engines import ENGINES
     from src.agents.reporting_agent import ReportingAgent
+    from src.agents import exporters
+    from src.pipeline import init_worker, run_job, warm_up_worker
+    from src import batch
 except ImportError as e:
     print("\n" + "="*50)
     print(f"❌ CRITICAL IMPORT ERROR: {e}")
@@ -39,37 +44,298 @@ except ImportError as e:
 app = FastAPI(title="FinVision AI")
 
 # ---------------- SETUP DIRECTORIES ----------------
-RAW_DIR = ROOT / "data" / "raw"
 OUT_DIR = ROOT / "data" / "output"
+JOBS_DIR = OUT_DIR / "jobs"
+BATCHES_DIR = OUT_DIR / "batches"
+CACHE_DIR = Path(os.getenv("FINVISION_CACHE_DIR", str(ROOT / "data" / "cache")))
 TEMPLATES_DIR = ROOT / "templates"
 
-RAW_DIR.mkdir(parents=True, exist_ok=True)
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
+BATCHES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Mount Static Files (Critical for serving the Preview Image)
-app.mount("/static", StaticFiles(directory=str(RAW_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-# Global variable to track the last uploaded file for download
-LAST_UPLOADED_FILE = None
+# How often /upload re-checks a job that is owned by another server process
+JOB_POLL_INTERVAL = 0.5
+
+# Idle /jobs/{id}/events streams send a comment this often (seconds), so
+# proxies do not close them while a long page is being OCR'd
+SSE_KEEPALIVE = 15
 
-# ---------------- AGENT INITIALIZATION ----------------
-ocr_agent = None
-audit_agent = None
-reporting_agent = None
+# Stats sent in the X-FinVision-Stats download header: fixed-size counts only,
+# as per-page signatures and rule results grow past proxy header limits
+# (full stats: GET /jobs/{id}, the NDJSON _meta line, Parquet metadata)
+HEADER_STATS = ("total_rows", "verified_count", "unsigned_count", "integrity_count", "signature_detected")
 
-print(" [System] Initializing AI Agents...")
+# ---------------- JOB QUEUE INITIALIZATION ----------------
+# The OCR -> Audit -> Reporting pipeline runs in a pool of worker processes,
+# so a long PDF never blocks the event loop (downloads, dashboard, etc).
+# Job state lives on disk (see src/job_store.py), so several uvicorn workers
+# can serve uploads, status and downloads for the same jobs.
+job_queue = None
+
+print(" [System] Initializing Job Queue...")
 
 if OCRAgent is None:
     print(" [System] ⚠️  Skipping Agent Init because imports failed (Check logs above).")
 else:
+    n_workers = int(os.getenv("FINVISION_WORKERS", "2"))
+    job_queue = JobQueue(
+        max_workers=n_workers,
+        initializer=init_worker,
+        initargs=(str(OUT_DIR), str(CACHE_DIR), n_workers),
+    )
+    print(" [System] ✅ Job Queue Ready.")
+
+
+# Multipart framing around the file itself (boundaries, part headers)
+UPLOAD_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse by Content-Length before the body is read at all. Chunked
+    # uploads without a length are received (and spooled by the multipart
+    # parser) in full, then rejected by the size check in src/uploads.py
+    if request.method == "POST":
+        limit = MAX_BATCH_BYTES if request.url.path == "/batch" else MAX_UPLOAD_BYTES
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > limit + UPLOAD_OVERHEAD:
+            return _upload_rejected(UploadRejected(
+                f"File too large. The limit is {limit // (1024 * 1024)} MB.", 413))
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # Outermost middleware: every response (413s included) is counted and
+    # logged with the request id, which is also handed to queued jobs
+    rid = request.headers.get("x-request-id") or telemetry.new_request_id()
+    start = time.perf_counter()
+    with telemetry.request_context(rid):
+        try:
+            response = await call_next(request)
+        except Exception:
+            _record_request(request, 500, start)
+            raise
+        response.headers["X-Request-ID"] = rid
+        _record_request(request, response.status_code, start)
+    return response
+
+
+def _record_request(request, status_code, start):
+    # The route template (/jobs/{job_id}), not the raw path, keeps label values bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    seconds = time.perf_counter() - start
+    telemetry.HTTP_REQUESTS.inc(method=request.method, route=route, status=status_code)
+    telemetry.HTTP_SECONDS.observe(seconds, method=request.method, route=route)
+    telemetry.log_event("request", method=request.method, path=request.url.path, route=route,
+                        status=status_code, duration_ms=round(seconds * 1000, 1))
+
+
+@app.on_event("startup")
+def warm_up_job_queue():
+    # Load the OCR models in the workers in the background: the server
+    # accepts connections immediately and /healthz reports readiness.
+    if job_queue and os.getenv("FINVISION_WARMUP", "1") == "1":
+        job_queue.warm_up(warm_up_worker)
+
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    if job_queue:
+        job_queue.shutdown()
+
+# ---------------- HELPERS ----------------
+
+def _submit_job(job_id, path, formats=None, mode=None, engine=None):
+    """Queues one job (tagged with the current request id); its outcome feeds /metrics."""
+    job_queue.submit(run_job, str(JOBS_DIR), job_id, str(path), formats, mode=mode, engine=engine,
+                     request_id=telemetry.request_id(), job_id=job_id)
+    job_queue.get_future(job_id).add_done_callback(_record_job)
+
+
+def _record_job(future):
+    if future.cancelled():
+        telemetry.record_job(error="cancelled")
+    elif future.exception() is not None:
+        telemetry.record_job(error=future.exception())
+    else:
+        telemetry.record_job(future.result())
+
+
+def _job_options(mode=None, engine=None):
+    """
+    The request settings that are part of a job's identity, with the
+    workers' defaults filled in: the same bytes in another mode or with
+    another OCR engine are another job, not the finished one.
+    """
+    return {
+        "mode": mode or OCRAgent.DEFAULT_SETTINGS["mode"],
+        "engine": engine or OCRAgent.DEFAULT_SETTINGS["engine"],
+    }
+
+
+async def _enqueue_upload(file, fmt="xlsx", mode=None, engine=None):
+    """
+    Streams the upload into its content-addressed job directory and queues it.
+    Re-uploading identical bytes with the same options (see _job_options)
+    returns the existing job instead of re-running it.
+    `fmt` is the report format the pipeline writes (others are made on download),
+    `mode` the OCR extraction mode and `engine` the OCR engine (None: the
+    workers' default).
+    """
+    options = _job_options(mode, engine)
+    job_id, status, created = await receive_upload(file, JOBS_DIR, options=options)
+
+    if not created:
+        print(f" [Orchestrator] Duplicate upload. Reusing job {job_id} ({status['status']}).")
+        return status
+
+    filename = status["filename"]
+    print(f" [Orchestrator] File saved for job {job_id}: {filename}")
+    path = job_store.input_path(JOBS_DIR, job_id, filename)
     try:
-        ocr_agent = OCRAgent()
-        audit_agent = AuditAgent()
-        reporting_agent = ReportingAgent(output_dir=OUT_DIR)
-        print(" [System] ✅ Agents Ready.")
-    except Exception as e:
-        print(f" [System] ❌ Error Initializing Agents: {e}")
+        _submit_job(job_id, path, [fmt], options["mode"], options["engine"])
+    except QueueFullError as e:
+        # Mark as failed so the same document can be re-submitted later
+        job_store.write_status(JOBS_DIR, job_id, status="failed", error=str(e))
+        raise
+    return status
+
+
+async def _feed_batch(entries, mode=None, engine=None):
+    """
+    Submits a batch's new jobs as queue slots free up, so a large ZIP never
+    fails with 429 - it just drains at the pool's pace.
+    """
+    for entry in entries:
+        path = job_store.input_path(JOBS_DIR, entry["job_id"], entry["filename"])
+        while True:
+            try:
+                _submit_job(entry["job_id"], path, mode=mode, engine=engine)
+                break
+            except QueueFullError:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+    print(f" [Orchestrator] Batch fully queued ({len(entries)} new jobs).")
+
+
+# Strong references to running feeders (asyncio only keeps weak ones)
+_batch_feeders = set()
+
+
+def _job_status(job_id):
+    """Reads a job's status from disk, reconciled with this process's pool."""
+    status = job_store.read_status(JOBS_DIR, job_id)
+    if status is None:
+        return None
+
+    if status["status"] in ("queued", "running") and job_queue:
+        local = job_queue.status(job_id)
+        if local and local["status"] == "failed":
+            # The worker died before it could record the failure itself
+            status = job_store.write_status(JOBS_DIR, job_id, status="failed", error=local["error"])
+    return status
+
+
+async def _wait_for_job(job_id):
+    future = job_queue.get_future(job_id)
+    if future is not None:
+        try:
+            # Await the worker without blocking the event loop
+            await asyncio.wrap_future(future)
+        except Exception:
+            pass  # The outcome is recorded in job.json
+
+    # The job may belong to another server process: poll its status file
+    while True:
+        status = _job_status(job_id)
+        if status["status"] in ("done", "failed"):
+            return status
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def _job_payload(status):
+    job_id = status["job_id"]
+    payload = {
+        "job_id": job_id,
+        "status": status["status"],
+        "status_url": f"/jobs/{job_id}",
+    }
+
+    if status["status"] == "done":
+        stats = status["result"]["stats"]
+        payload.update({
+            "message": f"Processed successfully. Found {stats.get('unsigned_count', 0)} risks, "
+                       f"{stats.get('integrity_count', 0)} integrity issues.",
+            "stats": stats,
+            "engine": status["result"].get("engine"),
+            "download_url": f"/download/{job_id}/dashboard",
+            "export_urls": {fmt: f"/download/{job_id}/dashboard?format={fmt}" for fmt in exporters.FORMATS},
+            "ocr_url": f"/download/{job_id}/ocr",
+            "input_url": f"/download/{job_id}/input",
+            "preview_url": f"/download/{job_id}/preview",
+        })
+    elif status["status"] == "failed":
+        payload["message"] = status.get("error")
+    return payload
+
+
+def _batch_payload(progress):
+    payload = {**progress, "status_url": f"/batch/{progress['batch_id']}"}
+    if progress["status"] == "done":
+        payload["download_url"] = f"/download/batch/{progress['batch_id']}"
+    return payload
+
+
+def _check_format(fmt):
+    if fmt not in exporters.FORMATS:
+        return JSONResponse({
+            "status": "Error",
+            "message": f"Unknown format {fmt!r}. Choose one of: {', '.join(exporters.FORMATS)}"
+        }, status_code=400)
+    return None
+
+
+def _check_mode(mode):
+    if mode is not None and mode not in EXTRACTION_MODES:
+        return JSONResponse({
+            "status": "Error",
+            "message": f"Unknown mode {mode!r}. Choose one of: {', '.join(EXTRACTION_MODES)}"
+        }, status_code=400)
+    return None
+
+
+def _check_engine(engine):
+    if engine is not None and engine not in ENGINES:
+        return JSONResponse({
+            "status": "Error",
+            "message": f"Unknown engine {engine!r}. Choose one of: {', '.join(ENGINES)}"
+        }, status_code=400)
+    return None
+
+
+def _agents_unavailable():
+    return JSONResponse({
+        "status": "Error",
+        "message": "AI System failed to load. Check the terminal for 'ImportError'."
+    }, status_code=500)
+
+
+def _queue_full(e):
+    return JSONResponse({"status": "Error", "message": str(e)}, status_code=429)
+
+
+def _unknown_batch():
+    return JSONResponse({"error": "Unknown batch id"}, status_code=404)
+
+
+def _upload_rejected(e):
+    return JSONResponse({"status": "Error", "message": str(e)}, status_code=e.status_code)
+
+
+def _unknown_job():
+    return JSONResponse({"error": "Unknown job id"}, status_code=404)
 
 # ---------------- ROUTES ----------------
 @app.get("/", response_class=HTMLResponse)
@@ -77,99 +343,322 @@ def dashboard(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/upload")
-async def upload_image(file: UploadFile = File(...)):
-    global LAST_UPLOADED_FILE
-
+async def upload_image(file: UploadFile = File(...), fmt: str = Query("xlsx", alias="format"), mode: str = Query(None),
+                       engine: str = Query(None)):
+    """Synchronous-style upload: queues the job and waits for its result"""
     # Check if agents loaded successfully
-    if not ocr_agent:
-        return JSONResponse({
-            "status": "Error", 
-            "message": "AI System failed to load. Check the terminal for 'ImportError'."
-        }, status_code=500)
+    if not job_queue:
+        return _agents_unavailable()
+    if (error := _check_format(fmt) or _check_mode(mode) or _check_engine(engine)) is not None:
+        return error
 
     try:
-        # 1. Save File
-        safe_filename = file.filename
-        file_path = RAW_DIR / safe_filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        LAST_UPLOADED_FILE = safe_filename
-        print(f" [Orchestrator] File saved at: {file_path}")
-
-        # 2. Handle PDF vs Image (Preview & Audit Preparation)
-        # We need a standard image path for the Audit Agent (signature check) 
-        # and for the Frontend Preview.
-        preview_filename = f"preview_{safe_filename}.png"
-        preview_path = RAW_DIR / preview_filename
-        audit_image_path = file_path # Default to original if it's an image
-
-        file_ext = file_path.suffix.lower()
-
-        if file_ext == '.pdf':
-            print(" [Orchestrator] PDF detected. Converting Page 1 for Audit & Preview...")
-            # Convert first page to image
-            pages = convert_from_path(str(file_path), first_page=1, last_page=1)
-            if pages:
-                pages[0].save(preview_path, "PNG")
-                audit_image_path = preview_path # Audit agent will analyze this image
-        else:
-            # It's already an image, just copy it for preview consistency
-            shutil.copy(file_path, preview_path)
-            audit_image_path = file_path
-
-        # 3. Run Pipeline
-        # OCR Agent handles PDFs natively now, so we pass the ORIGINAL path
-        df_ocr = ocr_agent.extract_structured_data(file_path)
-        
-        # Audit Agent needs an IMAGE path to detect signatures (ink density)
-        df_audited, stats = audit_agent.audit_dataframe(df_ocr, image_path=audit_image_path)
-        
-        # Generates both dashboard and raw OCR excel
-        reporting_agent.generate_dashboard(df_audited, stats)
+        status = await _enqueue_upload(file, fmt, mode, engine)
+        status = await _wait_for_job(status["job_id"])
 
-        return JSONResponse({
-            "status": "Success",
-            "message": f"Processed successfully. Found {stats.get('unsigned_count', 0)} risks.",
-            "download_url": "/download/dashboard",
-            "preview_url": f"/static/{preview_filename}" # Frontend can now load this
-        })
+        payload = _job_payload(status)
+        if status["status"] == "failed":
+            return JSONResponse({**payload, "status": "Error"}, status_code=500)
+        return JSONResponse({**payload, "status": "Success"})
 
+    except QueueFullError as e:
+        return _queue_full(e)
+    except UploadRejected as e:
+        return _upload_rejected(e)
     except Exception as e:
         print(f"Processing Error: {e}")
         print(traceback.format_exc())
         return JSONResponse({"status": "Error", "message": str(e)}, status_code=500)
 
+@app.get("/healthz")
+def healthz():
+    """Readiness probe: 200 once at least one worker has its OCR models loaded"""
+    if not job_queue:
+        return JSONResponse({"status": "error", "models_ready": False,
+                             "message": "AI System failed to load."}, status_code=503)
+
+    workers = job_queue.warm_up_status()
+    # With warm-up disabled (FINVISION_WARMUP=0) models load on the first job
+    ready = workers["ready"] > 0 or not any(workers.values())
+    if ready:
+        state = "ok"
+    elif workers["failed"] and not workers["loading"]:
+        state = "failed"
+    else:
+        state = "starting"
+
+    return JSONResponse({
+        "status": state,
+        "models_ready": ready,
+        "workers": workers,
+        "pending_jobs": job_queue.pending_count(),
+    }, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: request, job and per-stage latency metrics"""
+    if job_queue:
+        telemetry.QUEUE_PENDING.set(job_queue.pending_count())
+        telemetry.QUEUE_CAPACITY.set(job_queue.max_pending)
+        for state, count in job_queue.warm_up_status().items():
+            telemetry.WORKERS.set(count, state=state)
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+# ---------------- JOB ENDPOINTS ----------------
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), fmt: str = Query("xlsx", alias="format"), mode: str = Query(None),
+                     engine: str = Query(None)):
+    """
+    Queues a document and returns its job id immediately.
+    ?format=csv|parquet|ndjson skips the styled XLSX dashboard.
+    ?mode=structured reads tables cell by cell from their row / column grid.
+    ?engine=tesseract|easyocr|auto picks the OCR engine (auto: per page).
+    """
+    if not job_queue:
+        return _agents_unavailable()
+    if (error := _check_format(fmt) or _check_mode(mode) or _check_engine(engine)) is not None:
+        return error
+
+    try:
+        status = await _enqueue_upload(file, fmt, mode, engine)
+    except QueueFullError as e:
+        return _queue_full(e)
+    except UploadRejected as e:
+        return _upload_rejected(e)
+
+    return JSONResponse(_job_payload(status), status_code=202)
+
+@app.post("/batch", status_code=202)
+async def submit_batch(file: UploadFile = File(...), mode: str = Query(None), engine: str = Query(None)):
+    """Queues every document of a ZIP archive and returns a batch id"""
+    if not job_queue:
+        return _agents_unavailable()
+    if (error := _check_mode(mode) or _check_engine(engine)) is not None:
+        return error
+    options = _job_options(mode, engine)
+
+    try:
+        tmp_path, _, _ = await stream_to_disk(file, JOBS_DIR, MAX_BATCH_BYTES, sniff=sniff_zip, expected="a ZIP archive")
+    except UploadRejected as e:
+        return _upload_rejected(e)
+
+    try:
+        entries = await run_in_threadpool(batch.ingest_zip, tmp_path, JOBS_DIR, options=options)
+    except ValueError as e:
+        return _upload_rejected(UploadRejected(str(e), 400))
+    finally:
+        os.remove(tmp_path)
+
+    batch_id = await run_in_threadpool(batch.create_batch, BATCHES_DIR, entries, file.filename)
+    new_jobs = [e for e in entries if e["created"]]
+    print(f" [Orchestrator] Batch {batch_id}: {len(entries)} files, {len(new_jobs)} new jobs.")
+
+    feeder = asyncio.create_task(_feed_batch(new_jobs, options["mode"], options["engine"]))
+    _batch_feeders.add(feeder)
+    feeder.add_done_callback(_batch_feeders.discard)
+
+    progress = await run_in_threadpool(batch.batch_progress, BATCHES_DIR, batch_id, _job_status)
+    return JSONResponse(_batch_payload(progress), status_code=202)
+
+@app.get("/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    """Batch progress; once every document has finished, links the consolidated workbook"""
+    if not job_store.is_valid_job_id(batch_id):
+        return _unknown_batch()
+
+    progress = await run_in_threadpool(batch.batch_progress, BATCHES_DIR, batch_id, _job_status)
+    if progress is None:
+        return _unknown_batch()
+    return _batch_payload(progress)
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Reports job status (queued / running / done / failed) and result URLs"""
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+
+    status = _job_status(job_id)
+    if status is None:
+        return _unknown_job()
+    return _job_payload(status)
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def _stream_job_events(job_id, last_event_id=0):
+    """
+    Tails the job's events.ndjson (written by its worker, possibly behind
+    another server process) as Server-Sent Events. Event ids count events
+    from 1, so a reconnecting client resumes after its Last-Event-ID. The
+    stream ends with "done" / "failed", whose data is the job payload.
+    """
+    loop = asyncio.get_running_loop()
+    offset, seq = 0, 0
+    idle_since = loop.time()
+    while True:
+        events, offset = await run_in_threadpool(job_store.read_events, JOBS_DIR, job_id, offset)
+        for event in events:
+            seq += 1
+            if event["type"] in ("done", "failed"):
+                status = await run_in_threadpool(_job_status, job_id)
+                yield _sse(event["type"], {**event, **_job_payload(status)}, seq)
+                return
+            if seq > last_event_id:
+                yield _sse(event["type"], event, seq)
+                idle_since = loop.time()
+
+        if not events:
+            status = await run_in_threadpool(_job_status, job_id)
+            if status["status"] in ("done", "failed"):
+                # Its worker may have written the final event since the read above
+                late, _ = await run_in_threadpool(job_store.read_events, JOBS_DIR, job_id, offset)
+                if not late:
+                    # No event log: finished elsewhere, or failed before a worker took it
+                    yield _sse(status["status"], {"type": status["status"], **_job_payload(status)}, seq + 1)
+                    return
+                continue
+            if loop.time() - idle_since >= SSE_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                idle_since = loop.time()
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events of a job: "started" (page count), one "page" per
+    extracted page with its rows, "stage" (audit / report), then "done"
+    (stats + download URLs) or "failed"
+    """
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+    if await run_in_threadpool(_job_status, job_id) is None:
+        return _unknown_job()
+
+    last_event_id = request.headers.get("last-event-id", "")
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+    return StreamingResponse(
+        _stream_job_events(job_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------------- DOWNLOAD ENDPOINTS ----------------
 
-@app.get("/download/dashboard")
-def download_dashboard():
-    """Serves the colored Executive Dashboard"""
-    path = OUT_DIR / "FinVision_Dashboard.xlsx"
+def _job_file(job_id, filename, download_name=None, missing="File not generated yet", media_type=None):
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+
+    path = job_store.job_dir(JOBS_DIR, job_id) / filename
+    if path.exists():
+        return FileResponse(path, filename=download_name or filename, media_type=media_type)
+    return JSONResponse({"error": missing}, status_code=404)
+
+def _load_results(job_id):
+    """The audited frame and stats of a finished job, or (None, None)."""
+    status = job_store.read_status(JOBS_DIR, job_id)
+    if not status or status["status"] != "done":
+        return None, None
+    return exporters.load_frame(job_store.job_dir(JOBS_DIR, job_id)), status["result"]["stats"]
+
+
+def _write_export(job_id, fmt):
+    # Produces a format the worker did not write (e.g. the dashboard of a csv job)
+    df, stats = _load_results(job_id)
+    if df is None:
+        return None
+    reporting_agent = ReportingAgent(output_dir=str(OUT_DIR))
+    return reporting_agent.export(df, stats, fmt, output_dir=job_store.job_dir(JOBS_DIR, job_id))
+
+@app.get("/download/{job_id}/dashboard")
+async def download_dashboard(job_id: str, fmt: str = Query("xlsx", alias="format")):
+    """
+    Serves the audit results: the colored Executive Dashboard (xlsx), or
+    csv / parquet / ndjson streamed straight from the audited rows
+    """
+    if (error := _check_format(fmt)) is not None:
+        return error
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+    folder = job_store.job_dir(JOBS_DIR, job_id)
+
+    if fmt in ("xlsx", "parquet"):
+        # Binary formats with a footer: built once, then served as a file
+        if fmt == "xlsx":
+            name, media_type = "FinVision_Dashboard.xlsx", None
+        else:
+            name, media_type = exporters.export_path(folder, fmt).name, exporters.get_exporter(fmt).media_type
+        if not (folder / name).exists():
+            await run_in_threadpool(_write_export, job_id, fmt)
+        return _job_file(job_id, name, missing="Dashboard not generated yet", media_type=media_type)
+
+    status = job_store.read_status(JOBS_DIR, job_id)
+    if not status or status["status"] != "done":
+        return JSONResponse({"error": "Results not generated yet"}, status_code=404)
+
+    stats = status["result"]["stats"]
+    exporter = exporters.get_exporter(fmt)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{exporters.EXPORT_NAME}{exporter.extension}"',
+        "X-FinVision-Stats": json.dumps({key: stats.get(key) for key in HEADER_STATS}, default=str),
+    }
+
+    path = exporters.export_path(folder, fmt)
     if path.exists():
-        return FileResponse(path, filename="FinVision_Dashboard.xlsx")
-    return JSONResponse({"error": "Dashboard not generated yet"}, status_code=404)
+        return FileResponse(path, media_type=exporter.media_type, headers=headers)
+
+    df = await run_in_threadpool(exporters.load_frame, folder)
+    if df is None:
+        return JSONResponse({"error": "Results not generated yet"}, status_code=404)
+
+    # Rows are serialized chunk by chunk while the response is being sent
+    return StreamingResponse(exporter.stream(df, stats), media_type=exporter.media_type, headers=headers)
 
-@app.get("/download/ocr")
-def download_ocr():
+@app.get("/download/{job_id}/ocr")
+def download_ocr(job_id: str):
     """Serves the Raw OCR Data"""
-    path = OUT_DIR / "ocr_data.xlsx"
+    return _job_file(job_id, "ocr_data.xlsx", missing="OCR Data not found")
+
+@app.get("/download/{job_id}/preview")
+def download_preview(job_id: str):
+    """Serves the first-page preview image"""
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+
+    path = job_store.job_dir(JOBS_DIR, job_id) / "preview.png"
     if path.exists():
-        return FileResponse(path, filename="ocr_data.xlsx")
-    return JSONResponse({"error": "OCR Data not found"}, status_code=404)
+        return FileResponse(path, media_type="image/png")
+    return JSONResponse({"error": "Preview not generated yet"}, status_code=404)
 
-@app.get("/download/input")
-def download_input():
+@app.get("/download/{job_id}/input")
+def download_input(job_id: str):
     """Serves the Original Uploaded Image"""
-    global LAST_UPLOADED_FILE
-    if LAST_UPLOADED_FILE:
-        path = RAW_DIR / LAST_UPLOADED_FILE
-        if path.exists():
-            return FileResponse(path, filename=LAST_UPLOADED_FILE)
-    return JSONResponse({"error": "No input file uploaded yet"}, status_code=404)
+    if not job_store.is_valid_job_id(job_id):
+        return _unknown_job()
+
+    status = job_store.read_status(JOBS_DIR, job_id)
+    if status is None:
+        return _unknown_job()
+
+    filename = status.get("filename", "upload")
+    stored_name = job_store.input_path(JOBS_DIR, job_id, filename).name
+    return _job_file(job_id, stored_name, download_name=filename, missing="Input file not found")
+
+@app.get("/download/batch/{batch_id}")
+def download_batch_summary(batch_id: str):
+    """Serves the consolidated workbook of a finished batch"""
+    if not job_store.is_valid_job_id(batch_id):
+        return _unknown_batch()
+
+    path = BATCHES_DIR / batch_id / batch.SUMMARY_FILE
+    if path.exists():
+        return FileResponse(path, filename=batch.SUMMARY_FILE)
+    return JSONResponse({"error": "Batch summary not generated yet"}, status_code=404)
 
 if __name__ == "__main__":
     print(" Starting Server at http://127.0.0.1:8000")
     # Run on localhost to avoid firewall issues
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8000)
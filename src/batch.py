@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import uuid
+import zipfile
+import tempfile
+import traceback
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from src import job_store
+from src.uploads import sniff_type, safe_filename, UNSAFE_CHARS_RE, MAX_UPLOAD_BYTES
+from src.pipeline import init_worker, run_pipeline
+from src.agents.reporting_agent import ReportingAgent
+
+# ---------------- BATCH PROCESSING (FOLDERS AND ZIP ARCHIVES) ----------------
+# Month-end close means thousands of documents at once. Two entry points:
+# - the CLI (`python -m src.cli batch <dir>`) runs a folder on its own
+#   process pool, one document per task (run_batch)
+# - POST /batch loads a ZIP into the job store and feeds the server's job
+#   queue (ingest_zip); GET /batch/{id} reports progress (batch_progress)
+# Both end with one consolidated workbook: one summary row per document.
+
+DOCUMENT_SUFFIXES = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+SUMMARY_FILE = "FinVision_Batch_Summary.xlsx"
+BATCH_FILE = "batch.json"
+MAX_BATCH_FILES = int(os.getenv("FINVISION_MAX_BATCH_FILES", "5000"))
+
+
+def _is_hidden(relative_path):
+    return any(part.startswith(".") or part == "__MACOSX" for part in Path(relative_path).parts)
+
+
+def find_documents(folder):
+    """Every PDF / image below `folder`, in a stable order. Hidden files are skipped."""
+    folder = Path(folder)
+    return sorted(
+        p for p in folder.rglob("*")
+        if p.is_file() and p.suffix.lower() in DOCUMENT_SUFFIXES and not _is_hidden(p.relative_to(folder))
+    )
+
+
+def summary_row(document, status, result=None, error=None, seconds=None, output=None):
+    """One row of the consolidated workbook."""
+    result = result or {}
+    stats = result.get("stats") or {}
+    return {
+        "Document": document,
+        "Status": status,
+        "Rows": stats.get("total_rows"),
+        "Verified": stats.get("verified_count"),
+        "Risk / Unsigned": stats.get("unsigned_count"),
+        "Integrity Issues": stats.get("integrity_count"),
+        "Signature Detected": stats.get("signature_detected"),
+        "Signature Confidence": stats.get("signature_confidence"),
+        "Ink Density": stats.get("ink_density"),
+        "Cached": result.get("cached"),
+        "Seconds": round(seconds, 2) if seconds is not None else None,
+        "Output": output,
+        "Error": error,
+    }
+
+
+def summarize(rows, elapsed):
+    done = sum(1 for r in rows if r["Status"] == "done")
+    return {
+        "documents": len(rows),
+        "done": done,
+        "failed": len(rows) - done,
+        "unsigned_count": sum(r["Risk / Unsigned"] or 0 for r in rows),
+        "integrity_count": sum(r["Integrity Issues"] or 0 for r in rows),
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_minute": round(len(rows) / elapsed * 60, 1) if elapsed else 0,
+    }
+
+
+def write_summary(rows, output_path, elapsed):
+    """Writes the consolidated workbook atomically and returns its totals."""
+    output_path = Path(output_path)
+    totals = summarize(rows, elapsed)
+    fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, prefix=".summary-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        ReportingAgent(output_dir=str(output_path.parent)).generate_batch_summary(rows, totals, output_path=tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return totals
+
+
+# ---------------- LOCAL BATCH (CLI) ----------------
+
+def process_document(document, file_path, output_dir, formats=None, mode=None, engine=None):
+    """Worker task: runs the full pipeline for one document, never raises."""
+    start = time.perf_counter()
+    try:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        result = run_pipeline(file_path, output_dir, formats=formats, mode=mode, engine=engine)
+    except Exception as e:
+        print(f" [Worker {os.getpid()}] Processing Error ({document}): {e}")
+        print(traceback.format_exc())
+        return summary_row(document, "failed", error=str(e), seconds=time.perf_counter() - start)
+    return summary_row(document, "done", result, seconds=time.perf_counter() - start, output=str(output_dir))
+
+
+def run_batch(folder, output_dir, workers=None, cache_dir=None, on_progress=None, formats=None, mode=None,
+              engine=None):
+    """
+    Runs every document in `folder` on a pool of `workers` processes
+    (default: one per core). Each document's artifacts go to
+    <output_dir>/documents/<nnnn>_<name>/; the consolidated workbook to
+    <output_dir>/FinVision_Batch_Summary.xlsx.
+
+    `formats` are the per-document reports (default: the xlsx dashboard),
+    `mode` the OCR extraction mode and `engine` the OCR engine (default:
+    the OCR agent's).
+    `on_progress(done, total, row, elapsed)` is called as documents finish.
+    Returns (rows, totals, summary_path).
+    """
+    folder = Path(folder)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    documents = find_documents(folder)
+    names = [str(p.relative_to(folder)) for p in documents]
+    rows = [None] * len(documents)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(documents) or 1))
+    # Keep a few tasks queued per worker, not thousands of pickled paths
+    max_in_flight = 2 * workers
+    start = time.perf_counter()
+    finished = 0
+
+    def out_dir(i):
+        stem = UNSAFE_CHARS_RE.sub("_", documents[i].stem)[:60]
+        return output_dir / "documents" / f"{i + 1:04d}_{stem}"
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(str(output_dir), cache_dir, workers),
+    ) as pool:
+        todo = iter(range(len(documents)))
+        in_flight = {}
+
+        def submit_next():
+            for i in todo:
+                try:
+                    in_flight[pool.submit(
+                        process_document, names[i], str(documents[i]), str(out_dir(i)), formats, mode, engine
+                    )] = i
+                except BrokenProcessPool as e:
+                    rows[i] = summary_row(names[i], "failed", error=f"Worker pool broken: {e}")
+                    continue
+                return
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = in_flight.pop(future)
+                try:
+                    rows[i] = future.result()
+                except Exception as e:
+                    # The worker process itself died (e.g. OOM on a huge scan)
+                    rows[i] = summary_row(names[i], "failed", error=str(e) or type(e).__name__)
+                finished += 1
+                if on_progress:
+                    on_progress(finished, len(documents), rows[i], time.perf_counter() - start)
+                submit_next()
+
+    rows = [r for r in rows if r is not None]
+    summary_path = output_dir / SUMMARY_FILE
+    totals = write_summary(rows, summary_path, time.perf_counter() - start)
+    return rows, totals, summary_path
+
+
+# ---------------- SERVER BATCH (ZIP UPLOAD) ----------------
+
+def ingest_zip(zip_path, jobs_dir, max_file_bytes=None, max_files=None, options=None):
+    """
+    Streams every document of a ZIP into the job store (one content-addressed
+    job each, see job_store.job_key for `options`) without extracting the
+    archive to disk first.
+    Returns [{"document", "job_id", "filename", "created", "error"}].
+    Raises ValueError for archives that are not a valid ZIP or too large.
+    """
+    max_file_bytes = max_file_bytes or MAX_UPLOAD_BYTES
+    max_files = max_files or MAX_BATCH_FILES
+
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid ZIP archive: {e}")
+
+    entries = []
+    with archive:
+        members = [m for m in archive.infolist() if not m.is_dir() and not _is_hidden(m.filename)]
+        if len(members) > max_files:
+            raise ValueError(f"The archive holds {len(members)} files; the limit is {max_files}.")
+
+        for info in members:
+            entry = {"document": info.filename, "job_id": None, "filename": None, "created": False, "error": None}
+            entries.append(entry)
+
+            # file_size is what ZipExtFile will decompress at most (zip bomb guard)
+            if info.file_size > max_file_bytes:
+                entry["error"] = f"File too large. The limit is {max_file_bytes // (1024 * 1024)} MB."
+                continue
+            try:
+                with archive.open(info) as f:
+                    kind = sniff_type(f.read(16))
+                if kind is None:
+                    entry["error"] = "Unsupported file type"
+                    continue
+                filename = safe_filename(info.filename, kind)
+                with archive.open(info) as f:
+                    job_id, _, created = job_store.save_upload(jobs_dir, f, filename, options)
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError, OSError) as e:
+                # Corrupt, encrypted or unsupported compression
+                entry["error"] = str(e)
+                continue
+            entry.update(job_id=job_id, filename=filename, created=created)
+
+    return entries
+
+
+def batch_dir(batches_dir, batch_id):
+    if not job_store.is_valid_job_id(batch_id):
+        raise ValueError(f"Invalid batch id: {batch_id!r}")
+    return Path(batches_dir) / batch_id
+
+
+def create_batch(batches_dir, entries, name=None):
+    """Records a batch (its documents and their job ids). Returns the batch id."""
+    batch_id = uuid.uuid4().hex
+    folder = batch_dir(batches_dir, batch_id)
+    folder.mkdir(parents=True)
+
+    record = {"batch_id": batch_id, "name": name, "created_at": time.time(), "documents": entries}
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".batch-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, folder / BATCH_FILE)
+    return batch_id
+
+
+def read_batch(batches_dir, batch_id):
+    try:
+        with open(batch_dir(batches_dir, batch_id) / BATCH_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def batch_progress(batches_dir, batch_id, get_job_status):
+    """
+    Progress of a server batch, built from its jobs' status files
+    (`get_job_status(job_id)` -> job.json dict). Once every job has
+    finished, the consolidated workbook is written (once).
+    Returns None for unknown batches.
+    """
+    record = read_batch(batches_dir, batch_id)
+    if record is None:
+        return None
+
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    documents, rows = [], []
+    last_finished = record["created_at"]
+
+    for entry in record["documents"]:
+        status = get_job_status(entry["job_id"]) if entry["job_id"] else None
+        if status is None:
+            state, error = "failed", entry["error"] or "Job not found"
+        else:
+            state, error = status["status"], status.get("error")
+        counts[state] += 1
+        documents.append({"document": entry["document"], "job_id": entry["job_id"], "status": state, "error": error})
+
+        seconds = None
+        if status and status.get("finished_at"):
+            last_finished = max(last_finished, status["finished_at"])
+            if status.get("started_at"):
+                seconds = status["finished_at"] - status["started_at"]
+        rows.append(summary_row(entry["document"], state, (status or {}).get("result"), error, seconds, entry["job_id"]))
+
+    finished = counts["done"] + counts["failed"]
+    complete = finished == len(documents)
+    elapsed = (last_finished if complete else time.time()) - record["created_at"]
+
+    summary_path = batch_dir(batches_dir, batch_id) / SUMMARY_FILE
+    if complete and not summary_path.exists():
+        write_summary(rows, summary_path, elapsed)
+
+    return {
+        "batch_id": batch_id,
+        "status": "done" if complete else "running",
+        "total": len(documents),
+        "finished": finished,
+        "counts": counts,
+        "docs_per_minute": round(finished / elapsed * 60, 1) if elapsed > 0 else 0,
+        "documents": documents,
+    }
@@ -0,0 +1,399 @@
+import io
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import contextlib
+import subprocess
+from pathlib import Path
+import pandas as pd
+
+# ---------------- PATH FIX ----------------
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from src.agents.ocr_agent import OCRAgent, EXTRACTION_MODES
+from src.agents.ocr_engines import ENGINES
+from src.agents.audit_agent import AuditAgent
+from src.agents.reporting_agent import ReportingAgent
+from src.agents.audit_rules import _norm, to_number
+from src.agents.exporters import FORMATS
+from src.agents.evaluation_agent import field_accuracy, numeric_accuracy, row_accuracy
+from src.batch import find_documents
+from src.test_metrics import calculate_accuracy
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# ---------------- END-TO-END PIPELINE BENCHMARK ----------------
+# Runs OCR -> audit -> reporting over every PDF / image of a corpus folder
+# in this process and writes a JSON report: wall time per stage, pages per
+# second, peak RSS and accuracy against ground truth. A report can be
+# compared with a saved baseline; regressions make the exit code 1.
+#
+# Ground truth for <name>.<ext> is <name>.json (a list of row dicts, or
+# {"rows": [...]}, scored with evaluation_agent) or <name>.txt (plain text,
+# character / bag-of-words accuracy as in test_metrics.py). It is looked up
+# next to the document, then in --ground-truth.
+#
+#   python src/bench_pipeline.py data/raw
+#   python src/bench_pipeline.py corpus/ --mode structured --baseline data/output/benchmarks/base.json
+#   python src/bench_pipeline.py corpus/ --engine auto --baseline data/output/benchmarks/base.json
+#   python src/bench_pipeline.py --compare new.json base.json
+
+REPORT_DIR = ROOT / "data" / "output" / "benchmarks"
+
+# Stages in pipeline order; OCR phases come from OCRAgent.timings
+STAGES = ("rasterize", "text_layer", "preprocess", "triage", "detect", "recognize", "structure", "signatures", "audit", "report")
+
+# Summary metrics checked by --baseline / --compare: (key, higher is better)
+THROUGHPUT_METRICS = (("pages_per_second", True), ("peak_rss_mb", False))
+ACCURACY_METRICS = ("field_accuracy", "numeric_accuracy", "row_accuracy", "char_accuracy", "word_accuracy")
+
+OHLC_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ---------------- GROUND TRUTH & ACCURACY ----------------
+
+def load_ground_truth(document, gt_dirs):
+    """("rows", [dict]) / ("text", str) for a document, or (None, None)."""
+    for folder in [document.parent, *gt_dirs]:
+        json_path, txt_path = folder / f"{document.stem}.json", folder / f"{document.stem}.txt"
+        if json_path.exists():
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return "rows", data["rows"] if isinstance(data, dict) else data
+        if txt_path.exists():
+            with open(txt_path, "r", encoding="utf-8") as f:
+                return "text", f.read().strip()
+    return None, None
+
+
+def _match_column(columns, key):
+    # "Close / Last" answers to "close", "Date" to "date"
+    wanted = _norm(key)
+    for name in columns:
+        if _norm(name) == wanted:
+            return name
+    for name in columns:
+        if _norm(name).startswith(wanted):
+            return name
+    return None
+
+
+def predicted_rows(df, gt_rows):
+    """
+    The extracted table as row dicts keyed like the ground truth. Fields
+    that are numbers in the ground truth are parsed as amounts.
+    """
+    if not gt_rows:
+        return []
+    sample = gt_rows[0]
+    columns = {}
+    for key in sample:
+        name = _match_column(df.columns, key)
+        if name is None:
+            columns[key] = [None] * len(df)
+            continue
+        col = df[name]
+        if isinstance(col, pd.DataFrame):  # duplicated header
+            col = col.iloc[:, 0]
+        if isinstance(sample[key], (int, float)):
+            columns[key] = [None if v != v else v for v in to_number(col)]
+        else:
+            columns[key] = ["" if v is None else str(v).strip() for v in col.tolist()]
+    return [{key: columns[key][i] for key in sample} for i in range(len(df))]
+
+
+def score(df, kind, truth):
+    if kind == "rows":
+        pred = predicted_rows(df, truth)
+        scores = {
+            "field_accuracy": round(field_accuracy(pred, truth), 2),
+            "row_accuracy": round(row_accuracy(pred, truth), 2),
+            "rows_expected": len(truth),
+            "rows_extracted": len(df),
+        }
+        if truth and all(field in truth[0] for field in OHLC_FIELDS):
+            scores["numeric_accuracy"] = round(numeric_accuracy(pred, truth), 2)
+        return scores
+    if kind == "text":
+        text = " ".join(" ".join(df.astype(str).values.flatten()).split())
+        char_acc, word_acc = calculate_accuracy(text, " ".join(truth.split()))
+        return {"char_accuracy": char_acc, "word_accuracy": word_acc}
+    return {}
+
+
+# ---------------- RUN ----------------
+
+def _timed(timings, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    return result
+
+
+def run_document(path, agents, mode, formats, gt_dirs, out_dir, engine=None):
+    ocr_agent, audit_agent, reporting_agent = agents
+    timings = {}
+    signatures = {}
+
+    def check_page(page):
+        signatures[page.index] = _timed(timings, "signatures", lambda: audit_agent.detect_signatures(page))
+
+    start = time.perf_counter()
+    document = _timed(timings, "rasterize", lambda: ocr_agent.load_document(path))
+    df = ocr_agent.extract_structured_data(document, on_render=check_page, mode=mode, engine=engine)
+    for name, ms in ocr_agent.timings.items():
+        timings[name] = timings.get(name, 0.0) + ms
+
+    audited, stats = _timed(timings, "audit", lambda: audit_agent.audit_dataframe(
+        df.copy(), signatures=[signatures[i] for i in sorted(signatures)]
+    ))
+    for fmt in formats:
+        _timed(timings, "report", lambda: reporting_agent.export(audited, stats, fmt, output_dir=out_dir))
+    seconds = time.perf_counter() - start
+
+    pages = document.page_count
+    result = {
+        "document": str(path),
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 3) if seconds else None,
+        "stage_ms": {name: round(timings[name], 1) for name in STAGES if name in timings},
+        "preprocess_stage_ms": {name: round(ms, 1) for name, ms in ocr_agent.stage_timings.items()},
+        "rows": len(df),
+        "engine_pages": dict(ocr_agent.engine_counts),
+        "demo_data": ocr_agent.used_fallback,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    kind, truth = load_ground_truth(path, gt_dirs)
+    if kind is None:
+        result["accuracy"] = None
+    elif ocr_agent.used_fallback:
+        # Demo rows say nothing about OCR quality
+        result["accuracy"] = None
+    else:
+        result["accuracy"] = score(df, kind, truth)
+    return result
+
+
+def summarize(documents):
+    done = [d for d in documents if "error" not in d]
+    pages = sum(d["pages"] for d in done)
+    seconds = sum(d["seconds"] for d in done)
+
+    stage_ms, engine_pages = {}, {}
+    for d in done:
+        for name, ms in d["stage_ms"].items():
+            stage_ms[name] = stage_ms.get(name, 0.0) + ms
+        for name, n in d.get("engine_pages", {}).items():
+            engine_pages[name] = engine_pages.get(name, 0) + n
+    summary = {
+        "documents": len(documents),
+        "failed": len(documents) - len(done),
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 3) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stage_ms": {name: round(stage_ms[name], 1) for name in STAGES if name in stage_ms},
+        "stage_ms_per_page": {name: round(stage_ms[name] / pages, 2) for name in STAGES if name in stage_ms and pages},
+        "demo_data_documents": sum(1 for d in done if d["demo_data"]),
+        "engine_pages": engine_pages,
+    }
+    for metric in ACCURACY_METRICS:
+        values = [d["accuracy"][metric] for d in done if d.get("accuracy") and metric in d["accuracy"]]
+        if values:
+            summary[metric] = round(sum(values) / len(values), 2)
+    return summary
+
+
+def run(corpus, mode=None, layout_px=None, formats=("xlsx",), gt_dirs=(), limit=None, verbose=False, engine=None):
+    settings = {} if layout_px is None else {"layout_text_px": layout_px}
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        agents = (OCRAgent(settings=settings), AuditAgent(), ReportingAgent())
+    ocr_agent = agents[0]
+
+    paths = find_documents(corpus)[:limit]
+    documents = []
+    print(f" [Bench] {len(paths)} documents in {corpus} "
+          f"(mode {mode or ocr_agent.settings['mode']}, engine {engine or ocr_agent.settings['engine']})")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for i, path in enumerate(paths, 1):
+            try:
+                with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                    result = run_document(path, agents, mode, formats, gt_dirs, out_dir, engine)
+            except Exception as e:
+                result = {"document": str(path), "error": str(e)}
+                print(f" [Bench] ❌ {i}/{len(paths)} {path.name}: {e}")
+            else:
+                acc = result["accuracy"] or {}
+                shown = ", ".join(f"{k} {v}" for k, v in acc.items() if k in ACCURACY_METRICS) or "no accuracy"
+                flag = " ⚠️ demo data" if result["demo_data"] else ""
+                print(f" [Bench] ✅ {i}/{len(paths)} {path.name}: {result['pages']} page(s), "
+                      f"{result['seconds']:.2f}s, {shown}{flag}")
+            documents.append(result)
+    ocr_agent.close()
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": str(corpus),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "commit": _git_commit(),
+        },
+        "config": {
+            "mode": mode or ocr_agent.settings["mode"],
+            "engine": engine or ocr_agent.settings["engine"],
+            "formats": list(formats),
+            "ocr_settings": ocr_agent.settings,
+            "batched": ocr_agent.batched,
+            "batch_size": ocr_agent.batch_size,
+            "page_workers": ocr_agent.page_workers,
+        },
+        "summary": summarize(documents),
+        "documents": documents,
+    }
+
+
+# ---------------- COMPARE ----------------
+
+def compare(report, baseline, max_slowdown=0.10, max_accuracy_drop=1.0, min_stage_ms=5.0):
+    """
+    Summary metrics of `report` against `baseline`. Returns a list of
+    {"metric", "baseline", "current", "change", "regression"}.
+    Throughput, memory and stage times regress when they get worse by more
+    than `max_slowdown` (a fraction; stage times also by more than
+    `min_stage_ms` per page), accuracies when they drop by more than
+    `max_accuracy_drop` points.
+    """
+    new, old = report["summary"], baseline["summary"]
+    rows = []
+
+    def add(metric, before, after, regression, change):
+        rows.append({"metric": metric, "baseline": before, "current": after, "change": change, "regression": regression})
+
+    for key, higher_is_better in THROUGHPUT_METRICS:
+        before, after = old.get(key), new.get(key)
+        if before and after is not None:
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            add(key, before, after, worse > max_slowdown, f"{change:+.1%}")
+
+    for name in STAGES:
+        before = old.get("stage_ms_per_page", {}).get(name)
+        after = new.get("stage_ms_per_page", {}).get(name)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        add(f"stage_ms_per_page.{name}", before, after,
+            change > max_slowdown and after - before > min_stage_ms, f"{change:+.1%}")
+
+    for key in ACCURACY_METRICS:
+        before, after = old.get(key), new.get(key)
+        if before is not None and after is not None:
+            add(key, before, after, before - after > max_accuracy_drop, f"{after - before:+.2f} pts")
+    return rows
+
+
+def print_comparison(rows):
+    print(f"\n {'metric':<32} | {'baseline':>10} | {'current':>10} | {'change':>10}")
+    print("-" * 72)
+    for row in rows:
+        mark = "  ❌ REGRESSION" if row["regression"] else ""
+        print(f" {row['metric']:<32} | {row['baseline']:>10} | {row['current']:>10} | {row['change']:>10}{mark}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n {'❌ ' + str(regressions) + ' regression(s)' if regressions else '✅ No regressions'}\n")
+    return regressions
+
+
+def print_summary(report):
+    s = report["summary"]
+    print("\n" + "=" * 64)
+    print(" ⚡ FINVISION AI - PIPELINE BENCHMARK")
+    print("=" * 64)
+    print(f" Documents: {s['documents']} ({s['failed']} failed) | Pages: {s['pages']} | {s['seconds']:.2f}s")
+    print(f" Throughput: {s['pages_per_second']} pages/s | Peak RSS: {s['peak_rss_mb']} MB")
+    for name, ms in s["stage_ms_per_page"].items():
+        print(f"   {name:<12} {ms:10.2f} ms/page")
+    for metric in ACCURACY_METRICS:
+        if metric in s:
+            print(f" {metric}: {s[metric]}%")
+    if s["demo_data_documents"]:
+        print(f" ⚠️  {s['demo_data_documents']} document(s) used demo data (OCR engine unavailable)")
+    print("=" * 64)
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end throughput and accuracy benchmark over a corpus")
+    parser.add_argument("corpus", nargs="?", help="Folder of PDFs / images (with ground truth)")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default=None, help="OCR extraction mode")
+    parser.add_argument("--engine", choices=ENGINES, default=None, help="OCR engine (auto: per page)")
+    parser.add_argument("--layout-px", type=int, default=None,
+                        help="Text height of the detection pyramid level (0 = full resolution)")
+    parser.add_argument("--format", action="append", choices=FORMATS,
+                        help="Report format written per document; repeat for several (default: xlsx)")
+    parser.add_argument("--ground-truth", action="append", default=[],
+                        help="Extra folder to look for <name>.json / <name>.txt (default: data/ground_truth)")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N documents")
+    parser.add_argument("--output", default=None, help="Report path (default: data/output/benchmarks/bench_<time>.json)")
+    parser.add_argument("--baseline", default=None, help="Saved report to check this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("REPORT", "BASELINE"), help="Only compare two saved reports")
+    parser.add_argument("--max-slowdown", type=float, default=0.10, help="Allowed throughput / stage time loss (fraction)")
+    parser.add_argument("--max-accuracy-drop", type=float, default=1.0, help="Allowed accuracy loss (points)")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' progress output")
+    args = parser.parse_args()
+
+    if args.compare:
+        current, base = (_load(p) for p in args.compare)
+    else:
+        if not args.corpus or not Path(args.corpus).is_dir():
+            parser.error("a corpus folder is required (or use --compare)")
+        gt_dirs = [Path(p) for p in args.ground_truth] or [ROOT / "data" / "ground_truth"]
+        current = run(Path(args.corpus), args.mode, args.layout_px, args.format or ["xlsx"], gt_dirs,
+                      args.limit, args.verbose, args.engine)
+        print_summary(current)
+
+        output = Path(args.output) if args.output else REPORT_DIR / f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f" [Bench] Report: {output}")
+        base = _load(args.baseline) if args.baseline else None
+
+    if base is not None:
+        regressions = print_comparison(compare(current, base, args.max_slowdown, args.max_accuracy_drop))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,79 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# ---------------- PATH FIX ----------------
+# Allows `python src/cli.py ...` as well as `python -m src.cli ...`
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # FinVision-AI root
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from src.batch import run_batch
+from src.agents.exporters import FORMATS
+from src.agents.ocr_agent import EXTRACTION_MODES
+from src.agents.ocr_engines import ENGINES
+
+# ---------------- COMMAND LINE ----------------
+#   python -m src.cli batch <folder> [--output DIR] [--workers N] [--format FMT] [--mode MODE] [--engine ENGINE] [--no-cache]
+
+
+def _print_progress(done, total, row, elapsed):
+    rate = done / elapsed * 60 if elapsed else 0
+    mark = "✅" if row["Status"] == "done" else "❌"
+    detail = f"{row['Rows']} rows, {row['Risk / Unsigned']} risks, {row['Integrity Issues']} integrity issues" if row["Status"] == "done" else row["Error"]
+    print(f" [Batch] {mark} {done}/{total} {row['Document']} ({detail}) - {rate:.1f} docs/min", flush=True)
+
+
+def cmd_batch(args):
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"❌ Not a folder: {folder}")
+        return 2
+
+    cache_dir = None if args.no_cache else os.getenv("FINVISION_CACHE_DIR", str(ROOT / "data" / "cache"))
+    print(f" [Batch] Processing {folder} -> {args.output}")
+
+    rows, totals, summary_path = run_batch(
+        folder, args.output, workers=args.workers, cache_dir=cache_dir,
+        on_progress=_print_progress, formats=args.format or ["xlsx"], mode=args.mode,
+        engine=args.engine
+    )
+    if not rows:
+        print(f" [Batch] ⚠️  No PDF or image files found in {folder}")
+        return 1
+
+    print(
+        f" [Batch] Done: {totals['done']}/{totals['documents']} documents in {totals['elapsed_seconds']}s "
+        f"({totals['docs_per_minute']} docs/min), {totals['failed']} failed."
+    )
+    print(f" [Batch] Summary: {summary_path}")
+    return 1 if totals["failed"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="finvision", description="FinVision AI command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="Audit every PDF / image in a folder")
+    batch.add_argument("folder", help="Folder to scan (recursively)")
+    batch.add_argument("--output", default=str(ROOT / "data" / "output" / "batch"),
+                       help="Where per-document results and the summary workbook go")
+    batch.add_argument("--workers", type=int, default=None,
+                       help="Worker processes (default: one per CPU core)")
+    batch.add_argument("--format", action="append", choices=FORMATS,
+                       help="Per-document report format; repeat for several (default: xlsx)")
+    batch.add_argument("--mode", choices=EXTRACTION_MODES, default=None,
+                       help="OCR extraction mode: clustered text boxes or the structured row/column grid")
+    batch.add_argument("--engine", choices=ENGINES, default=None,
+                       help="OCR engine; 'auto' reads clean pages with Tesseract and the rest with EasyOCR")
+    batch.add_argument("--no-cache", action="store_true", help="Ignore the result cache")
+    batch.set_defaults(func=cmd_batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
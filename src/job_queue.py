@@ -0,0 +1,165 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ---------------- JOB QUEUE (BOUNDED WORKER POOL) ----------------
+
+
+class QueueFullError(Exception):
+    """Raised when the number of in-flight jobs has reached the limit."""
+
+
+class JobQueue:
+    """
+    Runs pipeline jobs on a pool of worker processes.
+
+    - `max_workers` processes execute jobs (env: FINVISION_WORKERS)
+    - at most `max_pending` jobs may be queued or running at once
+      (env: FINVISION_MAX_PENDING); further submissions raise QueueFullError
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, initializer=None, initargs=(), max_history=1000):
+        self.max_workers = max_workers or int(os.getenv("FINVISION_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("FINVISION_MAX_PENDING", str(self.max_workers * 4)))
+        self.max_history = max_history
+
+        self._initializer = initializer
+        self._initargs = initargs
+        self._executor = None
+
+        self._jobs = {}
+        self._warm_up = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _get_executor(self):
+        # Created lazily so importing the app never forks/spawns processes.
+        # 'spawn' keeps PyTorch (EasyOCR) out of forked interpreter state.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+                initargs=self._initargs,
+            )
+            print(f" [Job Queue] Started {self.max_workers} worker(s), capacity {self.max_pending}.")
+        return self._executor
+
+    def submit(self, fn, *args, job_id=None, **kwargs):
+        """
+        Submits `fn(*args, **kwargs)` to the pool and returns the job id
+        (a random one unless `job_id` is given).
+        Raises QueueFullError instead of blocking when the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Job queue is full ({self.max_pending} jobs in flight)")
+
+        job_id = job_id or uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "created_at": time.time(),
+            "finished_at": None,
+            "future": None,
+        }
+
+        try:
+            try:
+                future = self._get_executor().submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge scan): start a fresh pool once
+                print(" [Job Queue] ⚠️  Worker pool broken. Restarting...")
+                self._executor = None
+                future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        job["future"] = future
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+
+        future.add_done_callback(lambda f, job=job: self._on_done(job))
+        return job_id
+
+    def _on_done(self, job):
+        job["finished_at"] = time.time()
+        self._slots.release()
+
+    def _prune(self):
+        # Forget the oldest finished jobs once history grows past the limit
+        if len(self._jobs) <= self.max_history:
+            return
+        finished = [j for j in self._jobs.values() if j["finished_at"] is not None]
+        finished.sort(key=lambda j: j["finished_at"])
+        for j in finished[: len(self._jobs) - self.max_history]:
+            del self._jobs[j["id"]]
+
+    def get_future(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job["future"] if job else None
+
+    def status(self, job_id):
+        """
+        Returns {"id", "status", "result", "error"} or None for unknown ids.
+        Status is one of: queued, running, done, failed.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        info = {"id": job_id, "status": "queued", "result": None, "error": None}
+
+        if future.cancelled():
+            info["status"] = "failed"
+            info["error"] = "Job was cancelled"
+        elif future.done():
+            error = future.exception()
+            if error is not None:
+                info["status"] = "failed"
+                info["error"] = str(error)
+            else:
+                info["status"] = "done"
+                info["result"] = future.result()
+        elif future.running():
+            info["status"] = "running"
+
+        return info
+
+    def warm_up(self, fn):
+        """
+        Starts every worker process and runs `fn` (e.g. model loading) in
+        each of them, without blocking and without using job slots.
+        """
+        executor = self._get_executor()
+        self._warm_up = [executor.submit(fn) for _ in range(self.max_workers)]
+
+    def warm_up_status(self):
+        """Counts warm-up tasks by outcome: ready / failed / loading."""
+        counts = {"ready": 0, "failed": 0, "loading": 0}
+        for future in self._warm_up:
+            if not future.done():
+                counts["loading"] += 1
+            elif future.cancelled() or future.exception() is not None:
+                counts["failed"] += 1
+            elif future.result().get("status") == "ready":
+                counts["ready"] += 1
+            else:
+                counts["failed"] += 1
+        return counts
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["finished_at"] is None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+# ---------------- JOB STORE (PER-JOB OUTPUT DIRECTORIES) ----------------
+# Every uploaded document gets its own directory, keyed by the SHA-256 of its
+# bytes and the per-request options that change its result (job_key). All
+# artifacts of that job (input, preview, reports, status) live there, so
+# concurrent uploads - even across several uvicorn workers - never overwrite
+# each other's files.
+#
+#   <jobs_dir>/<job_id>/
+#       input.<ext>                 original upload
+#       preview.png                 first page preview
+#       ocr_data.xlsx               raw OCR output
+#       FinVision_Dashboard.xlsx    executive dashboard
+#       FinVision_Audit.<fmt>       csv / parquet / ndjson exports (if requested)
+#       audit_frame.parquet         audited rows, used to build exports on download
+#       job.json                    status + result (shared across processes)
+#       events.ndjson               progress events of the last run (page rows, final stats)
+
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+STATUS_FILE = "job.json"
+EVENTS_FILE = "events.ndjson"
+
+# A queued/running job nobody has touched for this long is assumed lost
+# (e.g. the server restarted mid-job) and may be resubmitted.
+STALE_AFTER = int(os.getenv("FINVISION_JOB_TIMEOUT", "3600"))
+
+
+def is_valid_job_id(job_id):
+    return bool(JOB_ID_RE.match(job_id or ""))
+
+
+def job_dir(jobs_dir, job_id):
+    if not is_valid_job_id(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return Path(jobs_dir) / job_id
+
+
+def input_path(jobs_dir, job_id, filename):
+    suffix = Path(filename or "").suffix.lower()
+    return job_dir(jobs_dir, job_id) / f"input{suffix}"
+
+
+def read_status(jobs_dir, job_id):
+    """Returns the job.json dict, or None if the job does not exist."""
+    try:
+        with open(job_dir(jobs_dir, job_id) / STATUS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_status(jobs_dir, job_id, **fields):
+    """
+    Merges `fields` into job.json. Written atomically (temp file + rename)
+    so readers in other processes never see a half-written file.
+    """
+    folder = job_dir(jobs_dir, job_id)
+    status = read_status(jobs_dir, job_id) or {"job_id": job_id}
+    status.update(fields)
+    status["updated_at"] = time.time()
+
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".job-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, folder / STATUS_FILE)
+    return status
+
+
+def clear_events(jobs_dir, job_id):
+    """Starts a fresh event log (a resubmitted job replays only its new run)."""
+    open(job_dir(jobs_dir, job_id) / EVENTS_FILE, "w").close()
+
+
+def append_event(jobs_dir, job_id, event):
+    """
+    Appends one event to the job's events.ndjson. Each event is a single
+    write of a complete line, so readers in other processes only ever see
+    whole events once they see the newline.
+    """
+    line = json.dumps(event, default=str) + "\n"
+    with open(job_dir(jobs_dir, job_id) / EVENTS_FILE, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def read_events(jobs_dir, job_id, offset=0):
+    """
+    Complete events written after byte `offset`.
+    Returns ([event, ...], new offset); a trailing partial line is left for
+    the next call.
+    """
+    try:
+        with open(job_dir(jobs_dir, job_id) / EVENTS_FILE, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+
+    end = data.rfind(b"\n") + 1
+    events = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return events, offset + end
+
+
+def is_stale(status):
+    return (
+        status.get("status") in ("queued", "running")
+        and time.time() - status.get("updated_at", 0) > STALE_AFTER
+    )
+
+
+def job_key(content_hash, options=None):
+    """
+    Job id of an upload: the SHA-256 of its bytes (`content_hash`) combined
+    with `options`, the request settings that change the result (e.g. the
+    OCR mode). The same bytes sent with other options are another job.
+    """
+    if not options:
+        return content_hash[:32]
+    key = json.dumps({"sha256": content_hash, "options": options}, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def claim_upload(jobs_dir, tmp_path, content_hash, filename, options=None):
+    """
+    Moves an upload already written to `tmp_path` into its job directory.
+    The job id is derived from the SHA-256 of its bytes (`content_hash`)
+    and `options` (see job_key), which are recorded in job.json.
+
+    Returns (job_id, status, created):
+    - created=True  -> new job directory, status is "queued"
+    - created=False -> the same bytes were uploaded before with the same
+                       options; the existing job's status is returned and
+                       the copy is discarded
+    """
+    job_id = job_key(content_hash, options)
+    folder = job_dir(jobs_dir, job_id)
+    try:
+        try:
+            # mkdir is atomic: exactly one process claims a new job id
+            folder.mkdir()
+        except FileExistsError:
+            status = read_status(jobs_dir, job_id)
+            if status and status.get("status") != "failed" and not is_stale(status):
+                return job_id, status, False
+            # Failed, stale or half-created job: take it over and rerun. Its
+            # old events go now, or a client following the new run would
+            # replay the previous run's "failed" before the worker starts
+            folder.mkdir(exist_ok=True)
+            clear_events(jobs_dir, job_id)
+
+        shutil.move(tmp_path, input_path(jobs_dir, job_id, filename))
+        tmp_path = None
+
+        status = write_status(
+            jobs_dir, job_id,
+            status="queued",
+            filename=Path(filename or "upload").name,
+            created_at=time.time(),
+            result=None,
+            error=None,
+            options=options or {},
+        )
+        return job_id, status, True
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def new_upload_file(jobs_dir):
+    """Opens a temp file inside the job store for an incoming upload."""
+    jobs_dir = Path(jobs_dir)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=jobs_dir, prefix=".upload-")
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+def save_upload(jobs_dir, fileobj, filename, options=None):
+    """
+    Streams a file object into the job store while hashing it.
+    Returns (job_id, status, created) - see claim_upload.
+    """
+    sha = hashlib.sha256()
+    buffer, tmp_path = new_upload_file(jobs_dir)
+    try:
+        with buffer:
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+                sha.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return claim_upload(jobs_dir, tmp_path, sha.hexdigest(), filename, options)
@@ -0,0 +1,233 @@
+import os
+import time
+import logging
+import shutil
+import traceback
+from pathlib import Path
+
+from src.agents.ocr_agent import OCRAgent
+from src.agents.document_loader import load_document
+from src.agents.audit_agent import AuditAgent
+from src.agents.reporting_agent import ReportingAgent
+from src.agents import model_registry, exporters, ocr_engines
+from src import job_store, telemetry
+from src.telemetry import timed
+from src.result_cache import ResultCache, file_sha256, make_key
+
+# ---------------- PER-PROCESS AGENTS ----------------
+# Every worker process owns its own agents. EasyOCR models are loaded once per
+# worker (in the pool initializer) and reused for every job that worker runs.
+_agents = {}
+
+
+def init_worker(output_dir, cache_dir=None, n_workers=None):
+    """
+    Pool initializer: builds the agents (and the shared result cache)
+    inside the worker process. `n_workers` (the pool size) splits the CPU
+    cores between the workers.
+    """
+    print(f" [Worker {os.getpid()}] Initializing AI Agents...")
+    if n_workers:
+        model_registry.share_cores(n_workers)
+    _agents["ocr"] = OCRAgent()
+    _agents["audit"] = AuditAgent()
+    _agents["reporting"] = ReportingAgent(output_dir=output_dir)
+    _agents["cache"] = ResultCache(cache_dir) if cache_dir else None
+    print(f" [Worker {os.getpid()}] ✅ Agents Ready.")
+
+
+def warm_up_worker():
+    """
+    Loads the default OCR engine(s) in this worker ahead of the first job.
+    Returns the worker's engine status (used by /healthz).
+    """
+    settings = _agents["ocr"].settings if _agents else OCRAgent.DEFAULT_SETTINGS
+    return ocr_engines.warm_up(settings["engine"], settings["languages"])
+
+
+def _get_agents(output_dir):
+    # Fallback for callers that run the pipeline outside the pool
+    if not _agents:
+        init_worker(output_dir)
+    return _agents["ocr"], _agents["audit"], _agents["reporting"], _agents["cache"]
+
+
+# ---------------- PIPELINE ----------------
+
+# Longer side of the preview thumbnail, in pixels
+PREVIEW_MAX_SIZE = int(os.getenv("FINVISION_PREVIEW_MAX_PX", "1200"))
+
+# Pages the OCR agent never rasterizes (demo data) are rendered at this
+# resolution only for the signature check, which works on ~600px wide pages
+SIGNATURE_DPI = int(os.getenv("FINVISION_SIGNATURE_DPI", "72"))
+
+# Artifacts stored alongside a cached result so a hit only needs file copies
+CACHED_ARTIFACTS = ("preview.png", "ocr_data.xlsx", "FinVision_Dashboard.xlsx")
+
+def _write_outputs(reporting_agent, df, stats, output_dir, formats, existing=()):
+    # The audited frame is always kept, so any format can be produced on download
+    exporters.save_frame(df, output_dir)
+    for fmt in formats:
+        if fmt == "xlsx" and "FinVision_Dashboard.xlsx" in existing:
+            continue
+        reporting_agent.export(df, stats, fmt, output_dir=output_dir)
+
+
+def _check_remaining_pages(audit_agent, document, signatures):
+    """Signature check for the pages OCR did not render (fills `signatures`)."""
+    missing = [i for i in range(document.page_count) if i not in signatures]
+    if not missing:
+        return
+    if missing[0] == 0:
+        signatures[0] = audit_agent.detect_signatures(document.first_page())
+        missing = missing[1:]
+    if missing:
+        for page in load_document(document.path, dpi=SIGNATURE_DPI, chunk_size=document.chunk_size).iter_pages(missing):
+            signatures[page.index] = audit_agent.detect_signatures(page)
+
+
+def _page_event(index, df, pages, done):
+    # One page's extracted (not yet audited) rows, JSON-ready
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    return {"type": "page", "page": index + 1, "pages": pages, "pages_done": done,
+            "columns": [str(c) for c in df.columns], "rows": rows}
+
+
+def run_pipeline(file_path, output_dir, formats=None, mode=None, on_event=None, engine=None):
+    """
+    Runs OCR -> Audit -> Reporting for one document.
+    All artifacts are written into `output_dir`; returns a picklable result dict.
+    `formats` picks the reports to write (default: the xlsx dashboard);
+    csv / parquet / ndjson skip XLSX styling entirely. `mode` is the OCR
+    extraction mode ("clustered" / "structured"; default: the agent's) and
+    `engine` its OCR engine ("easyocr" / "tesseract" / "auto"; default: the
+    agent's). OCR engine failures raise unless FINVISION_DEMO_DATA=1.
+    The result's "timings" holds the milliseconds spent per stage (OCR
+    phases from the OCR agent, then signatures / audit / report) and
+    "seconds" the whole run. `on_event(event)` receives progress as it
+    happens: "started" (page count), one "page" per extracted page with its
+    rows, then "stage" (audit / report).
+    """
+    emit = on_event or (lambda event: None)
+    ocr_agent, audit_agent, reporting_agent, cache = _get_agents(output_dir)
+    start = time.perf_counter()
+    timings = {}
+
+    file_path = Path(file_path)
+    output_dir = Path(output_dir)
+    preview_path = output_dir / "preview.png"
+    formats = list(formats or ["xlsx"])
+    mode = mode or ocr_agent.settings["mode"]
+    engine = engine or ocr_agent.settings["engine"]
+
+    # 0. Result cache: identical bytes + identical OCR and audit settings => skip OCR, audit & reporting
+    cache_key = None
+    if cache is not None:
+        ocr_settings = {**ocr_agent.settings, "mode": mode, "engine": engine}
+        with timed(timings, "cache"):
+            cache_key = make_key(file_sha256(file_path), {"ocr": ocr_settings, "audit": audit_agent.settings})
+            cached = cache.get(cache_key)
+            if cached is not None:
+                for name, path in cached["files"].items():
+                    shutil.copy(path, output_dir / name)
+        if cached is not None:
+            with timed(timings, "report"):
+                _write_outputs(reporting_agent, cached["df"], cached["stats"], output_dir, formats,
+                               existing=cached["files"])
+            return _result(cached["stats"], True, formats, mode, engine, timings, start)
+
+    # 1. Load the document once: page 1 is decoded a single time and shared
+    # by the preview, the Audit Agent (signature check) and the OCR Agent.
+    with timed(timings, "rasterize"):
+        document = ocr_agent.load_document(file_path)
+        first_page = document.first_page()
+    with timed(timings, "preview"):
+        first_page.thumbnail(PREVIEW_MAX_SIZE).save(preview_path, "PNG")
+    emit({"type": "started", "pages": document.page_count})
+
+    # 2. Run Pipeline. Every page is checked for signatures / stamps as OCR
+    # renders it, so no page is rasterized twice
+    signatures = {}
+
+    def check_page(page):
+        with timed(timings, "signatures"):
+            signatures[page.index] = audit_agent.detect_signatures(page)
+
+    extracted = set()
+
+    def page_done(index, df):
+        extracted.add(index)
+        emit(_page_event(index, df, document.page_count, len(extracted)))
+
+    df_ocr = ocr_agent.extract_structured_data(document, on_render=check_page, mode=mode, on_page=page_done,
+                                               engine=engine)
+    for name, ms in ocr_agent.timings.items():
+        timings[name] = timings.get(name, 0.0) + ms
+    with timed(timings, "signatures"):
+        _check_remaining_pages(audit_agent, document, signatures)
+
+    emit({"type": "stage", "stage": "audit"})
+    with timed(timings, "audit"):
+        df_audited, stats = audit_agent.audit_dataframe(df_ocr, signatures=[signatures[i] for i in sorted(signatures)])
+
+    # Requested reports (xlsx: both dashboard and raw OCR excel)
+    emit({"type": "stage", "stage": "report"})
+    with timed(timings, "report"):
+        _write_outputs(reporting_agent, df_audited, stats, output_dir, formats)
+
+    # Never cache demo/fallback data: the next attempt should retry real OCR
+    if cache_key and not ocr_agent.used_fallback:
+        with timed(timings, "cache"):
+            cache.put(cache_key, df_audited, stats, files={name: output_dir / name for name in CACHED_ARTIFACTS})
+
+    result = _result(stats, False, formats, mode, engine, timings, start)
+    result["demo_data"] = ocr_agent.used_fallback
+    result["engine_pages"] = dict(ocr_agent.engine_counts)  # which engine read how many pages
+    return result
+
+
+def _result(stats, cached, formats, mode, engine, timings, start):
+    return {
+        "stats": stats,
+        "cached": cached,
+        "formats": formats,
+        "mode": mode,
+        "engine": engine,
+        "timings": {name: round(ms, 1) for name, ms in timings.items()},
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_job(jobs_dir, job_id, input_path, formats=None, mode=None, request_id=None, engine=None):
+    """
+    Worker entry point for a queued job. Runs the pipeline inside the job's
+    own directory and records the outcome in its job.json. Progress goes to
+    the job's events.ndjson (streamed by GET /jobs/{id}/events), ending with
+    a "done" or "failed" event written after job.json. `request_id` (the
+    HTTP request that queued the job) tags the job's JSON log lines.
+    """
+    def on_event(event):
+        job_store.append_event(jobs_dir, job_id, event)
+
+    with telemetry.request_context(request_id):
+        job_store.write_status(jobs_dir, job_id, status="running", worker_pid=os.getpid(), started_at=time.time())
+        job_store.clear_events(jobs_dir, job_id)
+        telemetry.log_event("job_started", job_id=job_id, mode=mode, engine=engine)
+        start = time.perf_counter()
+        try:
+            result = run_pipeline(input_path, job_store.job_dir(jobs_dir, job_id), formats=formats, mode=mode,
+                                  on_event=on_event, engine=engine)
+        except Exception as e:
+            print(f" [Worker {os.getpid()}] Processing Error: {e}")
+            print(traceback.format_exc())
+            job_store.write_status(jobs_dir, job_id, status="failed", error=str(e), finished_at=time.time())
+            on_event({"type": "failed", "error": str(e)})
+            telemetry.log_event("job_failed", level=logging.ERROR, job_id=job_id, error=str(e),
+                                duration_ms=telemetry.elapsed_ms(start))
+            raise
+
+        job_store.write_status(jobs_dir, job_id, status="done", result=result, error=None, finished_at=time.time())
+        on_event({"type": "done", "stats": result["stats"], "cached": result["cached"]})
+        telemetry.log_event("job_done", job_id=job_id, cached=result["cached"], duration_ms=telemetry.elapsed_ms(start),
+                            timings=result["timings"])
+    return result
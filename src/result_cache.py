@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+import pandas as pd
+
+# ---------------- RESULT CACHE (CONTENT-ADDRESSED, LRU BY SIZE) ----------------
+# Re-uploading a document we have already processed should not re-run OCR.
+# Entries are keyed by SHA-256(document bytes + OCR/preprocessing settings)
+# and stored on disk, so every worker process (and server restart) shares them:
+#
+#   <cache_dir>/<key>/
+#       data.parquet    audited DataFrame (data.pkl if pyarrow is unavailable)
+#       meta.json       stats + column names
+#       <extra files>   e.g. preview.png
+#
+# Recency is tracked with the entry directory's mtime (touched on every hit);
+# the least recently used entries are evicted once the total size exceeds
+# `max_bytes`.
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def make_key(content_hash, settings):
+    """Cache key = content hash + every setting that can change the output."""
+    payload = json.dumps({"content": content_hash, "settings": settings}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir or os.getenv("FINVISION_CACHE_DIR", "data/cache"))
+        self.max_bytes = max_bytes or int(float(os.getenv("FINVISION_CACHE_MAX_MB", "512")) * 1024 * 1024)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, key):
+        return self.cache_dir / key
+
+    def get(self, key):
+        """
+        Returns {"df", "stats", "files"} for a cached result, or None on a miss.
+        """
+        entry = self._entry(key)
+        try:
+            with open(entry / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            if meta["format"] == "parquet":
+                df = pd.read_parquet(entry / "data.parquet")
+            else:
+                df = pd.read_pickle(entry / "data.pkl")
+            # Parquet needs unique string column names; restore the originals
+            df.columns = meta["columns"]
+
+            os.utime(entry)  # mark as most recently used
+        except (FileNotFoundError, KeyError, ValueError, OSError) as e:
+            if entry.exists():
+                print(f" [Result Cache] ⚠️  Dropping unreadable entry {key[:12]}: {e}")
+                shutil.rmtree(entry, ignore_errors=True)
+            return None
+
+        files = {name: entry / name for name in meta.get("files", []) if (entry / name).exists()}
+        print(f" [Result Cache] ✅ Hit {key[:12]} ({len(df)} rows)")
+        return {"df": df, "stats": meta["stats"], "files": files}
+
+    def put(self, key, df, stats, files=None):
+        """
+        Stores a result. `files` maps entry filenames to paths to copy in.
+        The entry is built in a temp directory and renamed into place, so
+        readers in other processes only ever see complete entries.
+        """
+        files = files or {}
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            stored = df.copy()
+            stored.columns = [f"c{i}" for i in range(len(df.columns))]
+
+            fmt = "pickle"
+            if HAS_PARQUET:
+                try:
+                    stored.to_parquet(tmp_dir / "data.parquet", index=False)
+                    fmt = "parquet"
+                except Exception as e:
+                    # e.g. object columns mixing numbers and strings
+                    print(f" [Result Cache] Parquet unavailable for this frame ({e}). Using pickle.")
+            if fmt == "pickle":
+                stored.to_pickle(tmp_dir / "data.pkl")
+
+            copied = []
+            for name, src in files.items():
+                if src and Path(src).exists():
+                    shutil.copy(src, tmp_dir / name)
+                    copied.append(name)
+
+            meta = {
+                "format": fmt,
+                "columns": [str(c) for c in df.columns],
+                "stats": stats,
+                "files": copied,
+                "created_at": time.time(),
+            }
+            with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, default=str)
+
+            try:
+                os.replace(tmp_dir, self._entry(key))
+                tmp_dir = None
+            except OSError:
+                pass  # Another worker stored the same result first
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits `max_bytes`."""
+        entries = []
+        total = 0
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+                total += size
+            except FileNotFoundError:
+                continue  # evicted concurrently by another worker
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort(key=lambda e: e[0])
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            print(f" [Result Cache] Evicted {entry.name[:12]} ({size} bytes)")
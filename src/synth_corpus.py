@@ -0,0 +1,311 @@
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# ---------------- PATH FIX ----------------
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+# ---------------- SYNTHETIC FINANCIAL DOCUMENTS ----------------
+# Renders financial tables the agents target to PNG or multi-page PDF,
+# with exact ground truth next to each document (<name>.json, the row-dict
+# shape of evaluation_agent.field_accuracy, read by bench_pipeline.py):
+#   - ohlc:     stock sheets like OCRAgent._get_demo_data
+#   - payments: payment logs (reference, payee, amount, method, status)
+#   - bank:     bank statements whose running balance adds up
+# Every page starts with the table header (the OCR agent reads each page's
+# first row as its header). Row count, DPI, noise, skew and blur are
+# configurable; everything is drawn from a seeded generator, so the same
+# arguments give the same corpus.
+#
+#   python src/synth_corpus.py data/synthetic --count 200 --layout ohlc bank --format pdf --rows 120 --workers 8
+#   python src/bench_pipeline.py data/synthetic
+
+PAGE_INCHES = (8.5, 11.0)   # US letter
+MARGIN_INCHES = 0.75
+FONT_POINTS = 10
+LINE_SPACING = 2.0          # x font height
+COLUMN_GAP_POINTS = 24
+FONT_FILES = ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf")
+
+PAYEES = [
+    "Acme Supplies", "Northwind Traders", "Globex Corp", "Initech", "Umbrella Logistics",
+    "Stark Industries", "Wayne Enterprises", "Hooli", "Vandelay Imports", "Soylent Foods",
+]
+METHODS = ["ACH", "Wire", "Card", "Cheque"]
+STATUSES = ["Paid", "Paid", "Paid", "Pending", "Failed"]
+DESCRIPTIONS = [
+    "Card payment TESCO STORES", "Salary ACME LTD", "Direct debit COUNCIL TAX", "Transfer to savings",
+    "ATM withdrawal", "Card payment SHELL", "Interest", "Standing order RENT", "Refund AMAZON",
+]
+
+
+# ---------------- TABLE CONTENT ----------------
+# A layout is [(header, ground-truth key, kind)] plus a row generator.
+# Kinds: "text" (left-aligned), "money" (1,204.50), "price" (62.48), "int" (21,325,140).
+
+def _dates(rng, n, fmt, newest_first):
+    start = np.datetime64("2017-01-04") - rng.integers(0, 3000)
+    days = start - np.arange(n) if newest_first else start + np.arange(n)
+    return [d.astype(object).strftime(fmt) for d in days]
+
+
+def _ohlc_rows(rng, n):
+    prices = np.round(rng.uniform(20, 400) * np.exp(np.cumsum(rng.normal(0, 0.01, n))), 2)
+    spread = np.round(np.abs(rng.normal(0, 0.01, (n, 3))) * prices[:, None], 2)
+    open_ = prices
+    close = np.round(prices + spread[:, 0] * rng.choice([-1, 1], n), 2)
+    high = np.round(np.maximum(open_, close) + spread[:, 1], 2)
+    low = np.round(np.minimum(open_, close) - spread[:, 2], 2)
+    volume = rng.integers(1_000_000, 30_000_000, n)
+    dates = _dates(rng, n, "%m/%d/%Y", newest_first=True)
+    return [
+        {"date": dates[i], "open": float(open_[i]), "high": float(high[i]), "low": float(low[i]),
+         "close": float(close[i]), "volume": int(volume[i])}
+        for i in range(n)
+    ]
+
+
+def _payment_rows(rng, n):
+    first_ref = int(rng.integers(1000, 90000))
+    amounts = np.round(rng.lognormal(6, 1.2, n), 2)
+    dates = _dates(rng, n, "%Y-%m-%d", newest_first=False)
+    return [
+        {"date": dates[i], "reference": f"INV-{first_ref + i:06d}", "payee": PAYEES[rng.integers(len(PAYEES))],
+         "amount": float(amounts[i]), "method": METHODS[rng.integers(len(METHODS))],
+         "status": STATUSES[rng.integers(len(STATUSES))]}
+        for i in range(n)
+    ]
+
+
+def _bank_rows(rng, n):
+    amounts = np.round(rng.lognormal(4, 1.0, n), 2)
+    is_credit = rng.random(n) < 0.3
+    delta = np.where(is_credit, amounts, -amounts)
+    balance = np.round(rng.uniform(500, 5000) + np.cumsum(delta), 2)
+    dates = _dates(rng, n, "%d %b %Y", newest_first=False)
+    return [
+        {"date": dates[i], "description": DESCRIPTIONS[rng.integers(len(DESCRIPTIONS))],
+         "debit": None if is_credit[i] else float(amounts[i]), "credit": float(amounts[i]) if is_credit[i] else None,
+         "balance": float(balance[i])}
+        for i in range(n)
+    ]
+
+
+LAYOUTS = {
+    "ohlc": ([("Date", "date", "text"), ("Open", "open", "price"), ("High", "high", "price"),
+              ("Low", "low", "price"), ("Close / Last", "close", "price"), ("Volume", "volume", "int")], _ohlc_rows),
+    "payments": ([("Date", "date", "text"), ("Reference", "reference", "text"), ("Payee", "payee", "text"),
+                  ("Amount", "amount", "money"), ("Method", "method", "text"), ("Status", "status", "text")],
+                 _payment_rows),
+    "bank": ([("Date", "date", "text"), ("Description", "description", "text"), ("Debit", "debit", "money"),
+              ("Credit", "credit", "money"), ("Balance", "balance", "money")], _bank_rows),
+}
+
+
+def format_cell(kind, value):
+    if value is None:
+        return ""
+    if kind == "money":
+        return f"{value:,.2f}"
+    if kind == "price":
+        return f"{value:.2f}"
+    if kind == "int":
+        return f"{value:,}"
+    return str(value)
+
+
+# ---------------- RENDERING ----------------
+
+_fonts = {}
+
+
+def load_font(size, font=None):
+    """A TrueType font at `size` px (cached): `font`, a common sans, or Pillow's default."""
+    key = (font, size)
+    if key not in _fonts:
+        for name in ([font] if font else []) + list(FONT_FILES):
+            try:
+                _fonts[key] = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            _fonts[key] = ImageFont.load_default(size=size)
+    return _fonts[key]
+
+
+def page_geometry(dpi):
+    """(width, height, margin, line height, font px) of a page at `dpi`."""
+    font_px = max(6, round(FONT_POINTS * dpi / 72))
+    return (round(PAGE_INCHES[0] * dpi), round(PAGE_INCHES[1] * dpi), round(MARGIN_INCHES * dpi),
+            round(font_px * LINE_SPACING), font_px)
+
+
+def rows_per_page(dpi):
+    _, height, margin, line, _ = page_geometry(dpi)
+    return max(1, (height - 2 * margin) // line - 1)  # one line for the header
+
+
+def _layout_columns(cells, font, gap, margin, width):
+    # Column widths from the widest cell; tables wider than the page are squeezed
+    widths = [max(font.getlength(text) for text in col) for col in zip(*cells)]
+    total = sum(widths) + gap * (len(widths) - 1)
+    squeeze = min(1.0, (width - 2 * margin) / total) if total else 1.0
+    x, lefts = margin, []
+    for w in widths:
+        lefts.append(x)
+        x += (w + gap) * squeeze
+    return lefts, [w * squeeze for w in widths]
+
+
+def render_page(columns, rows, dpi, font=None):
+    """One white page with the header and `rows` drawn on it (grayscale PIL image)."""
+    width, height, margin, line, font_px = page_geometry(dpi)
+    face = load_font(font_px, font)
+    header = [h for h, _, _ in columns]
+    cells = [header] + [[format_cell(kind, row[key]) for _, key, kind in columns] for row in rows]
+    lefts, widths = _layout_columns(cells, face, COLUMN_GAP_POINTS * dpi / 72, margin, width)
+
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for r, values in enumerate(cells):
+        y = margin + r * line
+        for (_, _, kind), text, left, w in zip(columns, values, lefts, widths):
+            # Amounts are right-aligned, as on real statements
+            x = left + w - face.getlength(text) if kind != "text" and r > 0 else left
+            draw.text((x, y), text, fill=0, font=face)
+        if r == 0:
+            rule_y = y + round(font_px * 1.4)
+            draw.line([(margin, rule_y), (width - margin, rule_y)], fill=0, width=max(1, dpi // 100))
+    return page
+
+
+def degrade(page, rng, noise=0.0, skew=0.0, blur=0.0):
+    """
+    Scan artefacts: rotation by `skew` degrees, Gaussian blur of sigma
+    `blur` px and Gaussian noise of `noise` x 255 std, plus the same share
+    of salt-and-pepper pixels. Done with OpenCV on the pixel array (PIL's
+    rotate / blur are several times slower on full pages).
+    """
+    if not (noise or skew or blur):
+        return page
+    pixels = np.asarray(page)
+    h, w = pixels.shape
+    if skew:
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), skew, 1.0)
+        pixels = cv2.warpAffine(pixels, m, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+    if blur:
+        pixels = cv2.GaussianBlur(pixels, (0, 0), blur)
+    if noise:
+        noisy = rng.standard_normal(pixels.shape, dtype=np.float32)
+        noisy *= noise * 255
+        noisy += pixels
+        specks = rng.random(pixels.shape, dtype=np.float32)
+        noisy[specks < noise / 2] = 0
+        noisy[specks > 1 - noise / 2] = 255
+        pixels = np.clip(noisy, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+# ---------------- DOCUMENTS & CORPUS ----------------
+
+def generate_document(stem, layout="ohlc", rows=40, fmt="png", dpi=200, noise=0.0, skew=0.0, blur=0.0,
+                      seed=0, font=None):
+    """
+    Writes <stem>.png (one page; rows beyond it are dropped) or <stem>.pdf
+    (as many pages as the rows need) and <stem>.json with the ground truth.
+    `skew` is the largest rotation: each page gets a random angle within
+    ±skew. Returns the ground truth dict.
+    """
+    rng = np.random.default_rng(seed)
+    columns, make_rows = LAYOUTS[layout]
+    per_page = rows_per_page(dpi)
+    data = make_rows(rng, min(rows, per_page) if fmt == "png" else rows)
+
+    pages = []
+    for start in range(0, max(len(data), 1), per_page):
+        page = render_page(columns, data[start:start + per_page], dpi, font)
+        angle = float(rng.uniform(-skew, skew)) if skew else 0.0
+        pages.append(degrade(page, rng, noise, angle, blur))
+
+    stem = Path(stem)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "pdf":
+        pages[0].save(stem.with_suffix(".pdf"), save_all=True, append_images=pages[1:], resolution=dpi)
+    else:
+        # Fast zlib level: noisy pages barely compress, and level 6 costs ~10x more
+        pages[0].save(stem.with_suffix(".png"), dpi=(dpi, dpi), compress_level=1)
+
+    truth = {
+        "layout": layout,
+        "seed": seed,
+        "dpi": dpi,
+        "pages": len(pages),
+        "noise": noise,
+        "skew": skew,
+        "blur": blur,
+        "columns": [header for header, _, _ in columns],
+        "rows": data,
+    }
+    with open(stem.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(truth, f, indent=1)
+    return truth
+
+
+def _generate(args):
+    return generate_document(*args)["pages"]
+
+
+def generate_corpus(output_dir, count=10, layouts=("ohlc", "payments", "bank"), fmt="png", rows=40, dpi=200,
+                    noise=0.0, skew=0.0, blur=0.0, seed=0, font=None, workers=1):
+    """
+    `count` documents cycling through `layouts`; document i uses seed + i,
+    so the corpus is the same whatever the number of `workers` processes.
+    Returns the number of pages written.
+    """
+    output_dir = Path(output_dir)
+    jobs = [
+        (output_dir / f"{layouts[i % len(layouts)]}_{i + 1:04d}", layouts[i % len(layouts)], rows, fmt, dpi,
+         noise, skew, blur, seed + i, font)
+        for i in range(count)
+    ]
+    if workers <= 1:
+        return sum(map(_generate, jobs))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return sum(pool.map(_generate, jobs, chunksize=max(1, count // (workers * 4))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic financial-table documents with ground truth")
+    parser.add_argument("output", help="Folder for the documents and their <name>.json ground truth")
+    parser.add_argument("--count", type=int, default=10, help="Number of documents")
+    parser.add_argument("--layout", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS),
+                        help="Layouts to cycle through")
+    parser.add_argument("--format", choices=["png", "pdf"], default="png",
+                        help="png: one page per document; pdf: as many pages as the rows need")
+    parser.add_argument("--rows", type=int, default=40, help="Table rows per document")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.0, help="Noise level, 0-1 (e.g. 0.03)")
+    parser.add_argument("--skew", type=float, default=0.0, help="Largest page rotation, degrees")
+    parser.add_argument("--blur", type=float, default=0.0, help="Gaussian blur sigma, pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", default=None, help="TrueType font file (default: DejaVu Sans / Arial)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes rendering documents in parallel")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages = generate_corpus(args.output, args.count, args.layout, args.format, args.rows, args.dpi,
+                            args.noise, args.skew, args.blur, args.seed, args.font, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f" [Synth] ✅ {args.count} documents ({pages} pages) in {args.output} - {elapsed:.1f}s "
+          f"({pages / elapsed:.0f} pages/s)")
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ---------------- TELEMETRY (METRICS + STRUCTURED LOGS) ----------------
+# Counters and histograms live in the server process and are rendered in
+# the Prometheus text format by /metrics. Pipeline stages run in worker
+# processes: each job brings its per-stage milliseconds back in its result
+# ("timings"), and record_job() turns them into histogram observations, so
+# every job is one sample per stage (the p99 of a stage is the p99 over
+# documents). Metrics are per server process, like any Prometheus target.
+#
+# Structured logs are one JSON object per line on stderr, tagged with the
+# id of the HTTP request that caused them (workers receive it with the job).
+
+# Histogram buckets, in seconds: 5 ms .. 10 min
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+JSON_LOGS = os.getenv("FINVISION_JSON_LOGS", "1") == "1"
+
+_registry = []
+_request_id = contextvars.ContextVar("finvision_request_id", default=None)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += [line for key, value in items for line in self._samples(key, value)]
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set: `counter.inc(status="done")`."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value per label set, set when it is known (e.g. at scrape time)."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of seconds: `histogram.observe(0.42, stage="audit")`."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines = []
+        for bound, count in zip(self.buckets, counts):
+            labels = _label_text(self.labels + ("le",), key + (_number(bound),))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _label_text(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# ---------------- STAGE TIMINGS ----------------
+# Code that runs a stage adds its milliseconds to a plain `timings` dict
+# (None: not timed). The dicts travel back in job results as "timings".
+
+def add_time(timings, name, start):
+    """Adds the milliseconds since `start` (a perf_counter value) to timings[name]."""
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+@contextmanager
+def timed(timings, name):
+    """Adds the milliseconds spent in the `with` block to timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(timings, name, start)
+
+
+# ---------------- METRICS ----------------
+
+HTTP_REQUESTS = Counter("finvision_http_requests_total", "HTTP requests by route and status code.",
+                        ("method", "route", "status"))
+HTTP_SECONDS = Histogram("finvision_http_request_seconds", "HTTP request latency (until the response headers).",
+                         ("method", "route"))
+JOBS = Counter("finvision_jobs_total", "Finished pipeline jobs by outcome.", ("status", "cached"))
+JOB_SECONDS = Histogram("finvision_job_seconds", "End-to-end pipeline time of a job in its worker.", ("cached",))
+STAGE_SECONDS = Histogram("finvision_stage_seconds", "Time spent in one pipeline stage, per job.", ("stage",))
+FALLBACKS = Counter("finvision_demo_fallback_total", "Jobs answered with demo data because OCR failed.")
+QUEUE_PENDING = Gauge("finvision_queue_pending_jobs", "Jobs queued or running in this server's worker pool.")
+QUEUE_CAPACITY = Gauge("finvision_queue_capacity_jobs", "Maximum jobs in flight before uploads get 429.")
+WORKERS = Gauge("finvision_workers", "Worker processes by model warm-up state.", ("state",))
+
+
+def record_job(result=None, error=None):
+    """Records a finished job: its outcome and, on success, its stage timings."""
+    if error is not None or result is None:
+        JOBS.inc(status="failed", cached="false")
+        return
+    cached = "true" if result.get("cached") else "false"
+    JOBS.inc(status="done", cached=cached)
+    if result.get("seconds") is not None:
+        JOB_SECONDS.observe(result["seconds"], cached=cached)
+    for stage, ms in (result.get("timings") or {}).items():
+        STAGE_SECONDS.observe(ms / 1000.0, stage=stage)
+    if result.get("demo_data"):
+        FALLBACKS.inc()
+
+
+# ---------------- STRUCTURED LOGS ----------------
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def request_id():
+    """The request id of the current context (None outside a request / job)."""
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(rid):
+    """Tags every log_event of the `with` block with request id `rid`."""
+    token = _request_id.set(rid)
+    try:
+        yield rid
+    finally:
+        _request_id.reset(token)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+def _get_logger():
+    logger = logging.getLogger("finvision")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(_JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Writes one JSON log line: {"ts", "level", "event", "request_id", "pid", **fields}."""
+    if not JSON_LOGS:
+        return
+    _get_logger().log(level, event, extra={"request_id": request_id(), "fields": fields})
+
+
+def elapsed_ms(start):
+    """Milliseconds since `start` (a perf_counter value), rounded for logs."""
+    return round((time.perf_counter() - start) * 1000, 1)
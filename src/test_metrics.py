@@ -1,7 +1,9 @@
 import sys
 import os
+import time
+import argparse
 from pathlib import Path
-import pandas as pd
+import cv2
 import Levenshtein  # pip install python-Levenshtein
 
 # ---------------- PATH FIX ----------------
@@ -11,6 +13,10 @@ if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
 from src.agents.ocr_agent import OCRAgent
+from src.agents.ocr_engines import OCREngineError
+from src.agents.image_pyramid import LAYOUT_TEXT_PX, layout_level
+from src.agents.table_detector import detect_table_rows
+from src.agents.column_detector import detect_columns
 
 # ---------------- CONFIGURATION ----------------
 RAW_DIR = ROOT / "data" / "raw"
@@ -41,13 +47,36 @@ def calculate_accuracy(ocr_text, gt_text):
 
     return round(char_acc, 2), round(word_acc, 2)
 
-def run_test():
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def layout_report(file_path):
+    """Row / column detection at full resolution vs. on the pyramid level."""
+    img = cv2.imread(str(file_path))
+    level, scale, text_h = layout_level(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    print(f"    Layout level: {level.shape[1]}x{level.shape[0]} (scale {scale:.3f}, text height {text_h or 0:.1f}px)")
+    for name, fn in (("rows", detect_table_rows), ("columns", detect_columns)):
+        try:
+            full, full_s = _timed(lambda: fn(img, layout_text_px=0))
+            small, small_s = _timed(lambda: fn(img))
+        except Exception as e:
+            # detect_table_rows falls back to OCR when it finds no row bands
+            print(f"    {name:<8} ⚠️ {e}")
+            continue
+        print(f"    {name:<8} full: {full_s * 1000:7.1f} ms ({len(full)}) | pyramid: {small_s * 1000:7.1f} ms ({len(small)})")
+
+
+def run_test(layout_values):
     print("\n" + "="*50)
     print(" 📊 FINVISION AI - DIAGNOSTIC ACCURACY TEST")
     print("="*50)
 
+    # One agent per text-detection resolution (0 = full resolution)
     try:
-        agent = OCRAgent()
+        agents = {v: OCRAgent(settings={"layout_text_px": v}) for v in layout_values}
     except Exception as e:
         print(f"❌ Failed: {e}")
         return
@@ -58,27 +87,42 @@ def run_test():
         print(f"\n 🔹 Testing: {file}")
         
         file_path = RAW_DIR / file
-        df = agent.extract_structured_data(file_path)
-        
-        # Flatten and Clean
-        extracted_text = " ".join(df.astype(str).values.flatten())
-        extracted_text = " ".join(extracted_text.split()) 
-
+        layout_report(file_path)
         gt_text = load_ground_truth(file)
 
-        if gt_text:
-            gt_text = " ".join(gt_text.split())
-            c_acc, w_acc = calculate_accuracy(extracted_text, gt_text)
-            
-            print(f"    ✅ Char Acc: {c_acc}% | Word Acc (Bag-of-Words): {w_acc}%")
-            
-            # --- DEBUG VIEW: SHOW ME THE DIFFERENCE ---
-            print("\n   COMPARISON (First 100 chars):")
-            print(f"    [EXPECTED]: {gt_text[:100]}...")
-            print(f"    [ACTUAL]  : {extracted_text[:100]}...")
-            print("-" * 50)
-        else:
-            print(f"    ⚠️ Skipped (No .txt found)")
+        for value, agent in agents.items():
+            label = "full resolution" if not value else f"text detection at {value}px text"
+            try:
+                df, seconds = _timed(lambda: agent.extract_structured_data(file_path))
+            except OCREngineError as e:
+                # No OCR engine here: a failed measurement, not a crash
+                print(f"    ❌ [{label}] {e}")
+                continue
+
+            # Flatten and Clean
+            extracted_text = " ".join(df.astype(str).values.flatten())
+            extracted_text = " ".join(extracted_text.split())
+
+            if agent.used_fallback:
+                print(f"    ⚠️ [{label}] OCR engine unavailable (demo data) - accuracy not meaningful")
+                continue
+
+            if gt_text:
+                gt_clean = " ".join(gt_text.split())
+                c_acc, w_acc = calculate_accuracy(extracted_text, gt_clean)
+
+                print(f"    ✅ [{label}] {seconds:.2f}s | Char Acc: {c_acc}% | Word Acc (Bag-of-Words): {w_acc}%")
+
+                # --- DEBUG VIEW: SHOW ME THE DIFFERENCE ---
+                print("\n   COMPARISON (First 100 chars):")
+                print(f"    [EXPECTED]: {gt_clean[:100]}...")
+                print(f"    [ACTUAL]  : {extracted_text[:100]}...")
+                print("-" * 50)
+            else:
+                print(f"    ⚠️ [{label}] {seconds:.2f}s | Skipped accuracy (No .txt found)")
 
 if __name__ == "__main__":
-    run_test()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="OCR accuracy against data/ground_truth")
+    parser.add_argument("--layout-px", type=int, nargs="+", default=[0, LAYOUT_TEXT_PX],
+                        help="Text heights for the detection pyramid level to compare (0 = full resolution)")
+    run_test(parser.parse_args().layout_px)
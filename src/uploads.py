@@ -0,0 +1,118 @@
+import os
+import re
+import hashlib
+from pathlib import Path
+from starlette.concurrency import run_in_threadpool
+
+from src import job_store
+
+# ---------------- UPLOAD INTAKE (STREAMED, SIZE-LIMITED, SNIFFED) ----------------
+# Starlette parses the multipart body first and spools the file to a
+# SpooledTemporaryFile (memory up to 1 MB, then disk). That spool is read
+# in chunks and copied into the job store while being hashed, so a large
+# file is never held in memory whole, but it is written twice.
+# - the first chunk's magic bytes decide the type (the client's filename and
+#   Content-Type are not trusted); anything else is rejected with 415
+# - the filename is reduced to a safe basename with an extension that
+#   matches the sniffed type
+# - the copy stops once it exceeds FINVISION_MAX_UPLOAD_MB (413). The body
+#   was already received by then; only a Content-Length is checked earlier
+#   (app.reject_oversized_uploads)
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("FINVISION_MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+MAX_BATCH_BYTES = int(float(os.getenv("FINVISION_MAX_BATCH_MB", "1024")) * 1024 * 1024)
+
+# (magic prefix, canonical suffix, accepted suffixes)
+SIGNATURES = [
+    (b"%PDF-", ".pdf", (".pdf",)),
+    (b"\x89PNG\r\n\x1a\n", ".png", (".png",)),
+    (b"\xff\xd8\xff", ".jpg", (".jpg", ".jpeg")),
+    (b"II*\x00", ".tif", (".tif", ".tiff")),
+    (b"MM\x00*", ".tif", (".tif", ".tiff")),
+    (b"BM", ".bmp", (".bmp",)),
+]
+
+UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9._ -]+")
+
+
+class UploadRejected(Exception):
+    """An upload refused before it reached the job queue."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_type(head):
+    """Returns (canonical_suffix, accepted_suffixes) for a file's first bytes, or None."""
+    for magic, suffix, accepted in SIGNATURES:
+        if head.startswith(magic):
+            return suffix, accepted
+    return None
+
+
+def safe_filename(filename, kind):
+    """
+    Reduces a client filename to a plain basename (no directories, no
+    control or shell characters) whose extension matches the sniffed type.
+    """
+    suffix, accepted = kind
+    name = Path((filename or "").replace("\\", "/")).name
+    stem = UNSAFE_CHARS_RE.sub("_", Path(name).stem).strip(" ._")[:100] or "upload"
+    ext = Path(name).suffix.lower()
+    return stem + (ext if ext in accepted else suffix)
+
+
+def sniff_zip(head):
+    if head.startswith(b"PK\x03\x04"):
+        return ".zip", (".zip",)
+    return None
+
+
+async def stream_to_disk(file, jobs_dir, max_bytes, sniff=sniff_type, expected="a PDF, PNG, JPEG, TIFF or BMP"):
+    """
+    Streams a FastAPI UploadFile into a temp file inside the job store.
+    Returns (tmp_path, sha256_hex, kind) where kind is what `sniff`
+    returned for the first chunk. Raises UploadRejected (400 / 413 / 415).
+    """
+    sha = hashlib.sha256()
+    size = 0
+    kind = None
+
+    buffer, tmp_path = await run_in_threadpool(job_store.new_upload_file, jobs_dir)
+    try:
+        with buffer:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if kind is None:
+                    kind = sniff(chunk)
+                    if kind is None:
+                        raise UploadRejected(f"Unsupported file type. Upload {expected}.", 415)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"File too large. The limit is {max_bytes // (1024 * 1024)} MB.", 413)
+                sha.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+
+        if kind is None:
+            raise UploadRejected("The uploaded file is empty.", 400)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return tmp_path, sha.hexdigest(), kind
+
+
+async def receive_upload(file, jobs_dir, max_bytes=None, options=None):
+    """
+    Streams a document upload into the job store. `options` are the request
+    settings that are part of the job's identity (see job_store.job_key).
+    Returns (job_id, status, created) - see job_store.claim_upload.
+    Raises UploadRejected (400 / 413 / 415) without creating a job.
+    """
+    tmp_path, content_hash, kind = await stream_to_disk(file, jobs_dir, max_bytes or MAX_UPLOAD_BYTES)
+    filename = safe_filename(file.filename, kind)
+    return await run_in_threadpool(job_store.claim_upload, jobs_dir, tmp_path, content_hash, filename, options)